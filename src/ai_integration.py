@@ -7,13 +7,26 @@ import logging
 import os
 import tkinter as tk
 from tkinter import messagebox
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from token_counter import DEFAULT_TOKENIZER, count_tokens
+from cancellation import DEFAULT_REQUEST_TIMEOUT, CallCancelled, CallTimedOut, CancelToken
+from local_llm import LocalLLMError, get_engine as get_local_engine
+from jobs import SummaryJob
+from prompt_builder import SummaryPrompt
+from rate_limiter import (PRIORITY_BULK, PRIORITY_INTERACTIVE, RateLimitError, TransientError, as_rate_limit_error,
+                          as_transient_error, get_scheduler)
+
+# summarize_many() uses a provider's batch endpoint from this many texts up
+BATCH_MIN_REQUESTS = 10
+BATCH_POLL_SECONDS = 30
 
 class AIProvider:
-    def __init__(self, provider_name, settings):
+    def __init__(self, provider_name, settings, models_data=None):
         self.provider_name = provider_name
         self.settings = settings
-        self.models_data = self._load_models()
+        self.models_data = models_data if models_data is not None else self._load_models()
 
     def _load_models(self, models_file=None):
       if models_file is None:
@@ -25,122 +38,338 @@ class AIProvider:
           logging.error(f"Error loading models file: {e}")
           return {}
 
-    def summarize(self, text):
+    def summarize(self, text, priority=PRIORITY_INTERACTIVE, cancel_token=None):
+        # text: a string, or a SummaryPrompt laid out for prefix caching (see prompt_builder.py).
+        # cancel_token: cancels the call from another thread; the provider's request
+        # timeout is applied to it unless it already has a deadline.
+        prompt = as_prompt(text)
+        request = self.prepare_request(prompt.text())
+        cancel_token = cancel_token or CancelToken()
+        cancel_token.start_deadline(self.request_timeout())
+        try:
+            return self.get_scheduler().run(lambda: self.send_request(prompt, request, cancel_token), request["tokens"], priority, cancel_token)
+        finally:
+            cancel_token.finish()
+
+    def request_timeout(self):
+        try:
+            timeout = float(self.settings.get("request_timeout") or 0)
+        except ValueError:
+            timeout = 0
+        if timeout <= 0:
+            timeout = self.models_data.get(self.provider_name, {}).get("default_request_timeout", DEFAULT_REQUEST_TIMEOUT)
+        return timeout
+
+    def summarize_many(self, texts, use_batch=None, max_workers=4, cancel_token=None):
+        # Summaries for several texts, in order. Providers with a batch endpoint get one
+        # batch job (own quota, lower price); everything else, and any batch item that
+        # failed, goes through the rate-limit scheduler behind interactive requests.
+        prompts = [as_prompt(text) for text in texts]
+        prepared = [self.prepare_request(prompt.text()) for prompt in prompts]
+        summaries = [None] * len(texts)
+        batch_endpoint = self.models_data.get(self.provider_name, {}).get("batch_endpoint")
+        if use_batch is None:
+            use_batch = len(texts) >= BATCH_MIN_REQUESTS
+        if batch_endpoint and use_batch and texts:
+            summaries = self._summarize_batch(prompts, prepared[0], batch_endpoint, cancel_token)
+            failed = summaries.count(None)
+            if failed:
+                logging.warning(f"{failed} of {len(texts)} batch requests failed for {self.provider_name}. Sending them individually.")
+
+        scheduler = self.get_scheduler()
+        def send(index):
+            # Each request gets its own deadline; cancelling the job cancels them all
+            item_token = CancelToken(self.request_timeout(), parent=cancel_token)
+            try:
+                return scheduler.run(lambda: self.send_request(prompts[index], prepared[index], item_token), prepared[index]["tokens"], PRIORITY_BULK, item_token)
+            finally:
+                item_token.finish()
+        missing = [index for index, summary in enumerate(summaries) if summary is None]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for index, summary in zip(missing, pool.map(send, missing)):
+                summaries[index] = summary
+        return summaries
+
+    def prepare_request(self, text):
         api_key = self.settings.get("api_key")
         if not api_key:
             raise ValueError(f"API Key is not configured for the selected AI provider: {self.provider_name}")
 
-        # Input token limit check
+        max_tokens = self.max_output_tokens()
+
+        api_base = self.settings.get("api_base")
+        if not api_base:
+            provider_data = self.models_data.get(self.provider_name, {})
+            api_base = provider_data.get("default_api_base")
+
+        model = self.resolve_model()
+
+        # Input token limit and context window check, counted with the model's own tokenizer
+        profile = self.model_profile()
+        input_tokens = count_tokens(text, tokenizer=profile["tokenizer"])
         if self.settings.get("input_token_limit_enabled", False):
             input_token_limit = self.settings.get("input_token_limit")
-            if input_token_limit and len(text.split()) > int(input_token_limit):
+            if input_token_limit and input_tokens > int(input_token_limit):
                 raise ValueError(f"Text exceeds the input token limit of {input_token_limit}.")
+        if profile["context_window"] and input_tokens + (max_tokens or 0) > profile["context_window"]:
+            raise ValueError(f"Text ({input_tokens} tokens) does not fit the {profile['context_window']} token context window of {model}.")
 
+        # Tokens-per-minute limits count the requested output as well as the input
+        return {"model": model, "api_base": api_base, "max_tokens": max_tokens, "tokens": input_tokens + (max_tokens or 0)}
+
+    def max_output_tokens(self):
         # Output token limit
         output_token_limit = None
         if self.settings.get("output_token_limit_enabled", False):
             output_token_limit = self.settings.get("output_token_limit")
             if output_token_limit:
                 output_token_limit = int(output_token_limit)
+        max_tokens = output_token_limit
+        if self.provider_name == "Anthropic":
+            anthropic_max_tokens = self.settings.get("anthropic_max_tokens")
+            max_tokens = int(anthropic_max_tokens) if anthropic_max_tokens else output_token_limit
+        return max_tokens
 
-        api_base = self.settings.get("api_base")
-        if not api_base:
-            provider_data = self.models_data.get(self.provider_name, {})
-            api_base = provider_data.get("default_api_base")
+    def model_profile(self):
+        return get_model_profile(self.models_data, self.provider_name, self.resolve_model(warn=False))
+
+    def input_token_budget(self):
+        # Most input tokens one request may carry (input limit, context window less the output), or None
+        budgets = []
+        if self.settings.get("input_token_limit_enabled", False) and self.settings.get("input_token_limit"):
+            budgets.append(int(self.settings["input_token_limit"]))
+        context_window = self.model_profile()["context_window"]
+        if context_window:
+            budgets.append(context_window - (self.max_output_tokens() or 0))
+        return min(budgets) if budgets else None
+
+    def send_request(self, prompt, request, cancel_token):
+        model, api_base, max_tokens = request["model"], request["api_base"], request["max_tokens"]
+        if self.provider_name == "OpenAI":
+            return self._summarize_with_openai(prompt, model=model, api_base=api_base, max_tokens=max_tokens, cancel_token=cancel_token)
+        elif self.provider_name == "Groq":
+            return self._summarize_with_openai(prompt, model=model, api_base=api_base, max_tokens=max_tokens, cancel_token=cancel_token)
+        elif self.provider_name == "Mistral AI":
+            return self._summarize_with_openai(prompt, model=model, api_base=api_base, max_tokens=max_tokens, cancel_token=cancel_token)
+        elif self.provider_name == "Anthropic":
+            return self._summarize_with_anthropic(prompt, model=model, max_tokens=max_tokens, cancel_token=cancel_token)
+        elif self.provider_name == "Local LLM":
+            return self._summarize_with_local_llm(prompt, model=model, api_base=api_base, max_tokens=max_tokens, cancel_token=cancel_token)
+        elif self.provider_name == "Google":
+            return self._summarize_with_gemini(prompt, model=model, cancel_token=cancel_token)
+        else:
+            raise ValueError(f"Unsupported AI provider: {self.provider_name}")
+
+    def get_scheduler(self):
+        return get_scheduler(self.provider_name, self.rate_limit("requests_per_minute"), self.rate_limit("tokens_per_minute"))
 
+    def rate_limit(self, key):
+        # Limits are opt-in (AI Configuration): accounts differ too much for shipped defaults. Blank means none.
+        try:
+            value = int(float(self.settings.get(key) or 0))
+        except (TypeError, ValueError):
+            logging.warning(f"Ignoring invalid {key} for {self.provider_name}: {self.settings.get(key)!r}")
+            return None
+        return value if value > 0 else None
+
+    def _api_error(self, label, error, cancel_token=None, partial=""):
+        # A failure caused by cancel or deadline (e.g. the stream closed under us) reports as such
+        stopped = cancel_token.error(partial) if cancel_token is not None else None
+        if stopped is not None:
+            return stopped
+        rate_limit_error = as_rate_limit_error(error)
+        if rate_limit_error is not None:
+            return RateLimitError(f"{label} rate limit reached: {error}", rate_limit_error.retry_after)
+        transient_error = as_transient_error(error)
+        if transient_error is not None:
+            return TransientError(f"{label} API error: {error}", transient_error.retry_after)
+        return Exception(f"{label} API error: {error}")
+
+    def resolve_model(self, warn=True):
         model = self.settings.get("model")
         if not model and self.provider_name in self.models_data and self.models_data[self.provider_name].get('models'):
             model = self.models_data[self.provider_name]['models'][0]
-            logging.warning(f"No model selected for {self.provider_name}. Using default model: {model}")
+            if warn:
+                logging.warning(f"No model selected for {self.provider_name}. Using default model: {model}")
         elif not model:
             raise ValueError(f"No model configured for the selected AI provider: {self.provider_name}")
-        
+
         custom_model_enabled = self.settings.get("custom_model_enabled", False)
         if custom_model_enabled:
           model = self.settings.get("custom_model")
           if not model:
              raise ValueError(f"Custom model is enabled but no custom model is specified.")
+        return model
 
-
-        if self.provider_name == "OpenAI":
-            return self._summarize_with_openai(text, model=model, api_base=api_base, max_tokens=output_token_limit)
-        elif self.provider_name == "Groq":
-            return self._summarize_with_openai(text, model=model, api_base=api_base, max_tokens=output_token_limit)
-        elif self.provider_name == "Mistral AI":
-            return self._summarize_with_openai(text, model=model, api_base=api_base, max_tokens=output_token_limit)
-        elif self.provider_name == "Anthropic":
-            anthropic_max_tokens = self.settings.get("anthropic_max_tokens")
-            max_tokens = int(anthropic_max_tokens) if anthropic_max_tokens else output_token_limit
-            return self._summarize_with_anthropic(text, model=model, max_tokens=max_tokens)
-        elif self.provider_name == "Local LLM":
-            return self._summarize_with_local_llm(text, model=model, api_base=api_base, max_tokens=output_token_limit)
-        elif self.provider_name == "Google":
-            return self._summarize_with_gemini(text, model=model)
-        else:
-            raise ValueError(f"Unsupported AI provider: {self.provider_name}")
-
-    def _summarize_with_openai(self, text, model, api_base=None, max_tokens=None):
+    # Provider calls stream their output, so a cancelled or timed-out call still
+    # returns what arrived (CallCancelled.partial), and a cancel closes the stream
+    def _summarize_with_openai(self, prompt, model, api_base=None, max_tokens=None, cancel_token=None):
+        cancel_token = cancel_token or CancelToken()
         import openai
         openai.api_key = self.settings.get("api_key")
         openai.api_base = api_base if api_base else "https://api.openai.com/v1"
-        client = openai.OpenAI(api_key=openai.api_key, base_url=openai.api_base)
+        # Retries (429s and transient errors) are left to the rate-limit scheduler; see rate_limiter.py
+        client = openai.OpenAI(api_key=openai.api_key, base_url=openai.api_base, max_retries=0)
+        pieces = []
         try:
-            response = client.chat.completions.create(
+            stream = client.chat.completions.create(
                 model=model,
-                messages=[
-                    {"role": "system", "content": "Summarize the following text:"},
-                    {"role": "user", "content": text}
-                ],
-                max_tokens=max_tokens
+                messages=prompt.chat_messages(),
+                max_tokens=max_tokens,
+                stream=True,
+                timeout=cancel_token.remaining()
             )
-            return response.choices[0].message.content
+            with cancel_token.closing(stream):
+                for chunk in stream:
+                    cancel_token.check("".join(pieces))
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        pieces.append(chunk.choices[0].delta.content)
+            return "".join(pieces)
+        except CallCancelled:
+            raise
         except Exception as e:
-            raise Exception(f"OpenAI API error: {e}")
+            raise self._api_error("OpenAI", e, cancel_token, "".join(pieces))
 
-    def _summarize_with_anthropic(self, text, model, max_tokens=None):
+    def _summarize_with_anthropic(self, prompt, model, max_tokens=None, cancel_token=None):
+        cancel_token = cancel_token or CancelToken()
         import anthropic
         api_key = self.settings.get("api_key")
-        client = anthropic.Anthropic(api_key=api_key)
+        client = anthropic.Anthropic(api_key=api_key, max_retries=0)
+        pieces = []
         try:
-            response = client.messages.create(
+            # Cache breakpoints let a re-summary reuse the unchanged files' prefix
+            system, messages = prompt.anthropic_request()
+            with client.messages.stream(
                 model=model,
                 max_tokens=max_tokens,
-                messages=[
-                    {"role": "user", "content": f"Summarize the following text:\n\n{text}"}
-                ]
-            )
-            return response.content[0].text
+                system=system,
+                messages=messages,
+                timeout=cancel_token.remaining()
+            ) as stream:
+                with cancel_token.closing(stream):
+                    for piece in stream.text_stream:
+                        cancel_token.check("".join(pieces))
+                        pieces.append(piece)
+            return "".join(pieces)
+        except CallCancelled:
+            raise
         except Exception as e:
-            raise Exception(f"Anthropic API error: {e}")
-
-    def _summarize_with_local_llm(self, text, model, api_base, max_tokens=None):
-        headers = {'Content-Type': 'application/json'}
-        payload = {
-            "model": model,
-            "messages": [
-                 {"role": "system", "content": "Summarize the following text:"},
-                 {"role": "user", "content": text}
-            ]
-        }
-        if max_tokens:
-            payload["max_tokens"] = max_tokens
+            raise self._api_error("Anthropic", e, cancel_token, "".join(pieces))
+
+    def _summarize_with_local_llm(self, prompt, model, api_base, max_tokens=None, cancel_token=None):
+        # Pooled, slot-limited and streamed; see local_llm.py
+        parallel_slots = self.settings.get("parallel_slots")
+        engine = get_local_engine(api_base, self.settings.get("api_key"), int(parallel_slots) if parallel_slots else 1)
+        keep_alive_seconds = self.settings.get("keep_alive_seconds")
         try:
-          response = requests.post(f"{api_base}/chat/completions", headers=headers, json=payload)
-          response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-          return response.json()["choices"][0]["message"]["content"]
-        except requests.exceptions.RequestException as e:
-          raise Exception(f"Local LLM API error: {e}")
+          summary = engine.chat(prompt.chat_messages(), model, max_tokens=max_tokens, cancel_token=cancel_token)
+        except (requests.exceptions.RequestException, LocalLLMError) as e:
+          raise self._api_error("Local LLM", e, cancel_token)
+        if keep_alive_seconds and int(keep_alive_seconds) > 0:
+            engine.keep_warm(model, int(keep_alive_seconds))
+        return summary
 
-    def _summarize_with_gemini(self, text, model):
+    def _summarize_with_gemini(self, prompt, model, cancel_token=None):
+        cancel_token = cancel_token or CancelToken()
         import google.generativeai as genai
         genai.configure(api_key=self.settings.get("api_key"))
         model_name = model
         model = genai.GenerativeModel(model_name)
+        pieces = []
         try:
-            response = model.generate_content(f"Summarize the following text:\n\n{text}")
-            return response.text
+            response = model.generate_content(prompt.single_text(), stream=True,
+                                              request_options={"timeout": cancel_token.remaining()})
+            for chunk in response:
+                cancel_token.check("".join(pieces))
+                pieces.append(chunk.text)
+            return "".join(pieces)
+        except CallCancelled:
+            raise
         except Exception as e:
-            raise Exception(f"Google Gemini API error: {e}")
+            raise self._api_error("Google Gemini", e, cancel_token, "".join(pieces))
+
+    def _summarize_batch(self, prompts, request, batch_endpoint, cancel_token=None):
+        # Returns one summary per text, None where the batch item failed
+        if batch_endpoint == "openai":
+            return self._summarize_batch_with_openai(prompts, request["model"], request["api_base"], request["max_tokens"], cancel_token)
+        elif batch_endpoint == "anthropic":
+            return self._summarize_batch_with_anthropic(prompts, request["model"], request["max_tokens"], cancel_token)
+        raise ValueError(f"Unsupported batch endpoint for {self.provider_name}: {batch_endpoint}")
+
+    def _wait_for_batch(self, retrieve, is_finished, cancel_batch, cancel_token=None):
+        # Batches are not bound by the request timeout, only by cancellation or the token's own deadline
+        batch = retrieve()
+        while not is_finished(batch):
+            logging.info(f"Waiting for {self.provider_name} batch {batch.id}...")
+            if cancel_token is None:
+                time.sleep(BATCH_POLL_SECONDS)
+            else:
+                remaining = cancel_token.remaining()
+                cancel_token.wait(BATCH_POLL_SECONDS if remaining is None else min(BATCH_POLL_SECONDS, remaining))
+                error = cancel_token.error()
+                if error is not None:
+                    cancel_batch(batch.id)
+                    reason = "timed out" if isinstance(error, CallTimedOut) else "cancelled"
+                    raise type(error)(f"{self.provider_name} batch {batch.id} {reason}.")
+            batch = retrieve()
+        return batch
+
+    def _summarize_batch_with_openai(self, prompts, model, api_base=None, max_tokens=None, cancel_token=None):
+        # OpenAI Batch API (also served by Groq): JSONL upload, one job, JSONL results
+        import openai
+        client = openai.OpenAI(api_key=self.settings.get("api_key"), base_url=api_base if api_base else "https://api.openai.com/v1")
+        lines = []
+        for index, prompt in enumerate(prompts):
+            body = {"model": model, "messages": prompt.chat_messages()}
+            if max_tokens:
+                body["max_tokens"] = max_tokens
+            lines.append(json.dumps({"custom_id": str(index), "method": "POST", "url": "/v1/chat/completions", "body": body}))
+        try:
+            input_file = client.files.create(file=("summaries.jsonl", "\n".join(lines).encode('utf-8')), purpose="batch")
+            batch = client.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window="24h")
+            batch = self._wait_for_batch(lambda: client.batches.retrieve(batch.id),
+                                         lambda batch: batch.status in ("completed", "failed", "expired", "cancelled"),
+                                         client.batches.cancel, cancel_token)
+            summaries = [None] * len(prompts)
+            if not batch.output_file_id:
+                logging.error(f"OpenAI batch {batch.id} ended with status {batch.status} and no output.")
+                return summaries
+            for line in client.files.content(batch.output_file_id).text.splitlines():
+                item = json.loads(line)
+                response = item.get("response") or {}
+                if response.get("status_code") == 200:
+                    summaries[int(item["custom_id"])] = response["body"]["choices"][0]["message"]["content"]
+            return summaries
+        except CallCancelled:
+            raise
+        except Exception as e:
+            raise self._api_error("OpenAI batch", e)
+
+    def _summarize_batch_with_anthropic(self, prompts, model, max_tokens=None, cancel_token=None):
+        # Anthropic Message Batches API
+        import anthropic
+        client = anthropic.Anthropic(api_key=self.settings.get("api_key"))
+        batch_requests = []
+        for index, prompt in enumerate(prompts):
+            system, messages = prompt.anthropic_request()
+            batch_requests.append({
+                "custom_id": str(index),
+                "params": {"model": model, "max_tokens": max_tokens, "system": system, "messages": messages}
+            })
+        try:
+            batch = client.messages.batches.create(requests=batch_requests)
+            batch = self._wait_for_batch(lambda: client.messages.batches.retrieve(batch.id),
+                                         lambda batch: batch.processing_status == "ended",
+                                         client.messages.batches.cancel, cancel_token)
+            summaries = [None] * len(prompts)
+            for item in client.messages.batches.results(batch.id):
+                if item.result.type == "succeeded":
+                    summaries[int(item.custom_id)] = item.result.message.content[0].text
+            return summaries
+        except CallCancelled:
+            raise
+        except Exception as e:
+            raise self._api_error("Anthropic batch", e)
 
 def load_llm_config(config_file="llm_config.json"):
     try:
@@ -176,42 +405,77 @@ def load_models(models_file=None):
         logging.error(f"Error loading models file: {e}")
         return {}
 
-def summarize_text(text, config_file="llm_config.json", pref_file="preferences.json", app=None):
+def as_prompt(text):
+    return text if isinstance(text, SummaryPrompt) else SummaryPrompt.from_text(text)
+
+def get_model_profile(models_data, provider_name, model):
+    # Tokenizer id and context window for a model. Models missing from models.json
+    # (e.g. custom ones) use the provider's tokenizer and have no known window.
+    provider_data = models_data.get(provider_name, {})
+    model_info = provider_data.get("model_info", {}).get(model, {})
+    return {
+        "provider": provider_name,
+        "model": model,
+        "tokenizer": model_info.get("tokenizer") or provider_data.get("tokenizer") or DEFAULT_TOKENIZER,
+        "context_window": model_info.get("context_window"),
+    }
+
+def get_current_model_profile(models_data=None, pref_file="preferences.json"):
+    # Profile of the provider and model currently selected in the AI configuration
+    all_prefs = load_preferences(pref_file)
+    provider_name = all_prefs.get("current_provider", "Google")
+    provider = AIProvider(provider_name, all_prefs.get(provider_name, {}), models_data)
+    try:
+        model = provider.resolve_model(warn=False)
+    except ValueError:
+        model = None
+    return get_model_profile(provider.models_data, provider_name, model)
+
+def get_current_provider(pref_file="preferences.json"):
     all_prefs = load_preferences(pref_file)
     provider_name = all_prefs.get("current_provider", "Google") # Set default provider to Google
-    provider_config = all_prefs.get(provider_name, {})
+    return AIProvider(provider_name, all_prefs.get(provider_name, {}))
+
+def show_summary_popup(app, summary_text, provider_config, note=None):
+    # Create and display a popup window
+    popup = tk.Toplevel(app.root)
+    popup.title("AI Summary")
+    # Get the main window's position
+    app_x = app.root.winfo_x()
+    app_y = app.root.winfo_y()
+    app_width = app.root.winfo_width()
+    app_height = app.root.winfo_height()
+
+    # Calculate the popup's position to be centered on main window
+    popup_width = 500 # set your desired width
+    popup_height = 300 # set your desired height
+    x = app_x + (app_width - popup_width) // 2
+    y = app_y + (app_height - popup_height) // 2
+
+    popup.geometry(f"{popup_width}x{popup_height}+{x}+{y}")
+
+    text_widget = tk.Text(popup, wrap=tk.WORD, height=10, width=50)
+    text_widget.insert(tk.END, summary_text)
+    text_widget.pack(padx=10, pady=10)
+    text_widget.config(state=tk.DISABLED)
+    current_model_label = tk.Label(popup, text=f"Current AI Model: {provider_config.get('model', 'No Model Selected')}", foreground="red")
+    current_model_label.pack(side="bottom", fill="x", padx=10, pady=5)
+    if note:
+        # e.g. a partial summary kept from a cancelled or timed-out request
+        tk.Label(popup, text=note, foreground="orange").pack(side="bottom", fill="x", padx=10)
+
+def summarize_text(text, config_file="llm_config.json", pref_file="preferences.json", app=None, cancel_token=None):
+    provider = get_current_provider(pref_file)
+    provider_config = provider.settings
     try:
-        provider = AIProvider(provider_name, provider_config)
-        summary_text = provider.summarize(text)
+        summary_text = SummaryJob(provider, text).run(cancel_token=cancel_token)
 
         if app:
-          # Create and display a popup window
-          popup = tk.Toplevel(app.root)
-          popup.title("AI Summary")
-          # Get the main window's position
-          app_x = app.root.winfo_x()
-          app_y = app.root.winfo_y()
-          app_width = app.root.winfo_width()
-          app_height = app.root.winfo_height()
-
-          # Calculate the popup's position to be centered on main window
-          popup_width = 500 # set your desired width
-          popup_height = 300 # set your desired height
-          x = app_x + (app_width - popup_width) // 2
-          y = app_y + (app_height - popup_height) // 2
-
-          popup.geometry(f"{popup_width}x{popup_height}+{x}+{y}")
-
-          text_widget = tk.Text(popup, wrap=tk.WORD, height=10, width=50)
-          text_widget.insert(tk.END, summary_text)
-          text_widget.pack(padx=10, pady=10)
-          text_widget.config(state=tk.DISABLED)
-          current_model_label = tk.Label(popup, text=f"Current AI Model: {provider_config.get('model', 'No Model Selected')}", foreground="red")
-          current_model_label.pack(side="bottom", fill="x", padx=10, pady=5)
+          show_summary_popup(app, summary_text, provider_config)
 
         return summary_text
     except Exception as e:
         logging.error(f"Error during summarization: {e}")
         if app:
             messagebox.showerror("Summarization Error", str(e))
-        return None
\ No newline at end of file
+        return None
@@ -6,6 +6,12 @@ import ttkbootstrap as ttk
 import json
 import logging
 import os
+import threading
+
+from model_catalog import list_models, load_model_cache, refresh_models
+
+MODEL_FETCH_POLL_MS = 100
+PLACEHOLDER = "leave blank if not applicable"
 
 def load_llm_config(config_file="llm_config.json"):
     try:
@@ -51,7 +57,7 @@ class AIConfigurationDialog:
         self.parent = parent
         self.dialog = ttk.Toplevel(self.parent)
         self.dialog.title("LLM or AI Configuration")
-        self.dialog.geometry("500x450")
+        self.dialog.geometry("500x540")
 
         self.config_file = "llm_config.json"
         self.pref_file = "preferences.json"
@@ -66,8 +72,10 @@ class AIConfigurationDialog:
             self.current_provider = self.available_providers[0] if self.available_providers else ""
         self.provider_var.set(self.current_provider)
 
+        # Provider frames are built the first time a provider is selected
         self.config_frames = {}
         self.config_widgets = {}
+        self.model_cache = None  # fetched model lists (model_catalog), read on first use
         self.current_model_label = ttk.Label(self.dialog, text="", foreground="red")
 
         self.create_widgets()
@@ -88,14 +96,6 @@ class AIConfigurationDialog:
         )
         self.provider_dropdown.pack(side="left", fill="x", expand=True, padx=5)
 
-        # Configuration Frames
-        for provider_name in self.available_providers:
-            frame = ttk.Frame(self.dialog)
-            self.config_frames[provider_name] = frame
-            frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
-            self.populate_config_frame(provider_name, frame)
-            frame.grid_remove()
-
         self.current_model_label.grid(row=2, column=0, sticky="ew", padx=10, pady=5)
 
 
@@ -108,6 +108,21 @@ class AIConfigurationDialog:
         self.default_button.config(padding=0)
 
 
+    def get_config_frame(self, provider_name):
+        frame = self.config_frames.get(provider_name)
+        if frame is None:
+            frame = ttk.Frame(self.dialog)
+            self.config_frames[provider_name] = frame
+            frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
+            self.populate_config_frame(provider_name, frame)
+            self.apply_toggles(provider_name)
+        return frame
+
+    def get_model_cache(self):
+        if self.model_cache is None:
+            self.model_cache = load_model_cache()
+        return self.model_cache
+
     def populate_config_frame(self, provider_name, frame):
         config_widgets = {}
         provider_config = self.all_prefs.get(provider_name, {})
@@ -118,7 +133,7 @@ class AIConfigurationDialog:
             model_frame = ttk.Frame(frame)
             ttk.Label(model_frame, text="Model").pack(side="left", padx=5)
 
-            sorted_models = sorted(models_for_provider.get('models', []))
+            sorted_models = list_models(provider_name, provider_config, self.models_data, self.get_model_cache())
             model_var = tk.StringVar(self.dialog)
             saved_model = provider_config.get("model")
             initial_model = saved_model if saved_model in sorted_models else (sorted_models[0] if sorted_models else "")
@@ -127,6 +142,10 @@ class AIConfigurationDialog:
             model_dropdown = ttk.Combobox(model_frame, textvariable=model_var, values=sorted_models, state="readonly", name="model")
             model_dropdown.pack(side="left", fill="x", expand=True, padx=5)
             model_dropdown.bind("<<ComboboxSelected>>", self.update_model_display)
+            if models_for_provider.get("models_endpoint"):
+                refresh_button = ttk.Button(model_frame, text="Refresh", command=lambda: self.refresh_model_list(provider_name), style="Link.TButton")
+                refresh_button.pack(side="left", padx=5)
+                config_widgets["refresh_button"] = refresh_button
             model_frame.pack(fill="x", padx=10, pady=5)
             config_widgets["model"] = model_dropdown
             config_widgets["model_var"] = model_var
@@ -183,9 +202,9 @@ class AIConfigurationDialog:
                 entry = ttk.Entry(entry_frame, name=field_name)
                 if field_name in ["api_base", "api_organisation"]:
                      entry.insert(0, entry_value)
-                     entry.bind("<FocusIn>", lambda event, entry=entry: self.handle_focus_in(event, entry, "leave blank if not applicable"))
-                     entry.bind("<FocusOut>", lambda event, entry=entry: self.handle_focus_out(event, entry, "leave blank if not applicable"))
-                     self.handle_focus_out(None, entry, "leave blank if not applicable")
+                     entry.bind("<FocusIn>", lambda event, entry=entry: self.handle_focus_in(event, entry, PLACEHOLDER))
+                     entry.bind("<FocusOut>", lambda event, entry=entry: self.handle_focus_out(event, entry, PLACEHOLDER))
+                     self.handle_focus_out(None, entry, PLACEHOLDER)
                 else:
                   entry.insert(0, entry_value)
                 entry.pack(side="left", fill="x", expand=True, padx=5)
@@ -208,14 +227,19 @@ class AIConfigurationDialog:
 
     def load_saved_values(self):
         self.on_provider_change()
-        for provider_name in self.available_providers:
-            self.toggle_custom_model(provider_name)
-            self.toggle_limit_entry(provider_name, "input")
-            self.toggle_limit_entry(provider_name, "output")
+        for provider_name in self.config_widgets:
+            self.apply_toggles(provider_name)
         self.update_model_display()
 
+    def apply_toggles(self, provider_name):
+        self.toggle_custom_model(provider_name)
+        self.toggle_limit_entry(provider_name, "input")
+        self.toggle_limit_entry(provider_name, "output")
+
     def on_provider_change(self, *args):
         selected_provider = self.provider_var.get()
+        if selected_provider:
+            self.get_config_frame(selected_provider)
         for provider, frame in self.config_frames.items():
             if provider == selected_provider:
                 frame.grid()
@@ -223,6 +247,42 @@ class AIConfigurationDialog:
                 frame.grid_remove()
         self.update_model_display()
 
+    def refresh_model_list(self, provider_name):
+        # Fetches the provider's current models off the UI thread, using the values typed so far
+        widgets = self.config_widgets[provider_name]
+        settings = {}
+        for key in ("api_key", "api_base"):
+            value = widgets[key].get().strip() if key in widgets else ""
+            if value and value != PLACEHOLDER:
+                settings[key] = value
+        widgets["refresh_button"].config(state=tk.DISABLED)
+        self.current_model_label.config(text=f"Fetching {provider_name} models...")
+        result = {}
+        def run():
+            try:
+                result["models"] = refresh_models(provider_name, settings, self.models_data)
+            except Exception as e:
+                result["error"] = e
+        thread = threading.Thread(target=run, name="model-list", daemon=True)
+        thread.start()
+        self.dialog.after(MODEL_FETCH_POLL_MS, self.poll_model_list, provider_name, thread, result)
+
+    def poll_model_list(self, provider_name, thread, result):
+        if not self.dialog.winfo_exists():
+            return
+        if thread.is_alive():
+            self.dialog.after(MODEL_FETCH_POLL_MS, self.poll_model_list, provider_name, thread, result)
+            return
+        widgets = self.config_widgets[provider_name]
+        widgets["refresh_button"].config(state=tk.NORMAL)
+        if "error" in result:
+            logging.error(f"Could not fetch models for {provider_name}: {result['error']}")
+            messagebox.showerror("Model List", f"Could not fetch models for {provider_name}: {result['error']}", parent=self.dialog)
+        else:
+            widgets["model"].config(values=result["models"])
+            self.model_cache = None # Re-read with the new list when another frame is built
+        self.update_model_display()
+
     def toggle_custom_model(self, provider_name):
         if provider_name in self.config_widgets:
             custom_enabled = self.config_widgets[provider_name]["custom_model_enabled_var"].get()
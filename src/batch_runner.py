@@ -0,0 +1,263 @@
+# batch_runner.py
+# Runs many combine jobs from one job definition file in a single process,
+# e.g. one bundle per service for a release:
+#
+#   python batch_runner.py release.json [--job billing --job search] [--list]
+#
+#   {
+#     "defaults": {"extensions": [".py", ".sql"], "exclude": ["**/tests/**"], "dedupe": true},
+#     "jobs": [
+#       {"name": "billing", "roots": ["services/billing", "libs/common"],
+#        "include": ["**/*.py", "**/*.sql"], "outputs": ["dist/billing.txt", "dist/billing.ccb"]},
+#       {"name": "search", "roots": ["services/search", "libs/common"], "extensions": [".go"],
+#        "minify": true, "outputs": ["dist/search.txt.gz"]}
+#     ]
+#   }
+#
+# A job takes any of "roots", "include"/"exclude" (glob patterns relative to
+# the root), "extensions", "outputs" (the format follows the file name, as in
+# Save), "dedupe", "minify", "minify_options", "tokenizer", "size_policy" and
+# "git_source"; settings a job leaves out come from "defaults", then
+# config.json. Relative paths are resolved against the job file. Jobs share
+# one process pool, one token cache, one walk per distinct root (a root inside
+# another root is taken from the outer walk) and a read cache, so a file that
+# several jobs include is read from disk once.
+import argparse
+import contextlib
+import fnmatch
+import json
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+
+from file_combiner import FileCombinerBackend
+from output_writers import get_output_writer, prefetch
+from size_policy import SizePolicy
+
+JOB_KEYS = {"name", "roots", "include", "exclude", "extensions", "outputs", "dedupe", "minify",
+            "minify_options", "tokenizer", "size_policy", "git_source"}
+READ_CACHE_MB = 256
+
+
+class BatchConfigError(ValueError):
+    pass
+
+
+class ReadCache:
+    # Raw file contents keyed by path, valid while mtime and size match; the least
+    # recently used entries are dropped once the total is over max_bytes
+    def __init__(self, max_bytes=READ_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path, stat):
+        entry = self.entries.get(file_path)
+        if entry is None or entry[:2] != (stat.st_mtime_ns, stat.st_size):
+            self.misses += 1
+            return None
+        self.entries.move_to_end(file_path)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, file_path, stat, raw):
+        if len(raw) > self.max_bytes:
+            return
+        old = self.entries.pop(file_path, None)
+        if old is not None:
+            self.total_bytes -= len(old[2])
+        self.entries[file_path] = (stat.st_mtime_ns, stat.st_size, raw)
+        self.total_bytes += len(raw)
+        while self.total_bytes > self.max_bytes:
+            _, (_, _, dropped) = self.entries.popitem(last=False)
+            self.total_bytes -= len(dropped)
+
+
+def load_job_file(job_file):
+    # The job file's jobs, each merged with its defaults and with absolute roots and outputs
+    with open(job_file, 'r', encoding='utf-8') as f:
+        definition = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(job_file))
+    defaults = definition.get("defaults", {})
+    jobs = []
+    for index, entry in enumerate(definition.get("jobs", [])):
+        job = {**defaults, **entry}
+        job.setdefault("name", f"job{index + 1}")
+        unknown = set(job) - JOB_KEYS
+        if unknown:
+            raise BatchConfigError(f"Job {job['name']} has unknown settings: {', '.join(sorted(unknown))}")
+        for key in ("roots", "outputs"):
+            paths = [job[key]] if isinstance(job.get(key), str) else job.get(key)
+            if not paths:
+                raise BatchConfigError(f"Job {job['name']} has no {key}.")
+            job[key] = [os.path.normpath(os.path.join(base_dir, os.path.expanduser(path))) for path in paths]
+        for key in ("include", "exclude"):
+            job[key] = [job[key]] if isinstance(job.get(key), str) else list(job.get(key, []))
+        if "extensions" in job:
+            job["extensions"] = [ext.lower() if ext.startswith(".") else f".{ext.lower()}" for ext in job["extensions"]]
+        jobs.append(job)
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise BatchConfigError(f"Duplicate job names: {', '.join(duplicates)}")
+    return jobs
+
+
+def matches_any(relative_path, patterns):
+    # "**/" also matches at the root, so "**/tests/**" covers "tests/test_app.py"
+    for pattern in patterns:
+        if fnmatch.fnmatch(relative_path, pattern):
+            return True
+        if pattern.startswith("**/") and fnmatch.fnmatch(relative_path, pattern[3:]):
+            return True
+    return False
+
+
+def is_inside(path, folder):
+    return path != folder and os.path.commonpath([path, folder]) == folder
+
+
+class BatchRunner:
+    def __init__(self, read_cache_mb=READ_CACHE_MB):
+        self.template = FileCombinerBackend()
+        self.read_cache = ReadCache(read_cache_mb * 1024 * 1024)
+        self.walks = {}  # (root, git_source) -> every file under the root
+
+    def create_backend(self, job):
+        backend = FileCombinerBackend()
+        # Shared warm state, as in combine_server.py: one process pool, one token cache, one read cache
+        backend.executor = self.template.get_executor()
+        backend.worker_count = self.template.worker_count
+        backend.file_cache = self.template.file_cache
+        backend.read_cache = self.read_cache
+        backend.supported_extensions = job.get("extensions", self.template.supported_extensions)
+        backend.git_source_enabled = bool(job.get("git_source", self.template.git_source_enabled))
+        backend.dedupe_enabled = bool(job.get("dedupe", self.template.dedupe_enabled))
+        backend.minify_enabled = bool(job.get("minify", self.template.minify_enabled))
+        backend.minify_options.update(job.get("minify_options", {}))
+        backend.tokenizer = job.get("tokenizer", self.template.tokenizer)
+        backend.size_policy = SizePolicy({**self.template.size_policy.options, **job.get("size_policy", {})})
+        return backend
+
+    def walk(self, backend, root):
+        # Each root is walked once; a root inside an already walked one is filtered from that walk
+        key = (root, backend.git_source_enabled)
+        if key not in self.walks:
+            outer = next((walked for walked, git_source in self.walks
+                          if git_source == backend.git_source_enabled and is_inside(root, walked)), None)
+            if outer is not None:
+                prefix = root.rstrip(os.sep) + os.sep
+                self.walks[key] = [path for path in self.walks[(outer, backend.git_source_enabled)] if path.startswith(prefix)]
+            elif backend.is_file(root):
+                self.walks[key] = [root]
+            elif backend.is_directory(root):
+                self.walks[key] = backend.scan_folder(root)[0]
+            else:
+                logging.warning(f"Root not found: {root}")
+                self.walks[key] = []
+        return self.walks[key]
+
+    def select_files(self, backend, job):
+        file_paths, selected = [], set()
+        for root in job["roots"]:
+            for file_path in self.walk(backend, root):
+                if file_path in selected or not backend.is_supported_file(file_path):
+                    continue
+                # A root that is a single file is matched by its name
+                relative_path = os.path.basename(file_path) if file_path == root else os.path.relpath(file_path, root).replace(os.sep, "/")
+                if job["include"] and not matches_any(relative_path, job["include"]):
+                    continue
+                if matches_any(relative_path, job["exclude"]):
+                    continue
+                selected.add(file_path)
+                file_paths.append(file_path)
+        return file_paths
+
+    def run_job(self, job, backend):
+        start = time.perf_counter()
+        backend.file_paths = self.select_files(backend, job)
+        if not backend.file_paths:
+            logging.warning(f"Job {job['name']} matched no files.")
+        for output_path in job["outputs"]:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        # Every output of a job is written from one pass over its files
+        with contextlib.ExitStack() as stack:
+            writers = [stack.enter_context(get_output_writer(output_path)) for output_path in job["outputs"]]
+            for file_path, header, body in prefetch(backend.iter_combined_sections()):
+                for writer in writers:
+                    writer.write_section(file_path, header, body)
+        return {"name": job["name"], "files": len(backend.file_paths), "tokens": backend.last_combine_stats.get("tokens", 0),
+                "seconds": time.perf_counter() - start, "outputs": job["outputs"], "error": None}
+
+    def run(self, jobs):
+        backends = [self.create_backend(job) for job in jobs]
+        # Outer roots first, so the roots inside them never need a walk of their own
+        roots = sorted({(root, backend) for job, backend in zip(jobs, backends) for root in job["roots"]},
+                       key=lambda item: len(item[0]))
+        for root, backend in roots:
+            self.walk(backend, root)
+        results = []
+        for job, backend in zip(jobs, backends):
+            try:
+                results.append(self.run_job(job, backend))
+            except Exception as e:
+                logging.exception(f"Job {job['name']} failed")
+                results.append({"name": job["name"], "files": len(backend.file_paths), "tokens": 0, "seconds": 0.0,
+                                "outputs": job["outputs"], "error": str(e)})
+        return results
+
+    def close(self):
+        if self.template.executor is not None:
+            self.template.executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the combine jobs defined in a job file.")
+    parser.add_argument("job_file")
+    parser.add_argument("--job", action="append", dest="jobs", metavar="NAME", help="run only this job (repeatable)")
+    parser.add_argument("--list", action="store_true", help="list the jobs and their files without combining")
+    parser.add_argument("--read-cache-mb", type=int, default=READ_CACHE_MB, help="memory for file contents shared between jobs")
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        jobs = load_job_file(options.job_file)
+    except (OSError, ValueError) as e:
+        parser.error(f"Could not load {options.job_file}: {e}")
+    if options.jobs:
+        unknown = set(options.jobs) - {job["name"] for job in jobs}
+        if unknown:
+            parser.error(f"Unknown jobs: {', '.join(sorted(unknown))}")
+        jobs = [job for job in jobs if job["name"] in options.jobs]
+
+    runner = BatchRunner(options.read_cache_mb)
+    if options.list:
+        for job in jobs:
+            file_paths = runner.select_files(runner.create_backend(job), job)
+            print(f"{job['name']}: {len(file_paths)} files -> {', '.join(job['outputs'])}")
+            for file_path in file_paths:
+                print(f"    {file_path}")
+        return
+
+    start = time.perf_counter()
+    try:
+        results = runner.run(jobs)
+    finally:
+        runner.close()
+    print(f"{'job':<24} {'files':>7} {'tokens':>10} {'seconds':>8}")
+    for result in results:
+        status = f"FAILED: {result['error']}" if result["error"] else ", ".join(result["outputs"])
+        print(f"{result['name']:<24} {result['files']:>7} {result['tokens']:>10} {result['seconds']:>8.2f}  {status}")
+    cache = runner.read_cache
+    print(f"{len(results)} jobs in {time.perf_counter() - start:.2f}s; {len(runner.walks)} roots walked or derived; "
+          f"read cache {cache.hits} hits, {cache.misses} misses")
+    if any(result["error"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
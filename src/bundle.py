@@ -0,0 +1,235 @@
+# bundle.py
+# Indexed combined-bundle format (.ccb).
+#
+# Layout:
+#   MAGIC line
+#   the plain combined text, byte for byte as combine_files() produces it
+#   JSON index (one entry per file: path, offsets, lengths, sha256, tokens)
+#   trailer: index offset and length as two 8-byte big-endian ints + TRAILER_MAGIC
+#
+# The index lives in a fixed-size trailer rather than at the front so the bundle
+# can be written in a single streaming pass; readers seek to the end first.
+import hashlib
+import json
+import os
+import struct
+
+from pending_output import PendingOutput
+from token_counter import count_tokens
+
+BUNDLE_EXTENSION = ".ccb"
+MAGIC = b"CCBUNDLE1\n"
+TRAILER_MAGIC = b"CCBIDX01"
+TRAILER = struct.Struct(">QQ8s")
+SECTION_SEPARATOR = "\n\n"
+
+
+class BundleFormatError(ValueError):
+    pass
+
+
+class BundleWriter:
+    # Written under a temp name (see pending_output.py): a failed write never leaves a bundle at output_path
+    def __init__(self, output_path, count_section_tokens=True):
+        self.output_path = output_path
+        self.count_section_tokens = count_section_tokens
+        self.pending = PendingOutput(output_path)
+        try:
+            self.file = open(self.pending.path, 'wb')
+        except BaseException:
+            self.pending.discard()
+            raise
+        self.file.write(MAGIC)
+        self.offset = len(MAGIC)
+        self.entries = []
+
+    def write_section(self, file_path, header, body):
+        header_bytes = header.encode('utf-8')
+        body_bytes = body.encode('utf-8')
+        content_length = len(body_bytes)
+        if body.endswith(SECTION_SEPARATOR):
+            content_length -= len(SECTION_SEPARATOR)
+        self.entries.append({
+            "path": file_path,
+            "offset": self.offset,
+            "header_length": len(header_bytes),
+            "length": len(body_bytes),
+            "content_length": content_length,
+            "sha256": hashlib.sha256(body_bytes[:content_length]).hexdigest(),
+            "tokens": count_tokens(header + body) if self.count_section_tokens else None,
+        })
+        self.file.write(header_bytes)
+        self.file.write(body_bytes)
+        self.offset += len(header_bytes) + len(body_bytes)
+
+    def close(self):
+        try:
+            index_bytes = json.dumps({"version": 1, "files": self.entries}).encode('utf-8')
+            self.file.write(index_bytes)
+            self.file.write(TRAILER.pack(self.offset, len(index_bytes), TRAILER_MAGIC))
+            self.file.close()
+        except BaseException:
+            self.abort()
+            raise
+        self.pending.commit()
+
+    def abort(self):
+        self.file.close()
+        self.pending.discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class BundleReader:
+    def __init__(self, bundle_path):
+        self.bundle_path = bundle_path
+        self.file = open(bundle_path, 'rb')
+        try:
+            self.entries = self.read_index()
+        except BaseException:
+            self.file.close()
+            raise
+        self.positions = {entry["path"]: position for position, entry in enumerate(self.entries)}
+
+    def read_index(self):
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise BundleFormatError(f"{self.bundle_path} is not a combined bundle.")
+        size = self.file.seek(0, os.SEEK_END)
+        if size < len(MAGIC) + TRAILER.size:
+            raise BundleFormatError(f"{self.bundle_path} has a missing or damaged index.")
+        self.file.seek(size - TRAILER.size)
+        self.body_end, index_length, trailer_magic = TRAILER.unpack(self.file.read(TRAILER.size))
+        if trailer_magic != TRAILER_MAGIC or not len(MAGIC) <= self.body_end <= size - TRAILER.size - index_length:
+            raise BundleFormatError(f"{self.bundle_path} has a missing or damaged index.")
+        self.file.seek(self.body_end)
+        try:
+            return json.loads(self.file.read(index_length))["files"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise BundleFormatError(f"{self.bundle_path} has a missing or damaged index: {e}")
+
+    def list_files(self):
+        return [dict(entry) for entry in self.entries]
+
+    def _entry(self, path_or_position):
+        if isinstance(path_or_position, int):
+            return self.entries[path_or_position]
+        if path_or_position not in self.positions:
+            raise KeyError(f"{path_or_position} is not in the bundle.")
+        return self.entries[self.positions[path_or_position]]
+
+    def _read_at(self, offset, length):
+        self.file.seek(offset)
+        return self.file.read(length).decode('utf-8')
+
+    def read_file(self, path_or_position):
+        entry = self._entry(path_or_position)
+        return self._read_at(entry["offset"] + entry["header_length"], entry["content_length"])
+
+    def read_section(self, path_or_position):
+        entry = self._entry(path_or_position)
+        return self._read_at(entry["offset"], entry["header_length"] + entry["length"])
+
+    def read_range(self, start, stop):
+        # Sections are contiguous, so a range of files is a single seek and read
+        entries = self.entries[start:stop]
+        if not entries:
+            return ""
+        first, last = entries[0], entries[-1]
+        end = last["offset"] + last["header_length"] + last["length"]
+        return self._read_at(first["offset"], end - first["offset"])
+
+    def to_plain_text(self):
+        return self._read_at(len(MAGIC), self.body_end - len(MAGIC))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def is_bundle_file(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def split_plain_text(text, file_paths):
+    # Recovers (file_path, header, body) sections from plain combined text when the
+    # file order is known. Each header is looked up after the previous section's
+    # blank-line separator, so a file that itself contains "\n\n# <next name>\n"
+    # would be split early.
+    headers = [f"# {os.path.basename(path)}\n" for path in file_paths]
+    starts = []
+    position = 0
+    for header in headers:
+        if text.startswith(header, position):
+            start = position
+        else:
+            start = text.find(SECTION_SEPARATOR + header, position)
+            if start == -1:
+                raise BundleFormatError(f"Could not find the section for {header.strip()} in the combined text.")
+            start += len(SECTION_SEPARATOR)
+        starts.append(start)
+        position = start + len(header)
+    starts.append(len(text))
+    for i, path in enumerate(file_paths):
+        yield path, headers[i], text[starts[i] + len(headers[i]):starts[i + 1]]
+
+
+def iter_plain_text_sections(lines, file_paths):
+    # split_plain_text over an iterable of lines (an open file), holding one section at a time
+    headers = [f"# {os.path.basename(path)}\n" for path in file_paths]
+    index, body, tail = 0, [], ""
+    for line in lines:
+        if index < len(headers) and line == headers[index] and (not body or tail.endswith(SECTION_SEPARATOR)):
+            if index:
+                yield file_paths[index - 1], headers[index - 1], "".join(body)
+            index, body, tail = index + 1, [], ""
+            continue
+        body.append(line)
+        tail = (tail + line)[-len(SECTION_SEPARATOR):]
+    if index < len(headers):
+        raise BundleFormatError(f"Could not find the section for {headers[index].strip()} in the combined text.")
+    if index:
+        yield file_paths[index - 1], headers[index - 1], "".join(body)
+
+
+def plain_text_to_bundle(text, file_paths, output_path):
+    with BundleWriter(output_path) as writer:
+        for file_path, header, body in split_plain_text(text, file_paths):
+            writer.write_section(file_path, header, body)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Inspect an indexed Code Combiner bundle.")
+    parser.add_argument("bundle")
+    parser.add_argument("command", choices=["list", "extract", "range", "plain"])
+    parser.add_argument("args", nargs="*", help="file path for 'extract', start and stop positions for 'range'")
+    options = parser.parse_args()
+
+    with BundleReader(options.bundle) as reader:
+        if options.command == "list":
+            for position, entry in enumerate(reader.list_files()):
+                print(f"{position}\t{entry['content_length']}\t{entry['tokens']}\t{entry['sha256'][:12]}\t{entry['path']}")
+        elif options.command == "extract":
+            sys.stdout.write(reader.read_file(options.args[0]))
+        elif options.command == "range":
+            sys.stdout.write(reader.read_range(int(options.args[0]), int(options.args[1])))
+        else:
+            sys.stdout.write(reader.to_plain_text())
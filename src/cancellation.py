@@ -0,0 +1,133 @@
+# cancellation.py
+# Cancel tokens for AI provider calls. A token carries a deadline and a user
+# cancel flag; provider code checks it between streamed chunks and registers
+# close callbacks, so a cancel (or the deadline watchdog) also interrupts a
+# read that is blocked on the network. Whatever was streamed so far travels
+# with the exception as .partial.
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_REQUEST_TIMEOUT = 300
+# How often waits that cannot be interrupted (queues, semaphores) look at the token
+POLL_SECONDS = 0.25
+
+
+class CallCancelled(Exception):
+    def __init__(self, message, partial=""):
+        super().__init__(message)
+        self.partial = partial
+
+
+class CallTimedOut(CallCancelled):
+    pass
+
+
+class CancelToken:
+    def __init__(self, timeout=None, parent=None):
+        self.parent = parent
+        self.lock = threading.Lock()
+        self.cancel_event = threading.Event()
+        self.expired_event = threading.Event()
+        self.callbacks = []
+        self.deadline = None
+        self.timer = None
+        if timeout:
+            self.start_deadline(timeout)
+
+    def start_deadline(self, timeout):
+        # Sets the deadline unless one is already running
+        with self.lock:
+            if self.deadline is not None:
+                return
+            self.deadline = time.monotonic() + timeout
+            self.timer = threading.Timer(timeout, self._expire)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _expire(self):
+        self.expired_event.set()
+        self._run_callbacks()
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.timer:
+            self.timer.cancel()
+        self._run_callbacks()
+
+    def _run_callbacks(self):
+        with self.lock:
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass # Closing an already finished stream may fail; the call is over either way
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def timed_out(self):
+        return self.expired_event.is_set() or (self.parent is not None and self.parent.timed_out)
+
+    def remaining(self):
+        # Seconds left before the nearest deadline (own or parent's), or None
+        deadlines = [token.deadline for token in (self, self.parent) if token is not None and token.deadline is not None]
+        return max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+
+    def error(self, partial=""):
+        # The exception for a stopped call, or None while the call may go on
+        if self.cancelled:
+            return CallCancelled("Request cancelled.", partial)
+        if self.timed_out or self.remaining() == 0:
+            return CallTimedOut("Request timed out.", partial)
+        return None
+
+    def check(self, partial=""):
+        error = self.error(partial)
+        if error is not None:
+            raise error
+
+    def wait(self, seconds):
+        # Sleeps up to seconds; returns True as soon as the token is cancelled
+        end = time.monotonic() + seconds
+        while not self.cancelled:
+            left = end - time.monotonic()
+            if left <= 0:
+                return False
+            self.cancel_event.wait(min(left, POLL_SECONDS))
+        return True
+
+    def on_cancel(self, callback):
+        # callback runs (once) on cancel or deadline; runs at once if already stopped
+        with self.lock:
+            stopped = self.cancel_event.is_set() or self.expired_event.is_set()
+            if not stopped:
+                self.callbacks.append(callback)
+        if self.parent is not None:
+            self.parent.on_cancel(callback)
+        if stopped:
+            callback()
+
+    def remove_callback(self, callback):
+        with self.lock:
+            if callback in self.callbacks:
+                self.callbacks.remove(callback)
+        if self.parent is not None:
+            self.parent.remove_callback(callback)
+
+    @contextmanager
+    def closing(self, stream):
+        # Closes stream from whichever thread cancels, unblocking a pending read
+        self.on_cancel(stream.close)
+        try:
+            yield stream
+        finally:
+            self.remove_callback(stream.close)
+
+    def finish(self):
+        # Stops the deadline watchdog once the call is done
+        if self.timer:
+            self.timer.cancel()
@@ -0,0 +1,452 @@
+# combine_server.py
+# Local HTTP (or Unix socket) service around FileCombinerBackend and AIProvider
+# so editor plugins and scripts can reuse the combine logic without the GUI.
+#
+#   GET  /health
+#   POST /files      {"paths": [...]}                          -> resolved file list
+#   POST /combine    {"paths": [...], "dedupe": bool, "minify": bool,
+#                     "minify_options": {...}, "tokenizer": "tiktoken:o200k_base",
+#                     "size_policy": {...}, "format": "text" | "json"}
+#   POST /summarize  {"text": "..."}, {"texts": [...]} or {"paths": [...]}, optional "provider"
+#                    ("texts" is a bulk job: batch endpoint where the provider has one)
+#                    A summary is cancelled (and a provider batch job with it) when the
+#                    client disconnects, and gives up with 504 after "timeout" seconds,
+#                    at most SUMMARY_TIMEOUT_SECONDS.
+#
+# POST bodies must be sent as Content-Type: application/json, and TCP requests
+# must name a loopback Host, so web pages cannot reach the service through
+# form posts or DNS rebinding. Idle keep-alive connections are closed after
+# IDLE_TIMEOUT_SECONDS so they cannot hold the request pool.
+#
+# The process pool, per-file cache, folder walks and recent combine results are
+# shared across requests, so repeating a combine of an unchanged project only
+# costs a stat sweep.
+import argparse
+import contextlib
+import ipaddress
+import json
+import logging
+import os
+import select
+import socket
+import socketserver
+import stat
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from ai_integration import AIProvider, load_preferences
+from cancellation import CallCancelled, CallTimedOut, CancelToken
+from file_combiner import FileCombinerBackend
+from jobs import SummaryJob
+from prompt_builder import PromptLayout
+from size_policy import SizePolicy
+
+DEFAULT_PORT = 8765
+RESULT_CACHE_SIZE = 16
+IDLE_TIMEOUT_SECONDS = 30
+# Longest a /summarize request may hold a pool worker, batch jobs included
+SUMMARY_TIMEOUT_SECONDS = 15 * 60
+# How often a running summary checks whether its client is still connected
+CLIENT_CHECK_SECONDS = 1
+LOOPBACK_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+
+def is_loopback(host):
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def host_name(host_header):
+    # "localhost:8765" -> "localhost", "[::1]:8765" -> "::1"
+    host = host_header.strip().lower()
+    if host.startswith("["):
+        return host[1:host.find("]")]
+    return host.rsplit(":", 1)[0] if host.count(":") == 1 else host
+
+
+class CombineService:
+    def __init__(self):
+        self.template = FileCombinerBackend()
+        self.lock = threading.Lock()
+        self.walk_cache = {}
+        self.result_cache = OrderedDict()
+        self.providers = {}
+        self.prompt_layouts = {}
+        self.job_locks = {}  # job id -> [lock, requests holding or waiting for it]
+        # Created here rather than on first use, so concurrent first requests cannot each start a pool
+        self.template.get_executor()
+
+    def create_backend(self, options):
+        backend = FileCombinerBackend()
+        # Shared warm state: one process pool and one per-file cache for every request
+        backend.executor = self.template.executor
+        backend.worker_count = self.template.worker_count
+        backend.file_cache = self.template.file_cache
+        backend.dedupe_enabled = bool(options.get("dedupe", self.template.dedupe_enabled))
+        backend.minify_enabled = bool(options.get("minify", self.template.minify_enabled))
+        backend.minify_options.update(options.get("minify_options", {}))
+        backend.tokenizer = options.get("tokenizer", self.template.tokenizer)
+        backend.size_policy = SizePolicy({**self.template.size_policy.options, **options.get("size_policy", {})})
+        return backend
+
+    def walk_folder(self, backend, folder_path):
+        # Reuses the previous walk while no folder under the root has changed. A walk
+        # taken from .git/index has no folder mtimes to check, so it is never cached.
+        cached = self.walk_cache.get(folder_path)
+        if cached is not None:
+            folder_mtimes, file_paths = cached
+            if all(self.folder_unchanged(path, mtime_ns) for path, mtime_ns in folder_mtimes.items()):
+                return file_paths
+        backend.folder_mtimes = {}
+        file_paths = [path for path in backend.get_files_from_folder(folder_path) if backend.is_supported_file(path)]
+        if backend.folder_mtimes:
+            with self.lock:
+                self.walk_cache[folder_path] = (dict(backend.folder_mtimes), file_paths)
+        return file_paths
+
+    def folder_unchanged(self, folder_path, mtime_ns):
+        try:
+            return os.stat(folder_path).st_mtime_ns == mtime_ns
+        except OSError:
+            return False
+
+    def resolve_paths(self, backend, paths):
+        file_paths = []
+        for path in paths:
+            if backend.is_directory(path):
+                file_paths.extend(self.walk_folder(backend, path))
+            elif backend.is_file(path) and backend.is_supported_file(path):
+                file_paths.append(path)
+        return file_paths
+
+    def fingerprint(self, file_paths):
+        entries = []
+        for file_path in file_paths:
+            try:
+                stat = os.stat(file_path)
+                entries.append((file_path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                entries.append((file_path, None, None))
+        return tuple(entries)
+
+    def cached_result(self, key, fingerprint):
+        with self.lock:
+            cached = self.result_cache.get(key)
+            if cached is None or cached[0] != fingerprint:
+                return None
+            self.result_cache.move_to_end(key)
+            return cached[1], cached[2]
+
+    def store_result(self, key, fingerprint, content, stats):
+        with self.lock:
+            self.result_cache[key] = (fingerprint, content, stats)
+            self.result_cache.move_to_end(key)
+            while len(self.result_cache) > RESULT_CACHE_SIZE:
+                self.result_cache.popitem(last=False)
+
+    def result_key(self, backend, file_paths):
+        options = json.dumps(backend.combine_options(), sort_keys=True)
+        return (tuple(file_paths), options)
+
+    def get_prompt_layout(self, file_paths):
+        # One layout per file set, so repeated summaries of a project keep a stable prefix
+        with self.lock:
+            return self.prompt_layouts.setdefault(frozenset(file_paths), PromptLayout())
+
+    @contextlib.contextmanager
+    def job_lock(self, job_id):
+        # Requests for the same job share its checkpoint, so they run one at a time
+        with self.lock:
+            entry = self.job_locks.setdefault(job_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self.job_locks[job_id]
+
+    def get_provider(self, provider_name):
+        preferences = load_preferences()
+        provider_name = provider_name or preferences.get("current_provider", "Google")
+        settings = preferences.get(provider_name, {})
+        with self.lock:
+            provider = self.providers.get(provider_name)
+            if provider is None:
+                provider = AIProvider(provider_name, settings)
+                self.providers[provider_name] = provider
+            else:
+                provider.settings = settings
+        return provider
+
+
+class CombineRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "CodeCombiner"
+    # Socket timeout: an idle keep-alive connection is closed instead of holding a pool worker
+    timeout = IDLE_TIMEOUT_SECONDS
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} - {format % args}")
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def send_json(self, payload, status=200, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def write_chunk(self, text):
+        data = text.encode('utf-8')
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+
+    def client_disconnected(self):
+        # Readable with nothing to read means the client closed its end
+        try:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            return bool(readable) and not self.connection.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    @contextlib.contextmanager
+    def cancel_on_disconnect(self, cancel_token):
+        stopped = threading.Event()
+        def watch():
+            while not stopped.wait(CLIENT_CHECK_SECONDS):
+                if self.client_disconnected():
+                    logging.info(f"{self.address_string()} disconnected; cancelling its {self.path} request.")
+                    cancel_token.cancel()
+                    return
+        threading.Thread(target=watch, name="client-watch", daemon=True).start()
+        try:
+            yield cancel_token
+        finally:
+            stopped.set()
+            cancel_token.finish()
+
+    def check_host(self):
+        # Unix sockets cannot be reached from a browser, so they have no allowed_hosts
+        allowed_hosts = self.server.allowed_hosts
+        if allowed_hosts is None or host_name(self.headers.get("Host", "")) in allowed_hosts:
+            return True
+        self.close_connection = True  # The body was not read
+        self.send_json({"error": "Requests must be addressed to localhost."}, status=403)
+        return False
+
+    def check_content_type(self):
+        content_type = self.headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+        if content_type == "application/json":
+            return True
+        self.close_connection = True
+        self.send_json({"error": "Request bodies must be sent as Content-Type: application/json."}, status=415)
+        return False
+
+    def do_GET(self):
+        if not self.check_host():
+            return
+        if self.path == "/health":
+            self.send_json({"status": "ok"})
+        else:
+            self.send_json({"error": f"Unknown endpoint {self.path}"}, status=404)
+
+    def do_POST(self):
+        if not self.check_host() or not self.check_content_type():
+            return
+        handlers = {"/files": self.handle_files, "/combine": self.handle_combine, "/summarize": self.handle_summarize}
+        handler = handlers.get(self.path)
+        if handler is None:
+            self.send_json({"error": f"Unknown endpoint {self.path}"}, status=404)
+            return
+        try:
+            handler(self.read_json())
+        except (ValueError, KeyError) as e:
+            self.send_json({"error": str(e)}, status=400)
+        except Exception as e:
+            logging.error(f"Error handling {self.path}: {e}")
+            self.send_json({"error": str(e)}, status=500)
+
+    def handle_files(self, request):
+        backend = self.service.create_backend(request)
+        self.send_json({"files": self.service.resolve_paths(backend, request["paths"])})
+
+    def handle_combine(self, request):
+        backend = self.service.create_backend(request)
+        backend.file_paths = self.service.resolve_paths(backend, request["paths"])
+        key = self.service.result_key(backend, backend.file_paths)
+        fingerprint = self.service.fingerprint(backend.file_paths)
+        cached = self.service.cached_result(key, fingerprint)
+
+        if request.get("format") == "json":
+            if cached is None:
+                content = backend.combine_files()
+                stats = dict(backend.last_combine_stats)
+                self.service.store_result(key, fingerprint, content, stats)
+            else:
+                content, stats = cached
+            self.send_json({"content": content, "files": backend.file_paths, "stats": stats},
+                           headers={"X-Combine-Cache": "hit" if cached else "miss"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("X-Combine-Cache", "hit" if cached else "miss")
+        self.send_header("X-File-Count", str(len(backend.file_paths)))
+        if cached is not None:
+            data = cached[0].encode('utf-8')
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        # Stream sections as the pipeline produces them
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        parts = []
+        try:
+            for _, header, body in backend.iter_combined_sections():
+                parts.append(header + body)
+                self.write_chunk(header + body)
+        except Exception as e:
+            # Headers are already sent; dropping the connection without the final chunk marks the response as incomplete
+            logging.error(f"Error while streaming combined output: {e}")
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+        self.service.store_result(key, fingerprint, "".join(parts), dict(backend.last_combine_stats))
+
+    def handle_summarize(self, request):
+        timeout = min(float(request.get("timeout", SUMMARY_TIMEOUT_SECONDS)), SUMMARY_TIMEOUT_SECONDS)
+        try:
+            with self.cancel_on_disconnect(CancelToken(timeout)) as cancel_token:
+                self.summarize(request, cancel_token)
+        except CallTimedOut as e:
+            self.send_json({"error": str(e), "partial": e.partial}, status=504)
+        except CallCancelled:
+            self.close_connection = True # Nobody is left to answer
+
+    def summarize(self, request, cancel_token):
+        if "texts" in request:
+            provider = self.service.get_provider(request.get("provider"))
+            summaries = provider.summarize_many(request["texts"], cancel_token=cancel_token)
+            self.send_json({"provider": provider.provider_name, "summaries": summaries})
+            return
+        provider = self.service.get_provider(request.get("provider"))
+        text = request.get("text")
+        if text is None:
+            backend = self.service.create_backend(request)
+            backend.file_paths = self.service.resolve_paths(backend, request["paths"])
+            job = SummaryJob(provider, backend.combine_files(), backend.file_paths, self.service.get_prompt_layout(backend.file_paths))
+        else:
+            job = SummaryJob(provider, text)
+        with self.service.job_lock(job.job_id):
+            summary = job.run(cancel_token=cancel_token)
+        self.send_json({"provider": provider.provider_name, "summary": summary})
+
+
+class BoundedPoolMixIn:
+    # Like ThreadingMixIn, but requests run on a fixed-size pool instead of a thread each
+    max_workers = 4
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+class CombineHTTPServer(BoundedPoolMixIn, HTTPServer):
+    def __init__(self, address, service, max_workers=4):
+        self.service = service
+        # A non-loopback bind (--allow-remote) is reached under names we cannot know
+        self.allowed_hosts = LOOPBACK_HOSTS if is_loopback(address[0]) else None
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        super().__init__(address, CombineRequestHandler)
+
+
+class CombineUnixServer(BoundedPoolMixIn, socketserver.UnixStreamServer):
+    def __init__(self, socket_path, service, max_workers=4):
+        self.service = service
+        self.allowed_hosts = None
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        # A stale socket from an earlier run is replaced; anything else at the path is left alone
+        try:
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                raise FileExistsError(f"{socket_path} exists and is not a socket")
+            os.remove(socket_path)
+        except FileNotFoundError:
+            pass
+        super().__init__(socket_path, CombineRequestHandler)
+
+
+def create_server(host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None, max_workers=4):
+    service = CombineService()
+    if unix_socket:
+        return CombineUnixServer(unix_socket, service, max_workers)
+    return CombineHTTPServer((host, port), service, max_workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Code Combiner over local HTTP or a Unix socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix-socket", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=4, help="maximum concurrent requests")
+    parser.add_argument("--allow-remote", action="store_true",
+                        help="allow a --host other than loopback; anyone who can reach it can read files and use your API keys")
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if not options.unix_socket and not is_loopback(options.host):
+        if not options.allow_remote:
+            parser.error(f"--host {options.host} is not a loopback address; pass --allow-remote to serve it anyway.")
+        logging.warning(f"SERVING ON {options.host}: anyone who can reach this address can read files on this machine "
+                        "and spend the configured API keys, and Host checks are off.")
+    try:
+        server = create_server(options.host, options.port, options.unix_socket, options.workers)
+    except OSError as e:
+        parser.error(str(e))
+    logging.info(f"Combine service listening on {options.unix_socket or f'http://{options.host}:{options.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,175 @@
 import os
 import json
 import re
+import codecs
+import hashlib
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from output_writers import get_output_writer, prefetch
+from token_counter import DEFAULT_TOKENIZER, count_tokens
+from minifier import DEFAULT_OPTIONS as DEFAULT_MINIFY_OPTIONS, MinifyTransform, get_extension
+from project_index import ProjectIndex
+from prompt_builder import PromptLayout
+from relevance_index import RelevanceIndex
+from git_source import GitIndexError, get_changed_files, get_tracked_files
+from size_policy import (ACTION_EXCERPT, ACTION_SKIP, ACTION_SUMMARY, BYTES_PER_TOKEN,
+                         SizePolicy, SummaryCache, read_excerpt, read_summary_input, skip_note)
+
+# Inputs below either threshold run serially; a process pool costs more than it saves there
+SERIAL_MAX_FILES = 64
+SERIAL_MAX_BYTES = 4 * 1024 * 1024
+# Small files are shipped to workers in batches to cut pickling/IPC overhead
+BATCH_TARGET_BYTES = 1024 * 1024
+BATCH_MAX_FILES = 256
+
+
+def decode_content(raw):
+    # Same result as open(..., encoding='utf-8') in text mode, plus BOM-marked UTF-16
+    if raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        text = raw.decode('utf-16')
+    else:
+        text = raw.decode('utf-8')
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def process_file(file_path, raw, transforms, count_original, tokenizer=None):
+    # CPU-bound stages for one file: decode -> transform -> hash -> count
+    file_name = os.path.basename(file_path)
+    ext = get_extension(file_path)
+    header = f"# {file_name}\n"
+    result = {"path": file_path, "header": header, "content": None, "error": None,
+              "digest": None, "tokens": 0, "original_tokens": 0, "transformed_tokens": 0}
+    if raw is None:
+        result["body"] = ""
+    elif isinstance(raw, str):
+        # Stand-in text from the size policy (excerpt, summary or skip note); not transformed
+        result["content"] = raw
+        result["body"] = raw + "\n\n"
+    else:
+        try:
+            content = decode_content(raw)
+        except UnicodeDecodeError as e:
+            result["error"] = f"UnicodeDecodeError reading {file_path}: {e}"
+            result["body"] = f"Error reading file {file_name}: Could not decode.\n\n"
+        else:
+            if count_original:
+                result["original_tokens"] = count_tokens(content, ext, tokenizer)
+            for transform in transforms:
+                content = transform(content, file_path)
+            if count_original:
+                result["transformed_tokens"] = count_tokens(content, ext, tokenizer)
+            result["content"] = content
+            result["body"] = content + "\n\n"
+            result["digest"] = hashlib.blake2b(result["body"].encode('utf-8'), digest_size=16).digest()
+    result["tokens"] = count_tokens(header + result["body"], ext, tokenizer)
+    return result
+
+
+def process_batch(batch, transforms, count_original, tokenizer=None):
+    return [process_file(file_path, raw, transforms, count_original, tokenizer) for file_path, raw in batch]
+
+
+class FilePipeline:
+    # read (main process) -> decode -> transform -> count (worker processes for large inputs)
+    def __init__(self, transforms=None, count_original=False, executor=None, tokenizer=None, size_policy=None, summarize=None,
+                 read_cache=None, workers=1):
+        self.transforms = transforms or []
+        self.count_original = count_original
+        self.executor = executor
+        self.workers = workers  # how many processes the executor runs; sets how many batches stay in flight
+        self.tokenizer = tokenizer  # tokenizer id; workers load it once and keep it
+        self.size_policy = size_policy
+        self.summarize = summarize  # summarize(file_path, stat) -> summary text or None
+        self.read_cache = read_cache  # shared raw contents across combines (see batch_runner.ReadCache)
+        self.file_stats = {}
+        self.size_limited = {}  # path -> (action taken, mtime_ns, size) for files over their size limit
+
+    def read(self, file_path):
+        try:
+            if self.size_policy is not None and self.size_policy.enabled:
+                # Checked on a stat, before any of the file is read
+                stat = os.stat(file_path)
+                rule = self.size_policy.limit(file_path, stat.st_size)
+                if rule is not None:
+                    return self.read_limited(file_path, stat, rule)
+            with open(file_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                self.file_stats[file_path] = (stat.st_mtime_ns, stat.st_size)
+                if self.read_cache is None:
+                    return f.read()
+                raw = self.read_cache.get(file_path, stat)
+                if raw is None:
+                    raw = f.read()
+                    self.read_cache.put(file_path, stat, raw)
+                return raw
+        except Exception as e:
+            logging.error(f"Error reading file - {file_path}: {e}")
+            return None
+
+    def read_limited(self, file_path, stat, rule):
+        # Stand-in text for a file over its size limit; summaries fall back to an excerpt
+        action = rule["action"]
+        text = None
+        if action == ACTION_SUMMARY:
+            summary = self.summarize(file_path, stat) if self.summarize else None
+            if summary:
+                text = f"(AI summary of a {stat.st_size} byte file)\n{summary.strip()}"
+            else:
+                action = ACTION_EXCERPT
+        if action == ACTION_SKIP:
+            text = skip_note(stat.st_size, rule)
+        elif action == ACTION_EXCERPT:
+            text = read_excerpt(file_path, stat.st_size, rule)
+        self.size_limited[file_path] = (action, stat.st_mtime_ns, stat.st_size)
+        return text
+
+    def iter_batches(self, file_paths):
+        batch, batch_bytes = [], 0
+        for file_path in file_paths:
+            raw = self.read(file_path)
+            batch.append((file_path, raw))
+            batch_bytes += len(raw) if raw else 0
+            if batch_bytes >= BATCH_TARGET_BYTES or len(batch) >= BATCH_MAX_FILES:
+                yield batch
+                batch, batch_bytes = [], 0
+        if batch:
+            yield batch
+
+    def should_run_serially(self, file_paths):
+        if self.executor is None or len(file_paths) < SERIAL_MAX_FILES:
+            return True
+        total_bytes = 0
+        for file_path in file_paths:
+            try:
+                total_bytes += os.path.getsize(file_path)
+            except OSError:
+                continue
+            if total_bytes >= SERIAL_MAX_BYTES:
+                return False
+        return True
+
+    def run(self, file_paths):
+        if self.should_run_serially(file_paths):
+            for file_path in file_paths:
+                yield from self.log_errors(process_batch([(file_path, self.read(file_path))], self.transforms, self.count_original, self.tokenizer))
+            return
+        # Keep a bounded number of batches in flight so reading overlaps with processing
+        pending = deque()
+        window = max(1, self.workers) * 2
+        for batch in self.iter_batches(file_paths):
+            pending.append(self.executor.submit(process_batch, batch, self.transforms, self.count_original, self.tokenizer))
+            while len(pending) > window:
+                yield from self.log_errors(pending.popleft().result())
+        while pending:
+            yield from self.log_errors(pending.popleft().result())
+
+    def log_errors(self, results):
+        for result in results:
+            if result["error"]:
+                logging.error(result["error"])
+            yield result
+
 
 class FileCombinerBackend:
     def __init__(self):
@@ -18,6 +186,33 @@ class FileCombinerBackend:
         ]
         self.supported_extensions = []
         self.file_paths = []
+        self.dedupe_enabled = False
+        self.minify_enabled = False
+        self.git_source_enabled = False
+        self.minify_options = dict(DEFAULT_MINIFY_OPTIONS)
+        self.size_policy = SizePolicy()
+        # Combined outputs over a quarter of this stay on disk (see memory_budget.py); 0 turns it off
+        self.memory_budget_mb = 0
+        # Summaries for the "summary" large-file action; made by summarize_large_file() before a combine
+        self.summary_cache = SummaryCache()
+        self.last_combine_stats = {}
+        self.executor = None
+        self.worker_count = os.cpu_count() or 1
+        # Raw file contents shared between combines; set by batch_runner.py so overlapping jobs read a file once
+        self.read_cache = None
+        # Tokenizer id of the selected model (see models.json); the UI sets it before combining
+        self.tokenizer = DEFAULT_TOKENIZER
+        # Saved-project state: imported roots, folder mtimes seen while walking, and
+        # per-file digest/token counts keyed by path (valid while mtime and size match)
+        self.roots = []
+        self.folder_mtimes = {}
+        self.seen_files = set()
+        self.file_cache = {}
+        # Full list the relevance selection ranks over, kept while a selection is active
+        self.relevance_index = RelevanceIndex()
+        self.candidate_file_paths = []
+        # File order of the last summary prompt, kept so re-summaries share a cacheable prefix
+        self.prompt_layout = PromptLayout()
         self.load_config()
 
     def load_config(self):
@@ -25,6 +220,12 @@ class FileCombinerBackend:
             with open(self.config_file, 'r') as f:
                 config = json.load(f)
                 self.supported_extensions = config.get('supported_extensions', self.default_supported_extensions)
+                self.dedupe_enabled = config.get('dedupe_enabled', False)
+                self.minify_enabled = config.get('minify_enabled', False)
+                self.git_source_enabled = config.get('git_source_enabled', False)
+                self.minify_options.update(config.get('minify_options', {}))
+                self.size_policy = SizePolicy(config.get('size_policy'))
+                self.memory_budget_mb = config.get('memory_budget_mb', 0)
         except (FileNotFoundError, json.JSONDecodeError):
             logging.warning("Config file not found or invalid. Using default extensions.")
             self.supported_extensions = self.default_supported_extensions
@@ -32,7 +233,13 @@ class FileCombinerBackend:
     def save_config(self):
         try:
             with open(self.config_file, 'w') as f:
-                json.dump({'supported_extensions': self.supported_extensions}, f, indent=4)
+                json.dump({'supported_extensions': self.supported_extensions,
+                           'dedupe_enabled': self.dedupe_enabled,
+                           'minify_enabled': self.minify_enabled,
+                           'minify_options': self.minify_options,
+                           'size_policy': self.size_policy.options,
+                           'memory_budget_mb': self.memory_budget_mb,
+                           'git_source_enabled': self.git_source_enabled}, f, indent=4)
                 logging.info("Configuration saved.")
         except Exception as e:
             logging.error(f"Error saving config: {e}")
@@ -44,11 +251,43 @@ class FileCombinerBackend:
         return os.path.isfile(path)
 
     def get_files_from_folder(self, folder_path):
+        file_paths, folder_mtimes = self.scan_folder(folder_path)
+        self.add_scanned_folder(folder_path, file_paths, folder_mtimes)
+        return file_paths
+
+    def scan_folder(self, folder_path):
+        # (file_paths, folder_mtimes) without touching the backend state, so it can run off the UI thread
+        if self.git_source_enabled:
+            # Tracked files from .git/index; falls back to walking outside repositories
+            try:
+                tracked_files = get_tracked_files(folder_path)
+            except (GitIndexError, OSError) as e:
+                logging.warning(f"Could not read git index for {folder_path}, walking the folder instead: {e}")
+                tracked_files = None
+            if tracked_files is not None:
+                return tracked_files, {}
         file_paths = []
+        folder_mtimes = {}
         for root, _, files in os.walk(folder_path):
+            try:
+                folder_mtimes[root] = os.stat(root).st_mtime_ns
+            except OSError:
+                pass
             for file in files:
                 file_paths.append(os.path.join(root, file))
-        return file_paths
+        return file_paths, folder_mtimes
+
+    def add_scanned_folder(self, folder_path, file_paths, folder_mtimes):
+        if folder_path not in self.roots:
+            self.roots.append(folder_path)
+        self.folder_mtimes.update(folder_mtimes)
+        self.seen_files.update(file_paths)
+
+    def get_changed_files_from_folder(self, folder_path, since_commit):
+        changed_files = get_changed_files(folder_path, since_commit)
+        if changed_files is None:
+            raise GitIndexError(f"{folder_path} is not inside a git repository.")
+        return changed_files
 
     def is_supported_file(self, file_path):
         file_name = os.path.basename(file_path)
@@ -60,25 +299,173 @@ class FileCombinerBackend:
 
     def add_file_path(self, file_path):
         self.file_paths.append(file_path)
+        if self.candidate_file_paths:
+            self.candidate_file_paths.append(file_path)
+
+    def add_file_paths(self, file_paths):
+        self.file_paths.extend(file_paths)
+        if self.candidate_file_paths:
+            self.candidate_file_paths.extend(file_paths)
+
+    def remove_file_path(self, file_path):
+        # Also dropped from the relevance candidates, so the next selection cannot bring it back
+        for file_paths in (self.file_paths, self.candidate_file_paths):
+            if file_path in file_paths:
+                file_paths.remove(file_path)
 
     def clear_file_paths(self):
         self.file_paths.clear()
+        self.roots.clear()
+        self.folder_mtimes.clear()
+        self.seen_files.clear()
+        self.candidate_file_paths.clear()
 
-    def combine_files(self):
-        combined_content = ""
+    def relevance_candidates(self):
+        # A copy of the list the selection ranks over: the full list from before any selection
+        if not self.candidate_file_paths:
+            self.candidate_file_paths = list(self.file_paths)
+        return list(self.candidate_file_paths)
+
+    def update_relevance_index(self, file_paths):
+        # Reads and tokenizes new or changed files, so the UI runs it on a worker thread
+        self.relevance_index.update(file_paths, self.file_cache, self.tokenizer)
+
+    def select_relevant_files(self, query, token_budget):
+        self.update_relevance_index(self.relevance_candidates())
+        return self.apply_relevance_selection(query, token_budget)
+
+    def apply_relevance_selection(self, query, token_budget):
+        # Keeps the best-ranked indexed files for the query that fit the budget, in their original order
+        selected, used_tokens = self.relevance_index.select_within_budget(query, token_budget)
+        selected = set(selected)
+        self.file_paths = [file_path for file_path in self.candidate_file_paths if file_path in selected]
+        return used_tokens
+
+    def save_project(self, index_path):
+        ProjectIndex(index_path).save(self.roots, self.folder_mtimes, self.seen_files, self.file_paths, self.file_cache)
+
+    def open_project(self, index_path):
+        self.roots, self.folder_mtimes, self.seen_files, self.file_paths, cache = ProjectIndex(index_path).load(self.is_supported_file)
+        self.file_cache.update(cache)
+
+    def cached_token_count(self):
+        # Token total from the cache when every file is still unchanged, otherwise None
+        total = 0
+        for file_path in self.file_paths:
+            entry = self.file_cache.get(file_path)
+            if not entry or entry.get("tokens") is None or entry.get("tokenizer", DEFAULT_TOKENIZER) != self.tokenizer:
+                return None
+            total += entry["tokens"]
+        return total
+
+    def get_executor(self):
+        # Created on first large combine and kept warm for later ones
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.worker_count)
+        return self.executor
+
+    def create_pipeline(self):
+        transforms = [MinifyTransform(self.minify_options)] if self.minify_enabled else []
+        return FilePipeline(transforms, count_original=self.minify_enabled, executor=self.get_executor(), tokenizer=self.tokenizer,
+                            size_policy=self.size_policy, summarize=self.large_file_summary, read_cache=self.read_cache, workers=self.worker_count)
+
+    def large_file_summary(self, file_path, stat):
+        # Cached AI summary of a file over its size limit, or None (the pipeline then uses an excerpt).
+        # Never calls the AI provider, so a combine cannot block on the network.
+        return self.summary_cache.get(file_path, stat)
+
+    def files_needing_summaries(self):
+        # (file_path, stat) for files over their limit with the "summary" action and no cached summary
+        pending = []
+        if not self.size_policy.uses_action(ACTION_SUMMARY):
+            return pending
         for file_path in self.file_paths:
             try:
-                file_name = os.path.basename(file_path)
-                combined_content += f"# {file_name}\n"
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    combined_content += f.read() + "\n\n"
-            except UnicodeDecodeError as e:
-                logging.error(f"UnicodeDecodeError reading {file_path}: {e}")
-                combined_content += f"Error reading file {file_name}: Could not decode.\n\n"
-            except Exception as e:
-                logging.error(f"Error reading file - {file_path}: {e}")
+                stat = os.stat(file_path)
+            except OSError:
                 continue
-        return combined_content
+            rule = self.size_policy.limit(file_path, stat.st_size)
+            if rule is not None and rule["action"] == ACTION_SUMMARY and self.summary_cache.get(file_path, stat) is None:
+                pending.append((file_path, stat))
+        return pending
+
+    def summarize_large_file(self, file_path, stat, summarize):
+        # summarize(text) -> summary; runs off the UI thread, and sends at most SUMMARY_INPUT_BYTES of the file
+        summary = summarize(read_summary_input(file_path, stat.st_size))
+        self.summary_cache.put(file_path, stat, summary)
+        return summary
+
+    def iter_combined_sections(self, file_paths=None, first_seen=None):
+        # file_paths/first_seen let a resumed job (jobs.py) continue where its checkpoint ends
+        stats = {"tokens": 0, "duplicates": 0, "bytes_saved": 0, "tokens_saved": 0,
+                 "tokens_before_minify": 0, "tokens_after_minify": 0,
+                 "size_limited": 0, "size_bytes_saved": 0, "size_tokens_saved": 0}
+        self.last_combine_stats = stats
+        first_seen = {} if first_seen is None else first_seen
+        pipeline = self.create_pipeline()
+        for result in pipeline.run(list(self.file_paths if file_paths is None else file_paths)):
+            body, tokens = result["body"], result["tokens"]
+            if not pipeline.transforms and result["path"] in pipeline.file_stats:
+                mtime_ns, size = pipeline.file_stats[result["path"]]
+                self.file_cache[result["path"]] = {"mtime_ns": mtime_ns, "size": size,
+                                                   "digest": result["digest"], "tokens": result["tokens"],
+                                                   "tokenizer": self.tokenizer}
+            if result["path"] in pipeline.size_limited:
+                self.count_size_savings(result, pipeline.size_limited[result["path"]], stats)
+            elif result["content"] is not None:
+                if self.minify_enabled:
+                    stats["tokens_before_minify"] += result["original_tokens"]
+                    stats["tokens_after_minify"] += result["transformed_tokens"]
+                if self.dedupe_enabled:
+                    body, tokens = self.dedupe_body(result, first_seen, stats)
+            stats["tokens"] += tokens
+            yield result["path"], result["header"], body
+
+    def count_size_savings(self, result, limited, stats):
+        # The full file was never counted, so its tokens come from the cache or a size estimate
+        _, mtime_ns, size = limited
+        entry = self.file_cache.get(result["path"])
+        if entry and (entry.get("mtime_ns"), entry.get("size"), entry.get("tokenizer", DEFAULT_TOKENIZER)) == (mtime_ns, size, self.tokenizer):
+            full_tokens = entry["tokens"]
+        else:
+            full_tokens = size // BYTES_PER_TOKEN
+        stats["size_limited"] += 1
+        stats["size_bytes_saved"] += max(0, size - len(result["body"].encode('utf-8')))
+        stats["size_tokens_saved"] += max(0, full_tokens - result["tokens"])
+
+    def dedupe_body(self, result, first_seen, stats):
+        digest = result["digest"]
+        if digest not in first_seen:
+            first_seen[digest] = result["path"]
+            return result["body"], result["tokens"]
+        reference = f"(Identical to {first_seen[digest]})\n\n"
+        if len(reference) >= len(result["body"]):
+            # Tiny files such as an empty __init__.py cost less than the reference would
+            return result["body"], result["tokens"]
+        reference_tokens = count_tokens(result["header"] + reference, tokenizer=self.tokenizer)
+        if reference_tokens >= result["tokens"]:
+            return result["body"], result["tokens"]
+        stats["duplicates"] += 1
+        stats["bytes_saved"] += len(result["body"].encode('utf-8')) - len(reference.encode('utf-8'))
+        stats["tokens_saved"] += result["tokens"] - reference_tokens
+        return reference, reference_tokens
+
+    def combine_options(self):
+        # Everything besides the file list that changes the combined output
+        return [self.dedupe_enabled, self.minify_enabled, self.minify_options, self.tokenizer, self.size_policy.options]
+
+    def build_summary_prompt(self, combined_text):
+        return self.prompt_layout.build(combined_text, self.file_paths)
+
+    def combine_files(self):
+        return "".join(header + body for _, header, body in self.iter_combined_sections())
+
+    def save_combined_file(self, output_path):
+        # Reading runs in a background thread so compression overlaps with disk reads
+        with get_output_writer(output_path) as writer:
+            for file_path, header, body in prefetch(self.iter_combined_sections()):
+                writer.write_section(file_path, header, body)
+        logging.info(f"Combined files written to {output_path}")
 
     def add_extension(self, ext):
         if ext not in self.supported_extensions:
@@ -0,0 +1,90 @@
+# file_importer.py
+# Background import of dropped or opened paths. A worker thread walks folders
+# and filters out unsupported files; the UI drains its queue a few batches per
+# frame, so importing thousands of files costs a handful of Tk calls per batch
+# instead of several per file. Skipped files are reported once, at the end.
+import logging
+import queue
+import threading
+from collections import Counter
+
+from minifier import get_extension
+
+IMPORT_BATCH_SIZE = 500
+# Extensions named in the skipped-files message; the rest are counted
+SKIPPED_EXTENSIONS_SHOWN = 5
+
+
+class ImportScan:
+    # Messages on self.messages, in order:
+    #   ("folder", (folder_path, file_paths, folder_mtimes))  a walked folder, to register with the backend
+    #   ("files", (accepted, skipped))                         one batch of filtered files
+    #   ("error", message)
+    #   ("done", None)                                         always last, also after cancel()
+    def __init__(self, backend, paths, batch_size=IMPORT_BATCH_SIZE):
+        self.backend = backend
+        self.paths = list(paths)
+        self.batch_size = batch_size
+        self.messages = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="file-import", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _run(self):
+        loose_files = []
+        try:
+            for path in self.paths:
+                if self.cancelled.is_set():
+                    return
+                if self.backend.is_directory(path):
+                    # Files dropped before the folder keep their place in the list
+                    self._post_files(loose_files)
+                    loose_files = []
+                    file_paths, folder_mtimes = self.backend.scan_folder(path)
+                    self.messages.put(("folder", (path, file_paths, folder_mtimes)))
+                    self._post_files(file_paths)
+                elif self.backend.is_file(path):
+                    loose_files.append(path)
+            self._post_files(loose_files)
+        except Exception as e:
+            logging.exception("Import failed")
+            self.messages.put(("error", f"Import failed: {e}"))
+        finally:
+            self.messages.put(("done", None))
+
+    def _post_files(self, file_paths):
+        for start in range(0, len(file_paths), self.batch_size):
+            if self.cancelled.is_set():
+                return
+            accepted, skipped = [], []
+            for file_path in file_paths[start:start + self.batch_size]:
+                (accepted if self.backend.is_supported_file(file_path) else skipped).append(file_path)
+            self.messages.put(("files", (accepted, skipped)))
+
+    def drain(self, max_messages):
+        # Up to max_messages queued messages, without blocking
+        messages = []
+        while len(messages) < max_messages:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        return messages
+
+
+def describe_skipped(skipped_files):
+    # One message for every file an import left out, grouped by extension
+    if len(skipped_files) == 1:
+        return f"Unsupported extension - {skipped_files[0]}. If it's a code file, use 'Preferences -> Manage Extensions' to add it."
+    extensions = Counter(get_extension(file_path) or "no extension" for file_path in skipped_files)
+    shown = [f"{ext} ({count})" for ext, count in extensions.most_common(SKIPPED_EXTENSIONS_SHOWN)]
+    if len(extensions) > SKIPPED_EXTENSIONS_SHOWN:
+        shown.append(f"{len(extensions) - SKIPPED_EXTENSIONS_SHOWN} more")
+    return (f"Skipped {len(skipped_files)} unsupported files: {', '.join(shown)}. "
+            "If they're code files, use 'Preferences -> Manage Extensions' to add them.")
@@ -0,0 +1,145 @@
+# git_source.py
+# Lists tracked files straight from .git/index (versions 2-4) so repositories
+# can be imported without walking the working tree. Ignored and untracked
+# files are never in the index, so they are skipped for free.
+import logging
+import os
+import struct
+import subprocess
+
+INDEX_HEADER = struct.Struct(">4sLL")
+# ctime, mtime (seconds + nanoseconds), dev, ino, mode, uid, gid, size, sha-1, flags
+ENTRY_HEADER = struct.Struct(">LLLLLLLLLL20sH")
+FLAG_EXTENDED = 0x4000
+FLAG_STAGE_MASK = 0x3000
+FLAG_NAME_MASK = 0x0FFF
+EXTENDED_SKIP_WORKTREE = 0x4000
+MODE_DIRECTORY = 0o040000
+MODE_GITLINK = 0o160000
+
+
+class GitIndexError(ValueError):
+    pass
+
+
+def find_git_dir(path):
+    # Returns (work_tree, git_dir) for the repository containing path, or (None, None)
+    current = os.path.abspath(path)
+    if os.path.isfile(current):
+        current = os.path.dirname(current)
+    while True:
+        candidate = os.path.join(current, ".git")
+        if os.path.isdir(candidate):
+            return current, candidate
+        if os.path.isfile(candidate):
+            # Worktrees and submodules use a ".git" file pointing at the real git dir
+            with open(candidate, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            if content.startswith("gitdir:"):
+                git_dir = content[len("gitdir:"):].strip()
+                return current, os.path.normpath(os.path.join(current, git_dir))
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None, None
+        current = parent
+
+
+def _read_varint(data, position):
+    # Offset encoding used by index v4 path compression
+    byte = data[position]
+    position += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[position]
+        position += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, position
+
+
+def read_git_index(git_dir):
+    # Returns tracked paths (relative, "/"-separated) in index order
+    index_path = os.path.join(git_dir, "index")
+    try:
+        with open(index_path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    signature, version, entry_count = INDEX_HEADER.unpack_from(data, 0)
+    if signature != b"DIRC" or version not in (2, 3, 4):
+        raise GitIndexError(f"Unsupported git index at {index_path} (version {version}).")
+
+    paths = []
+    position = INDEX_HEADER.size
+    previous_name = b""
+    for _ in range(entry_count):
+        entry_start = position
+        fields = ENTRY_HEADER.unpack_from(data, position)
+        mode, flags = fields[6], fields[11]
+        position += ENTRY_HEADER.size
+        extended_flags = 0
+        if version >= 3 and flags & FLAG_EXTENDED:
+            extended_flags = struct.unpack_from(">H", data, position)[0]
+            position += 2
+
+        if version == 4:
+            strip_length, position = _read_varint(data, position)
+            end = data.index(b"\0", position)
+            name = previous_name[:len(previous_name) - strip_length] + data[position:end]
+            position = end + 1
+        else:
+            name_length = flags & FLAG_NAME_MASK
+            if name_length < FLAG_NAME_MASK:
+                end = position + name_length
+            else:
+                end = data.index(b"\0", position)
+            name = data[position:end]
+            # Entries are NUL-padded to a multiple of eight bytes
+            entry_length = end - entry_start
+            position = entry_start + ((entry_length + 8) & ~7)
+        previous_name = name
+
+        path = name.decode('utf-8', errors='surrogateescape')
+        if paths and (flags & FLAG_STAGE_MASK) and paths[-1] == path:
+            continue # During a merge conflict the path is listed once per stage
+        if extended_flags & EXTENDED_SKIP_WORKTREE:
+            continue # Not checked out (sparse checkout)
+        if mode & 0o170000 in (MODE_DIRECTORY, MODE_GITLINK):
+            continue # Sparse-index directories and submodules
+        paths.append(path)
+    return paths
+
+
+def get_tracked_files(folder_path):
+    # Absolute paths of tracked files under folder_path, or None if it is not in a repository
+    work_tree, git_dir = find_git_dir(folder_path)
+    if work_tree is None:
+        return None
+    try:
+        prefix = os.path.relpath(os.path.abspath(folder_path), work_tree).replace(os.sep, "/")
+    except ValueError as e:
+        # Windows: the folder and the work tree are on different drives or UNC shares
+        raise GitIndexError(f"{folder_path} is not under the work tree {work_tree}: {e}")
+    prefix = "" if prefix == "." else prefix + "/"
+    return [os.path.join(work_tree, *path.split("/")) for path in read_git_index(git_dir) if path.startswith(prefix)]
+
+
+def get_changed_files(folder_path, since_commit):
+    # Files under folder_path that differ from since_commit (committed or not). Uses
+    # the local git binary only; deleted files are left out.
+    work_tree, _ = find_git_dir(folder_path)
+    if work_tree is None:
+        return None
+    if not since_commit or since_commit.startswith("-"):
+        raise GitIndexError(f"Invalid commit: {since_commit}")
+    try:
+        result = subprocess.run(
+            ["git", "-C", work_tree, "diff", "--name-only", "--no-renames", "--diff-filter=d", "-z", since_commit, "--", os.path.abspath(folder_path)],
+            capture_output=True, check=True,
+        )
+    except FileNotFoundError:
+        raise GitIndexError("Selecting changed files needs the 'git' command to be installed.")
+    except subprocess.CalledProcessError as e:
+        raise GitIndexError(f"git diff against {since_commit} failed: {e.stderr.decode('utf-8', errors='replace').strip()}")
+    paths = [path for path in result.stdout.decode('utf-8', errors='surrogateescape').split("\0") if path]
+    logging.info(f"{len(paths)} files changed since {since_commit} in {work_tree}.")
+    return [os.path.join(work_tree, *path.split("/")) for path in paths]
@@ -0,0 +1,322 @@
+# jobs.py
+# Resumable combine and summarize jobs. A job's id is a digest of its inputs,
+# so running the same job again after a crash or a closed window finds its
+# checkpoint: a combine keeps the output written so far and the files it
+# covers, a summary keeps every finished chunk summary. Checkpoints are
+# replaced atomically and removed once the job completes.
+import hashlib
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+
+from bundle import BundleFormatError, iter_plain_text_sections, split_plain_text
+from cancellation import CallCancelled, CancelToken
+from memory_budget import SpilledText
+from prompt_builder import SUMMARY_INSTRUCTIONS, SummaryPrompt
+from token_counter import count_tokens
+
+JOBS_DIR = "jobs"
+# Most work a crash can lose from a combine
+CHECKPOINT_SECONDS = 2.0
+# Checkpoints of jobs that were never resumed are dropped after a week
+JOB_MAX_AGE_SECONDS = 7 * 24 * 3600
+MERGE_INSTRUCTIONS = ("The following are summaries of consecutive parts of one text. "
+                      "Combine them into a single summary of the whole text:")
+# Lines longer than the chunk budget are cut every this many characters per budget token
+CHARS_PER_TOKEN = 2
+# Spilled text without file sections is read in pieces of about this many characters
+SPILLED_PIECE_CHARS = 1024 * 1024
+
+
+def make_job_id(kind, *inputs):
+    digest = hashlib.blake2b(json.dumps(inputs, sort_keys=True).encode('utf-8'), digest_size=12).hexdigest()
+    return f"{kind}-{digest}"
+
+
+def text_digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class JobStore:
+    def __init__(self, directory=JOBS_DIR):
+        self.directory = directory
+
+    def checkpoint_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def output_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.out")
+
+    def load(self, job_id):
+        try:
+            with open(self.checkpoint_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, job_id, state):
+        # Written beside the checkpoint and renamed over it, so a crash leaves the old or the new one
+        # (a temp file of its own, so concurrent saves never write into each other's)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f"{job_id}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.checkpoint_path(job_id))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def remove(self, job_id):
+        for path in (self.checkpoint_path(job_id), self.output_path(job_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def prune(self, max_age=JOB_MAX_AGE_SECONDS):
+        cutoff = time.time() - max_age
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class CombineJob:
+    # backend.combine_files() with a checkpoint every CHECKPOINT_SECONDS. A rerun resumes
+    # after the last checkpointed file, as long as none of the finished files changed.
+    def __init__(self, backend, store=None):
+        self.backend = backend
+        self.store = store or JobStore()
+        self.file_paths = list(backend.file_paths)
+        self.job_id = make_job_id("combine", self.file_paths, backend.combine_options())
+        self.resumed_files = 0
+
+    def restore(self):
+        state = self.store.load(self.job_id)
+        if not state:
+            return None
+        done = state["files"]
+        if [entry[0] for entry in done] != self.file_paths[:len(done)]:
+            return None
+        for file_path, mtime_ns, size in done:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                return None
+            if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+                logging.info(f"{file_path} changed since the combine was interrupted; starting over.")
+                return None
+        try:
+            if os.path.getsize(self.store.output_path(self.job_id)) < state["offset"]:
+                return None
+        except OSError:
+            return None
+        return state
+
+    def run(self, spill_threshold=None):
+        # Returns the combined text, or a SpilledText (memory_budget.py) when it is over spill_threshold bytes
+        self.store.prune()
+        state = self.restore() or {"files": [], "offset": 0, "first_seen": {}, "stats": {}}
+        self.resumed_files = len(state["files"])
+        if self.resumed_files:
+            logging.info(f"Resuming combine: {self.resumed_files} of {len(self.file_paths)} files already done.")
+        base_stats = state["stats"]
+        first_seen = {bytes.fromhex(digest): path for digest, path in state["first_seen"].items()}
+        os.makedirs(self.store.directory, exist_ok=True)
+        output_path = self.store.output_path(self.job_id)
+
+        with open(output_path, 'r+b' if self.resumed_files else 'w+b') as output:
+            output.seek(state["offset"])
+            output.truncate()
+
+            def checkpoint():
+                output.flush()
+                os.fsync(output.fileno())
+                state["offset"] = output.tell()
+                # The section in flight may already be in first_seen (and the stats) without being written
+                written = {entry[0] for entry in state["files"]}
+                state["first_seen"] = {digest.hex(): path for digest, path in first_seen.items() if path in written}
+                state["stats"] = merge_stats(base_stats, written_stats)
+                self.store.save(self.job_id, state)
+
+            written_stats = {}
+            last_checkpoint = time.monotonic()
+            try:
+                for file_path, header, body in self.backend.iter_combined_sections(self.file_paths[self.resumed_files:], first_seen):
+                    output.write((header + body).encode('utf-8'))
+                    try:
+                        stat = os.stat(file_path)
+                        state["files"].append([file_path, stat.st_mtime_ns, stat.st_size])
+                    except OSError:
+                        state["files"].append([file_path, None, None]) # Never matches, so a resume starts over
+                    written_stats = dict(self.backend.last_combine_stats)
+                    if time.monotonic() - last_checkpoint >= CHECKPOINT_SECONDS:
+                        checkpoint()
+                        last_checkpoint = time.monotonic()
+            except BaseException:
+                checkpoint() # Keeps the work done so far for the next run
+                raise
+            size = output.tell()
+            if spill_threshold is None or size <= spill_threshold:
+                output.seek(0)
+                combined = output.read().decode('utf-8')
+
+        self.backend.last_combine_stats = merge_stats(base_stats, self.backend.last_combine_stats)
+        if spill_threshold is not None and size > spill_threshold:
+            combined = SpilledText.adopt(output_path)
+        self.store.remove(self.job_id)
+        return combined
+
+
+def merge_stats(saved, current):
+    return {key: saved.get(key, 0) + current.get(key, 0) for key in set(saved) | set(current)}
+
+
+class SummaryJob:
+    # A summary that fits one request is sent as one prompt (laid out for prefix caching
+    # when a prompt_layout is given). Larger text is split into chunks of whole files, or
+    # lines, that fit the provider's input budget; each chunk summary is checkpointed, and
+    # the chunk summaries are merged, in as many rounds as the budget requires.
+    # text may also be a SpilledText, which is read one section at a time.
+    def __init__(self, provider, text, file_paths=(), prompt_layout=None, store=None):
+        self.provider = provider
+        self.text = text
+        self.file_paths = list(file_paths)
+        self.prompt_layout = prompt_layout
+        self.store = store or JobStore()
+        # Keyed by what is summarized rather than the exact text, so an edit only redoes the chunks it touched
+        self.job_id = make_job_id("summary", provider.provider_name, provider.resolve_model(warn=False),
+                                  self.file_paths or (text.digest() if isinstance(text, SpilledText) else text_digest(text)))
+        self.resumed_chunks = 0
+        self.chunk_count = 0
+
+    def run(self, cancel_token=None):
+        tokenizer = self.provider.model_profile()["tokenizer"]
+        budget = self.provider.input_token_budget()
+        text = self.text
+        if budget is None and isinstance(text, SpilledText):
+            text = text.read().strip() # Without a budget the whole text goes in one request
+        if isinstance(text, str) and (budget is None or count_tokens(text, tokenizer=tokenizer) <= budget):
+            return self.summarize_whole(text, cancel_token)
+
+        # Chunks are packed as they are summarized, so a spilled text is never read in full
+        pieces = self.pack(self.sections(), budget, tokenizer)
+        first, second = next(pieces, ""), next(pieces, None)
+        if second is None:
+            return self.summarize_whole(first.strip(), cancel_token)
+        pieces = itertools.chain([first, second], pieces)
+        self.store.prune()
+        state = self.store.load(self.job_id) or {"summaries": {}}
+        instructions = SUMMARY_INSTRUCTIONS
+        while True:
+            summaries = []
+            for piece in pieces:
+                try:
+                    summaries.append(self.summarize_chunk(piece, instructions, state, cancel_token))
+                except CallCancelled as e:
+                    # The summaries finished so far are the partial result
+                    e.partial = "\n\n".join(summaries + [e.partial]).strip()
+                    raise
+            self.chunk_count += len(summaries)
+            if len(summaries) == 1:
+                break
+            merged = list(self.pack([summary.strip() + "\n\n" for summary in summaries], budget, tokenizer))
+            if len(merged) >= len(summaries):
+                raise ValueError(f"Chunk summaries do not fit the {budget} token input budget; raise the input limit or choose a larger model.")
+            pieces, instructions = merged, MERGE_INSTRUCTIONS
+        logging.info(f"Summarized in {self.chunk_count} requests, {self.resumed_chunks} restored from a checkpoint.")
+        self.store.remove(self.job_id)
+        return summaries[0]
+
+    def summarize_whole(self, text, cancel_token):
+        prompt = self.prompt_layout.build(text, self.file_paths) if self.prompt_layout else text
+        return self.provider.summarize(prompt, cancel_token=cancel_token)
+
+    def summarize_chunk(self, piece, instructions, state, cancel_token):
+        key = text_digest(instructions + piece)
+        if key in state["summaries"]:
+            self.resumed_chunks += 1
+            return state["summaries"][key]
+        # Each request gets its own deadline; cancelling the job's token still stops it
+        summary = self.provider.summarize(SummaryPrompt([piece], instructions=instructions),
+                                          cancel_token=CancelToken(parent=cancel_token))
+        state["summaries"][key] = summary
+        self.store.save(self.job_id, state)
+        return summary
+
+    def sections(self):
+        if isinstance(self.text, SpilledText):
+            return self.spilled_sections()
+        if self.file_paths:
+            try:
+                return [header + body for _, header, body in split_plain_text(self.text, self.file_paths)]
+            except BundleFormatError as e:
+                logging.info(f"Chunking the combined text by lines: {e}")
+        return [self.text]
+
+    def spilled_sections(self):
+        # One file's section at a time, or runs of lines when the sections cannot be found
+        if self.file_paths:
+            try:
+                # Checked before anything is summarized, so a late mismatch cannot repeat sections
+                for _ in iter_plain_text_sections(self.text.lines(), self.file_paths):
+                    pass
+                for _, header, body in iter_plain_text_sections(self.text.lines(), self.file_paths):
+                    yield header + body
+                return
+            except BundleFormatError as e:
+                logging.info(f"Chunking the combined text by lines: {e}")
+        lines, size = [], 0
+        for line in self.text.lines():
+            lines.append(line)
+            size += len(line)
+            if size >= SPILLED_PIECE_CHARS:
+                yield "".join(lines)
+                lines, size = [], 0
+        if lines:
+            yield "".join(lines)
+
+    def pack(self, pieces, budget, tokenizer):
+        # Consecutive pieces joined into chunks of at most budget tokens, as they are consumed
+        current, current_tokens = [], 0
+        for piece in pieces:
+            for part, tokens in self.fit(piece, budget, tokenizer):
+                if current and current_tokens + tokens > budget:
+                    yield "".join(current)
+                    current, current_tokens = [], 0
+                current.append(part)
+                current_tokens += tokens
+        if current:
+            yield "".join(current)
+
+    def fit(self, piece, budget, tokenizer):
+        # [(part, tokens)]: a piece over the budget is split by lines, and lines over it by characters
+        tokens = count_tokens(piece, tokenizer=tokenizer)
+        if tokens <= budget:
+            return [(piece, tokens)]
+        parts = []
+        for line in piece.splitlines(keepends=True):
+            tokens = count_tokens(line, tokenizer=tokenizer)
+            if tokens <= budget:
+                parts.append((line, tokens))
+                continue
+            step = max(1, budget * CHARS_PER_TOKEN)
+            for start in range(0, len(line), step):
+                part = line[start:start + step]
+                parts.append((part, count_tokens(part, tokenizer=tokenizer)))
+        return parts
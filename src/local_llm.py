@@ -0,0 +1,247 @@
+# local_llm.py
+# Client for local OpenAI-compatible servers (Ollama, LM Studio, llama.cpp).
+# One engine per server keeps a pooled keep-alive session, caps in-flight
+# requests at the server's slot count, streams completions so long answers
+# are bounded by a per-chunk read timeout instead of a total one, and can
+# ping the model while idle so the server does not unload it.
+#
+#   python local_llm.py --api-base http://localhost:11434/v1 health
+#   python local_llm.py --api-base http://localhost:11434/v1 warm-up llama3.1:8b
+#   python local_llm.py --api-base http://localhost:11434/v1 chat llama3.1:8b "Hello"
+import json
+import logging
+import socket
+import threading
+import time
+from contextlib import nullcontext
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cancellation import POLL_SECONDS
+
+CONNECT_TIMEOUT = 5
+# Longest silence allowed between streamed chunks (or before a non-streamed answer)
+READ_TIMEOUT = 300
+HEALTH_TIMEOUT = 3
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+class LocalLLMError(Exception):
+    pass
+
+
+class _StreamCloser:
+    # Closing a response does not wake a thread blocked reading it; shutting its socket down does
+    def __init__(self, response):
+        self.response = response
+
+    def close(self):
+        sock = getattr(getattr(self.response.raw, "connection", None), "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.response.close()
+
+
+class LocalLLMEngine:
+    def __init__(self, api_base, api_key=None, parallel_slots=1, read_timeout=READ_TIMEOUT):
+        self.api_base = api_base.rstrip("/")
+        self.parallel_slots = max(1, parallel_slots)
+        self.timeout = (CONNECT_TIMEOUT, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.parallel_slots)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Content-Type"] = "application/json"
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+        self.slots = threading.BoundedSemaphore(self.parallel_slots)
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        # Requests still using the session; a retired engine closes it when the last one ends
+        self.in_flight = 0
+        self.retired = False
+        self.last_used = time.monotonic()
+        self.keep_warm_model = None
+        self.keep_warm_interval = None
+        self.keep_warm_thread = None
+
+    def health(self):
+        # Cheap probe: lists the server's models without touching a slot
+        start = time.monotonic()
+        try:
+            response = self.session.get(f"{self.api_base}/models", timeout=HEALTH_TIMEOUT)
+            response.raise_for_status()
+            models = [model.get("id") for model in response.json().get("data", [])]
+            return {"ok": True, "models": models, "latency": time.monotonic() - start}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return {"ok": False, "error": str(e), "latency": time.monotonic() - start}
+
+    def warm_up(self, model):
+        # A one-token completion makes the server load the model (or keeps it loaded)
+        self.chat([{"role": "user", "content": "hi"}], model, max_tokens=1, stream=False)
+
+    def keep_warm(self, model, interval):
+        # Re-sends the warm-up whenever the engine has been idle for interval seconds
+        with self.lock:
+            self.keep_warm_model = model
+            self.keep_warm_interval = interval
+            if self.keep_warm_thread is None:
+                self.keep_warm_thread = threading.Thread(target=self._keep_warm_loop, name="local-llm-keep-warm", daemon=True)
+                self.keep_warm_thread.start()
+
+    def _keep_warm_loop(self):
+        while not self.closed.wait(self.keep_warm_interval / 2):
+            if time.monotonic() - self.last_used < self.keep_warm_interval:
+                continue
+            try:
+                self.warm_up(self.keep_warm_model)
+                logging.info(f"Kept {self.keep_warm_model} loaded on {self.api_base}.")
+            except (requests.exceptions.RequestException, LocalLLMError) as e:
+                logging.warning(f"Keep-alive ping to {self.api_base} failed: {e}")
+
+    def chat(self, messages, model, max_tokens=None, stream=True, on_token=None, cancel_token=None):
+        # Returns the completion text; on_token(piece) is called as streamed pieces arrive.
+        # cancel_token (see cancellation.py) bounds the whole call, waiting for a slot included.
+        payload = {"model": model, "messages": messages, "stream": stream}
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        with self.lock:
+            self.in_flight += 1
+        try:
+            return self._chat(payload, stream, on_token, cancel_token)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                idle = self.retired and self.in_flight == 0
+            if idle:
+                self.session.close()
+
+    def _chat(self, payload, stream, on_token=None, cancel_token=None):
+        if cancel_token is not None:
+            while not self.slots.acquire(timeout=POLL_SECONDS):
+                cancel_token.check()
+        else:
+            self.slots.acquire()
+        pieces = []
+        try:
+            timeout = self.timeout
+            if cancel_token is not None:
+                cancel_token.check()
+                remaining = cancel_token.remaining()
+                if remaining is not None:
+                    timeout = (min(CONNECT_TIMEOUT, remaining), min(self.timeout[1], remaining))
+            response = self.session.post(f"{self.api_base}/chat/completions", json=payload, timeout=timeout, stream=stream)
+            response.raise_for_status()
+            if not stream:
+                return response.json()["choices"][0]["message"]["content"]
+            return self._read_stream(response, pieces, on_token, cancel_token)
+        except Exception as e:
+            # A cancel closes the response under the reading thread; report it as a cancel
+            stopped = cancel_token.error("".join(pieces)) if cancel_token is not None else None
+            if stopped is not None:
+                raise stopped from e
+            raise
+        finally:
+            self.slots.release()
+            self.last_used = time.monotonic()
+
+    def _read_stream(self, response, pieces, on_token=None, cancel_token=None):
+        # Server-sent events: "data: {chunk}" lines, ended by "data: [DONE]"
+        with response, (cancel_token.closing(_StreamCloser(response)) if cancel_token is not None else nullcontext()):
+            for line in response.iter_lines():
+                if cancel_token is not None:
+                    cancel_token.check("".join(pieces))
+                if not line.startswith(b"data:"):
+                    continue # Blank separators, comments and event names
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    continue # Read on to the end of the body so the connection goes back to the pool
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    raise LocalLLMError(f"Server error while streaming: {chunk['error']}")
+                for choice in chunk.get("choices", []):
+                    piece = (choice.get("delta") or {}).get("content")
+                    if piece:
+                        pieces.append(piece)
+                        if on_token:
+                            on_token(piece)
+        if cancel_token is not None:
+            # Closing the response on cancel ends iter_lines() quietly rather than with an error
+            cancel_token.check("".join(pieces))
+        return "".join(pieces)
+
+    def close(self):
+        self.closed.set()
+        self.session.close()
+
+    def retire(self):
+        # Replaced by get_engine(): stop the keep-alive pings now, but leave the session
+        # open for requests still streaming through it and close it after the last one
+        self.closed.set()
+        with self.lock:
+            self.retired = True
+            idle = self.in_flight == 0
+        if idle:
+            self.session.close()
+
+
+def get_engine(api_base, api_key=None, parallel_slots=1, read_timeout=READ_TIMEOUT):
+    # One engine (and connection pool) per server, replaced when its settings change
+    key = api_base.rstrip("/")
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is not None and (engine.parallel_slots, engine.timeout[1]) == (max(1, parallel_slots), read_timeout) \
+                and engine.session.headers.get("Authorization") == (f"Bearer {api_key}" if api_key else None):
+            return engine
+        if engine is not None:
+            engine.retire()
+        engine = _engines[key] = LocalLLMEngine(api_base, api_key, parallel_slots, read_timeout)
+        return engine
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Probe a local OpenAI-compatible LLM server.")
+    parser.add_argument("--api-base", default="http://localhost:11434/v1")
+    parser.add_argument("--api-key")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("health", help="list the server's models")
+    warm_up = subcommands.add_parser("warm-up", help="load a model")
+    warm_up.add_argument("model")
+    chat = subcommands.add_parser("chat", help="stream a reply to a prompt")
+    chat.add_argument("model")
+    chat.add_argument("prompt")
+    options = parser.parse_args()
+
+    engine = LocalLLMEngine(options.api_base, options.api_key)
+    try:
+        if options.command == "health":
+            status = engine.health()
+            print(json.dumps(status, indent=2))
+            return 0 if status["ok"] else 1
+        start = time.monotonic()
+        if options.command == "warm-up":
+            engine.warm_up(options.model)
+            print(f"{options.model} ready in {time.monotonic() - start:.2f} seconds")
+        else:
+            engine.chat([{"role": "user", "content": options.prompt}], options.model,
+                        on_token=lambda piece: print(piece, end="", flush=True))
+            print(f"\n({time.monotonic() - start:.2f} seconds)", file=sys.stderr)
+        return 0
+    except (requests.exceptions.RequestException, LocalLLMError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
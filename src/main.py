@@ -1,8 +1,11 @@
 # main.py
+import multiprocessing
 import tkinterdnd2
 from ui import FileCombinerApp
 
 if __name__ == "__main__":
+    # Needed for the combine process pool in the PyInstaller build
+    multiprocessing.freeze_support()
     root = tkinterdnd2.Tk()
     app = FileCombinerApp(root)
     root.mainloop()
\ No newline at end of file
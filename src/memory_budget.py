@@ -0,0 +1,113 @@
+# memory_budget.py
+# Keeps large combined outputs out of memory. With a memory budget set, an
+# output bigger than its share of the budget stays in a temp file: the UI shows
+# a preview, copying asks first while the output is over the budget, a summary
+# reads the file one section at a time, and saving copies the file.
+# peak_rss_bytes() reports the process's high-water mark for the timing output.
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+from pending_output import PendingOutput
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# A kept-in-memory output can exist about this many times over (bytes, str, Text widget, clipboard)
+OUTPUT_COPIES = 4
+PREVIEW_CHARS = 100_000
+
+
+def spill_threshold(memory_budget_mb):
+    # Largest output kept in memory, in bytes, or None without a budget
+    if not memory_budget_mb:
+        return None
+    return memory_budget_mb * 1024 * 1024 // OUTPUT_COPIES
+
+
+class SpilledText:
+    # Combined text in a temp file, deleted by close()
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+
+    @classmethod
+    def adopt(cls, path):
+        # Moves a finished output file into the temp directory
+        fd, spill_path = tempfile.mkstemp(prefix="combined-", suffix=".txt")
+        os.close(fd)
+        shutil.move(path, spill_path)
+        logging.info(f"Combined output of {os.path.getsize(spill_path)} bytes kept on disk at {spill_path}.")
+        return cls(spill_path)
+
+    def preview(self, max_chars=PREVIEW_CHARS):
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            return f.read(max_chars)
+
+    def read(self):
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def lines(self):
+        # For consumers that can work through the output a piece at a time
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            yield from f
+
+    def digest(self):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self.path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def copy_to(self, output_path):
+        pending = PendingOutput(output_path)
+        try:
+            shutil.copyfile(self.path, pending.path)
+        except BaseException:
+            pending.discard()
+            raise
+        pending.commit()
+
+    def close(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def peak_rss_bytes():
+    # High-water mark of this process's resident memory, or None where it is unknown
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # macOS reports bytes, Linux KB
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+def format_bytes(size):
+    for unit in ("bytes", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
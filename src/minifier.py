@@ -0,0 +1,199 @@
+# minifier.py
+# Per-language minification applied between reading and emitting files.
+# Each language family gets one compiled regex that matches string literals and
+# comments together, so comment markers inside strings (and JS regex literals)
+# are left alone. Whitespace is only changed outside string literals: a line
+# that begins inside a multi-line string keeps its indentation, its trailing
+# spaces and its blank lines.
+import ast
+import math
+import os
+import re
+
+HASH_COMMENT_EXTENSIONS = {
+    '.py', '.sh', '.rb', '.r', '.pl', '.yaml', '.toml', '.ini', '.ex', '.exs',
+    '.coffee', '.tcl', '.ps1', '.powershell', '.gitignore', '.dockerfile',
+}
+C_COMMENT_EXTENSIONS = {
+    '.js', '.java', '.kt', '.cs', '.cpp', '.h', '.php', '.go', '.swift',
+    '.dart', '.jsx', '.tsx', '.ts', '.c', '.hpp', '.gradle', '.groovy', '.scala',
+    '.rs', '.m', '.vue', '.svelte', '.json',
+}
+# C-style comments plus regex literals, whose "//" and "/*" are not comments
+JS_EXTENSIONS = {'.js', '.jsx', '.ts', '.tsx', '.vue', '.svelte'}
+CSS_COMMENT_EXTENSIONS = {'.css'}
+DASH_COMMENT_EXTENSIONS = {'.sql', '.lua', '.hs'}
+MARKUP_COMMENT_EXTENSIONS = {'.html', '.htm', '.xml'}
+# Leading whitespace carries meaning here, so it is rescaled rather than stripped
+INDENT_SENSITIVE_EXTENSIONS = {
+    '.py', '.yaml', '.coffee', '.hs', '.fs', '.ml',
+}
+PROSE_EXTENSIONS = {'.md', '.txt'}
+
+_STRINGS = r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\''
+_C_STRINGS = _STRINGS + r'|`(?:\\.|[^`\\])*`'
+_C_COMMENTS = r'//[^\n]*|/\*[\s\S]*?\*/'
+# A "/" starts a regex literal where an operand is expected: at the start of a line,
+# after an operator or opening bracket, or after return/typeof
+_JS_REGEX = (r'(?:(?<=[(,=:\[!&|?{};+\-*%<>~^])|(?<=(?<![\w$.])return)|(?<=(?<![\w$.])typeof)|(?<![^\n]))'
+             r'[ \t]*/(?![/*])(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\n\[])+/[a-zA-Z]*')
+_PATTERNS = {
+    "python": re.compile(r'(?P<string>[rRbBuUfF]{0,2}(?:"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|' + _STRINGS + r'))|(?P<comment>(?<!\S)#[^\n]*)'),
+    "hash": re.compile(r'(?P<string>' + _STRINGS + r')|(?P<comment>(?<!\S)#[^\n]*)'),
+    "c": re.compile(r'(?P<string>' + _C_STRINGS + r')|(?P<comment>' + _C_COMMENTS + r')'),
+    "js": re.compile(r'(?P<string>' + _C_STRINGS + r')|(?P<regex>' + _JS_REGEX + r')|(?P<comment>' + _C_COMMENTS + r')'),
+    "dash": re.compile(r'(?P<string>' + _STRINGS + r')|(?P<comment>--\[\[[\s\S]*?\]\]|--[^\n]*|\{-[\s\S]*?-\})'),
+    "css": re.compile(r'(?P<string>' + _STRINGS + r')|(?P<comment>/\*[\s\S]*?\*/)'),
+    "markup": re.compile(r'(?P<comment><!--[\s\S]*?-->)'),
+}
+_EXTRA_BLANK_LINES = re.compile(r'\n(?:[ \t]*\n){2,}')
+
+DEFAULT_OPTIONS = {
+    "strip_comments": True,
+    "collapse_blank_lines": True,
+    "normalize_indentation": True,
+    "drop_docstrings": False,
+}
+
+
+def get_extension(file_path):
+    file_name = os.path.basename(file_path)
+    match = re.search(r'\.[a-zA-Z0-9_]+$', file_name)
+    return match.group(0).lower() if match else ""
+
+
+def get_language(ext):
+    if ext == '.py':
+        return "python"
+    if ext in HASH_COMMENT_EXTENSIONS:
+        return "hash"
+    if ext in JS_EXTENSIONS:
+        return "js"
+    if ext in C_COMMENT_EXTENSIONS:
+        return "c"
+    if ext in DASH_COMMENT_EXTENSIONS:
+        return "dash"
+    if ext in CSS_COMMENT_EXTENSIONS:
+        return "css"
+    if ext in MARKUP_COMMENT_EXTENSIONS:
+        return "markup"
+    return None
+
+
+def strip_comments(text, language):
+    pattern = _PATTERNS.get(language)
+    if pattern is None:
+        return text
+
+    def replace(match):
+        if match.group('comment') is None:
+            return match.group(0)
+        # Shebangs are kept, they change how the file is run
+        if match.start() == 0 and match.group('comment').startswith('#!'):
+            return match.group(0)
+        return ""
+
+    return pattern.sub(replace, text)
+
+
+def drop_docstrings(text):
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return text
+    lines = text.split("\n")
+    docstrings = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) or not node.body:
+            continue
+        first = node.body[0]
+        if not (isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str)):
+            continue
+        # Only docstrings that sit on their own lines, so "def f(): \"\"\"doc\"\"\"" is left as is
+        # (ast offsets count UTF-8 bytes)
+        if lines[first.lineno - 1].encode('utf-8')[:first.col_offset].strip() or lines[first.end_lineno - 1].encode('utf-8')[first.end_col_offset:].strip():
+            continue
+        docstrings.append((first.lineno, first.end_lineno, len(node.body) == 1))
+    for start, end, only_statement in sorted(docstrings, reverse=True):
+        # A body that was only a docstring still needs a statement, indented as the docstring was
+        indent = lines[start - 1][:len(lines[start - 1]) - len(lines[start - 1].lstrip())]
+        lines[start - 1:end] = [indent + "pass"] if only_statement else []
+    return "\n".join(lines)
+
+
+def string_lines(text, language):
+    # Indexes of the lines that begin inside a multi-line string literal
+    pattern = _PATTERNS.get(language)
+    inside = set()
+    if pattern is None or "string" not in pattern.groupindex:
+        return inside
+    line, position = 0, 0
+    for match in pattern.finditer(text):
+        literal = match.group('string')
+        if literal is None or "\n" not in literal:
+            continue
+        line += text.count("\n", position, match.start())
+        position = match.start()
+        inside.update(range(line + 1, line + 1 + literal.count("\n")))
+    return inside
+
+
+def expand_indent(line):
+    # Tabs become spaces in the indentation only; a tab inside the line may be part of a value
+    content = line.lstrip(" \t")
+    return line[:len(line) - len(content)].expandtabs(4) + content
+
+
+def normalize_indentation(text, ext, inside_strings=None):
+    language = get_language(ext)
+    if ext in PROSE_EXTENSIONS:
+        return text
+    if inside_strings is None:
+        inside_strings = string_lines(text, language)
+    lines = text.split("\n")
+    if language is not None and ext not in INDENT_SENSITIVE_EXTENSIONS:
+        return "\n".join(line if index in inside_strings else line.lstrip(" \t") for index, line in enumerate(lines))
+    # Unknown or indentation-sensitive languages: divide every indent by their
+    # common factor, which keeps relative nesting (and column-based formats) intact
+    lines = [line if index in inside_strings else expand_indent(line) for index, line in enumerate(lines)]
+    unit = 0
+    for index, line in enumerate(lines):
+        if line.strip() and index not in inside_strings:
+            unit = math.gcd(unit, len(line) - len(line.lstrip(" ")))
+    if unit <= 1:
+        return "\n".join(lines)
+    return "\n".join(line if index in inside_strings else " " * ((len(line) - len(line.lstrip(" "))) // unit) + line.lstrip(" ")
+                     for index, line in enumerate(lines))
+
+
+def minify(text, ext, options=None):
+    options = options or DEFAULT_OPTIONS
+    language = get_language(ext)
+    if options.get("drop_docstrings") and language == "python":
+        text = drop_docstrings(text)
+    if options.get("strip_comments"):
+        text = strip_comments(text, language)
+    # Whitespace inside multi-line strings is part of their value and is kept
+    inside_strings = string_lines(text, language)
+    text = "\n".join(line if index + 1 in inside_strings else line.rstrip(" \t")
+                     for index, line in enumerate(text.split("\n")))
+    if options.get("normalize_indentation"):
+        text = normalize_indentation(text, ext, inside_strings)
+    if options.get("collapse_blank_lines"):
+        if ext in PROSE_EXTENSIONS:
+            # Prose keeps paragraph breaks
+            text = _EXTRA_BLANK_LINES.sub("\n\n", text)
+        else:
+            # Code loses blank lines entirely
+            text = "\n".join(line for index, line in enumerate(text.split("\n")) if line.strip() or index in inside_strings)
+        text = text.strip("\n")
+    return text
+
+
+class MinifyTransform:
+    # Picklable per-file transform for FilePipeline
+    def __init__(self, options=None):
+        self.options = dict(options or DEFAULT_OPTIONS)
+
+    def __call__(self, text, file_path):
+        return minify(text, get_extension(file_path), self.options)
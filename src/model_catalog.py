@@ -0,0 +1,100 @@
+# model_catalog.py
+# Model lists for the AI configuration dialog. models.json ships a default list
+# per provider; providers with a "models_endpoint" can also be asked for their
+# current models. Fetched lists are cached on disk per provider and API base,
+# so the dialog never waits on the network unless the user asks for a refresh.
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+MODEL_CACHE_FILE = "model_list_cache.json"
+MODEL_CACHE_SECONDS = 24 * 3600
+FETCH_TIMEOUT = 10
+ANTHROPIC_MODELS_URL = "https://api.anthropic.com/v1/models"
+ANTHROPIC_VERSION = "2023-06-01"
+GOOGLE_MODELS_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+
+# Refreshes for different providers update the one cache file in turn
+_cache_lock = threading.Lock()
+
+
+def load_model_cache(cache_file=MODEL_CACHE_FILE):
+    try:
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_model_cache(cache, cache_file=MODEL_CACHE_FILE):
+    # Written beside the cache and renamed over it, so a reader never sees half a file
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache_file)), suffix=".tmp")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f, indent=4)
+        os.replace(tmp_path, cache_file)
+    except OSError as e:
+        logging.error(f"Failed to save model list cache: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def cache_key(provider_name, api_base=None):
+    return f"{provider_name}|{api_base.rstrip('/')}" if api_base else provider_name
+
+
+def get_api_base(provider_name, settings, models_data):
+    return settings.get("api_base") or models_data.get(provider_name, {}).get("default_api_base")
+
+
+def list_models(provider_name, settings, models_data, cache=None):
+    # models.json models plus any fetched ones still in the cache, sorted
+    models = set(models_data.get(provider_name, {}).get("models", []))
+    entry = (cache or {}).get(cache_key(provider_name, get_api_base(provider_name, settings, models_data)))
+    if entry and time.time() - entry.get("fetched_at", 0) < MODEL_CACHE_SECONDS:
+        models.update(entry.get("models", []))
+    return sorted(models)
+
+
+def fetch_models(provider_name, settings, models_data):
+    # Asks the provider for its current models; raises requests exceptions or ValueError
+    endpoint = models_data.get(provider_name, {}).get("models_endpoint")
+    api_key = settings.get("api_key")
+    if endpoint == "openai":
+        api_base = get_api_base(provider_name, settings, models_data)
+        if not api_base:
+            raise ValueError(f"No API base configured for {provider_name}.")
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        response = requests.get(f"{api_base.rstrip('/')}/models", headers=headers, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+        return [model["id"] for model in response.json().get("data", [])]
+    if endpoint == "anthropic":
+        headers = {"x-api-key": api_key or "", "anthropic-version": ANTHROPIC_VERSION}
+        response = requests.get(ANTHROPIC_MODELS_URL, headers=headers, params={"limit": 1000}, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+        return [model["id"] for model in response.json().get("data", [])]
+    if endpoint == "google":
+        # The key goes in a header: a query parameter would end up in error messages and logs with the URL
+        response = requests.get(GOOGLE_MODELS_URL, headers={"x-goog-api-key": api_key or ""}, params={"pageSize": 1000},
+                                timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+        return [model["name"].split("/", 1)[-1] for model in response.json().get("models", [])
+                if "generateContent" in model.get("supportedGenerationMethods", [])]
+    raise ValueError(f"{provider_name} has no model list endpoint.")
+
+
+def refresh_models(provider_name, settings, models_data, cache_file=MODEL_CACHE_FILE):
+    # Fetches the provider's models and stores them in the cache; returns the merged list
+    fetched = fetch_models(provider_name, settings, models_data)
+    with _cache_lock:
+        cache = load_model_cache(cache_file)
+        cache[cache_key(provider_name, get_api_base(provider_name, settings, models_data))] = {"fetched_at": time.time(), "models": fetched}
+        save_model_cache(cache, cache_file)
+    logging.info(f"Fetched {len(fetched)} models for {provider_name}.")
+    return list_models(provider_name, settings, models_data, cache)
@@ -0,0 +1,272 @@
+# output_writers.py
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import tarfile
+import threading
+import time
+import zipfile
+
+from bundle import BUNDLE_EXTENSION, BundleFormatError, BundleWriter, split_plain_text
+from pending_output import PendingOutput
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+INDEX_NAME = "index.json"
+# Member name for text that no longer splits into its files' sections
+EDITED_TEXT_NAME = "combined.txt"
+
+# (suffix, description) pairs for the save dialog, longest suffixes first so ".tar.gz" wins over ".gz"
+OUTPUT_FORMATS = [
+    (".ccb", "Indexed bundle"),
+    (".tar.gz", "Tar archive (gzip)"),
+    (".tgz", "Tar archive (gzip)"),
+    (".tar", "Tar archive"),
+    (".zip", "Zip archive"),
+    (".zst", "Zstandard compressed text"),
+    (".gz", "Gzip compressed text"),
+]
+
+
+class OutputWriter:
+    # Writes to a PendingOutput; output_path is replaced only when the with-block ends
+    # without an exception, otherwise the partial file is deleted
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.pending = PendingOutput(output_path)
+        try:
+            self.open(self.pending.path)
+        except BaseException:
+            self.pending.discard()
+            raise
+
+    def open(self, path):
+        raise NotImplementedError
+
+    def finish(self):
+        # Completes the file (index, compression trailer) and closes it
+        raise NotImplementedError
+
+    def close_files(self):
+        raise NotImplementedError
+
+    def close(self):
+        try:
+            self.finish()
+        except BaseException:
+            self.abort()
+            raise
+        self.pending.commit()
+
+    def abort(self):
+        try:
+            self.close_files()
+        finally:
+            self.pending.discard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class PlainTextWriter(OutputWriter):
+    def open(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write_section(self, file_path, header, body):
+        self.file.write(header)
+        self.file.write(body)
+
+    def finish(self):
+        self.close_files()
+
+    def close_files(self):
+        self.file.close()
+
+
+class GzipWriter(PlainTextWriter):
+    def __init__(self, output_path, compresslevel=6):
+        self.compresslevel = compresslevel
+        super().__init__(output_path)
+
+    def open(self, path):
+        self.file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=self.compresslevel)
+
+
+class ZstdWriter(PlainTextWriter):
+    def __init__(self, output_path, level=10):
+        if zstandard is None:
+            raise ValueError("Zstandard output requires the 'zstandard' library. Install it with: pip install zstandard")
+        self.level = level
+        super().__init__(output_path)
+
+    def open(self, path):
+        self.raw_file = open(path, 'wb')
+        # threads=-1 lets zstd compress on all cores while we keep reading
+        compressor = zstandard.ZstdCompressor(level=self.level, threads=-1)
+        self.stream = compressor.stream_writer(self.raw_file, closefd=False)
+        self.file = io.TextIOWrapper(self.stream, encoding='utf-8')
+
+    def close_files(self):
+        try:
+            self.file.close()
+        finally:
+            self.raw_file.close()
+
+
+class ArchiveWriter(OutputWriter):
+    # Each file becomes its own archive member; index.json keeps order and headers
+    # so the plain combined text can be rebuilt from the archive.
+    def __init__(self, output_path):
+        self.entries = []
+        self.used_names = set()
+        super().__init__(output_path)
+
+    def member_name(self, file_path):
+        name = os.path.splitdrive(os.path.abspath(file_path))[1].replace(os.sep, "/").lstrip("/")
+        candidate = name
+        counter = 1
+        while candidate in self.used_names:
+            candidate = f"{name}.{counter}"
+            counter += 1
+        self.used_names.add(candidate)
+        return candidate
+
+    def write_section(self, file_path, header, body):
+        data = body.encode('utf-8')
+        name = self.member_name(file_path)
+        self.write_member(name, data)
+        self.entries.append({"path": file_path, "member": name, "header": header, "size": len(data)})
+
+    def write_index(self):
+        data = json.dumps({"files": self.entries}, indent=2).encode('utf-8')
+        self.write_member(INDEX_NAME, data)
+
+    def finish(self):
+        self.write_index()
+        self.archive.close()
+
+    def close_files(self):
+        self.archive.close()
+
+
+class ZipBundleWriter(ArchiveWriter):
+    def __init__(self, output_path, compresslevel=6):
+        self.compresslevel = compresslevel
+        super().__init__(output_path)
+
+    def open(self, path):
+        self.archive = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=self.compresslevel)
+
+    def write_member(self, name, data):
+        self.archive.writestr(name, data)
+
+
+class TarBundleWriter(ArchiveWriter):
+    def __init__(self, output_path, mode='w'):
+        self.mode = mode
+        super().__init__(output_path)
+
+    def open(self, path):
+        self.archive = tarfile.open(path, self.mode)
+
+    def write_member(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.archive.addfile(info, io.BytesIO(data))
+
+
+def get_output_writer(output_path):
+    lower_path = output_path.lower()
+    if lower_path.endswith(BUNDLE_EXTENSION):
+        return BundleWriter(output_path)
+    if lower_path.endswith((".tar.gz", ".tgz")):
+        return TarBundleWriter(output_path, 'w:gz')
+    if lower_path.endswith(".tar"):
+        return TarBundleWriter(output_path, 'w')
+    if lower_path.endswith(".zip"):
+        return ZipBundleWriter(output_path)
+    if lower_path.endswith(".zst"):
+        return ZstdWriter(output_path)
+    if lower_path.endswith(".gz"):
+        return GzipWriter(output_path)
+    return PlainTextWriter(output_path)
+
+
+def is_plain_text_format(output_path):
+    return not output_path.lower().endswith(tuple(suffix for suffix, _ in OUTPUT_FORMATS))
+
+
+def write_combined_text(output_path, text, file_paths):
+    # Saves the combined text as shown (edits included) in the format output_path names.
+    # Bundles and archives get one section per file while the text still splits into them.
+    with get_output_writer(output_path) as writer:
+        sections = [(EDITED_TEXT_NAME, "", text)]
+        if file_paths and isinstance(writer, (BundleWriter, ArchiveWriter)):
+            try:
+                sections = list(split_plain_text(text, file_paths))
+            except BundleFormatError as e:
+                logging.info(f"Saving the combined text as a single section: {e}")
+        for file_path, header, body in sections:
+            writer.write_section(file_path, header, body)
+
+
+def read_archive_as_text(archive_path):
+    # Rebuilds the plain combined text from a zip/tar bundle written above
+    if archive_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            index = json.loads(archive.read(INDEX_NAME))
+            return "".join(entry["header"] + archive.read(entry["member"]).decode('utf-8') for entry in index["files"])
+    with tarfile.open(archive_path) as archive:
+        index = json.loads(archive.extractfile(INDEX_NAME).read())
+        return "".join(entry["header"] + archive.extractfile(entry["member"]).read().decode('utf-8') for entry in index["files"])
+
+
+_DONE = object()
+
+
+def prefetch(iterable, depth=8):
+    # Runs the iterable in a worker thread, keeping up to `depth` items ready for the consumer
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        items.put(("item", item), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            items.put(("done", _DONE))
+        except Exception as e:
+            logging.error(f"Error while reading files for output: {e}")
+            items.put(("error", e))
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == "done":
+                break
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stop.set()
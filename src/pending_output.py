@@ -0,0 +1,28 @@
+# pending_output.py
+# Output files are written under a temp name beside their final path and
+# renamed over it only once complete, so a failed or interrupted save never
+# leaves a truncated file (or a valid-looking archive) at the chosen path.
+import os
+import tempfile
+
+# Read once: temp files are created 0600, and saved outputs get the usual mode
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class PendingOutput:
+    def __init__(self, output_path):
+        self.output_path = output_path
+        directory = os.path.dirname(os.path.abspath(output_path))
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(output_path)}.", suffix=".part")
+        os.close(fd)
+
+    def commit(self):
+        os.chmod(self.path, 0o666 & ~_UMASK)
+        os.replace(self.path, self.output_path)
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,197 @@
+# project_index.py
+# Saved projects: an SQLite index of the selected roots and files so reopening a
+# large tree is a stat sweep instead of a full walk, filter and re-import.
+import logging
+import os
+import pathlib
+import sqlite3
+import time
+
+from token_counter import DEFAULT_TOKENIZER
+
+PROJECT_EXTENSION = ".ccproj"
+SCHEMA_VERSION = 2
+# Version 1 files have no tokenizer column; their token counts are cl100k_base
+READABLE_VERSIONS = (1, 2)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS folders (path TEXT PRIMARY KEY, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS seen (path TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS files (
+    position INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER,
+    size INTEGER,
+    digest BLOB,
+    tokens INTEGER,
+    tokenizer TEXT
+);
+"""
+REQUIRED_TABLES = {"meta", "roots", "folders", "seen", "files"}
+SCHEMA_STATEMENTS = [statement.strip() for statement in SCHEMA.split(";") if statement.strip()]
+
+
+class ProjectIndex:
+    def __init__(self, index_path):
+        self.index_path = index_path
+
+    def connect(self):
+        # Autocommit, so save() can put DDL and data in one explicit transaction
+        return sqlite3.connect(self.index_path, isolation_level=None)
+
+    def check_overwritable(self, connection):
+        # Saving over another SQLite file would drop its tables; only projects (or empty files) are replaced
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not tables:
+            return
+        if "meta" not in tables or connection.execute("SELECT 1 FROM meta WHERE key = 'schema_version'").fetchone() is None:
+            raise ValueError(f"{self.index_path} is not a Code Combiner project; choose another file name.")
+
+    def connect_read_only(self):
+        # Opening a project must not create tables in whatever file was picked
+        uri = pathlib.Path(os.path.abspath(self.index_path)).as_uri() + "?mode=ro"
+        try:
+            connection = sqlite3.connect(uri, uri=True)
+            tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"{self.index_path} is not a compatible project file: {e}")
+        if not REQUIRED_TABLES <= tables:
+            connection.close()
+            raise ValueError(f"{self.index_path} is not a compatible project file.")
+        return connection
+
+    def save(self, roots, folder_mtimes, seen_files, file_paths, file_cache):
+        # file_cache: path -> {"mtime_ns", "size", "digest", "tokens", "tokenizer"} as kept by FileCombinerBackend
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.write(connection, roots, folder_mtimes, seen_files, file_paths, file_cache)
+            except BaseException:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"Could not save the project to {self.index_path}: {e}")
+        finally:
+            connection.close()
+        logging.info(f"Project saved to {self.index_path} ({len(file_paths)} files).")
+
+    def write(self, connection, roots, folder_mtimes, seen_files, file_paths, file_cache):
+        # Runs inside save()'s transaction, so a failure leaves the previous project as it was
+        self.check_overwritable(connection)
+        # Files are rewritten in full anyway; recreating the table upgrades older layouts
+        connection.execute("DROP TABLE IF EXISTS files")
+        for statement in SCHEMA_STATEMENTS:
+            connection.execute(statement)
+        connection.execute("DELETE FROM meta")
+        connection.execute("DELETE FROM roots")
+        connection.execute("DELETE FROM folders")
+        connection.execute("DELETE FROM seen")
+        connection.execute("DELETE FROM files")
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("schema_version", str(SCHEMA_VERSION)),
+            ("saved_at", str(time.time())),
+        ])
+        connection.executemany("INSERT OR IGNORE INTO roots VALUES (?)", [(root,) for root in roots])
+        connection.executemany("INSERT OR REPLACE INTO folders VALUES (?, ?)", list(folder_mtimes.items()))
+        connection.executemany("INSERT OR IGNORE INTO seen VALUES (?)", [(path,) for path in seen_files])
+        rows = []
+        for position, file_path in enumerate(file_paths):
+            entry = file_cache.get(file_path) or self.stat_entry(file_path)
+            rows.append((position, file_path, entry.get("mtime_ns"), entry.get("size"),
+                         entry.get("digest"), entry.get("tokens"), entry.get("tokenizer")))
+        connection.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def stat_entry(self, file_path):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return {}
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def load(self, is_supported_file=None):
+        # Returns roots, folder mtimes, seen files, file paths and the still-valid cache entries.
+        # Files are validated with one stat each; folders whose mtime changed are
+        # listed again (not walked) to pick up added files.
+        connection = self.connect_read_only()
+        try:
+            version = connection.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if version is None or int(version[0]) not in READABLE_VERSIONS:
+                raise ValueError(f"{self.index_path} is not a compatible project file.")
+            roots = [row[0] for row in connection.execute("SELECT path FROM roots")]
+            folder_rows = connection.execute("SELECT path, mtime_ns FROM folders").fetchall()
+            seen_files = {row[0] for row in connection.execute("SELECT path FROM seen")}
+            tokenizer_column = "tokenizer" if int(version[0]) >= 2 else "NULL"
+            file_rows = connection.execute(f"SELECT path, mtime_ns, size, digest, tokens, {tokenizer_column} FROM files ORDER BY position").fetchall()
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"{self.index_path} is not a compatible project file: {e}")
+        finally:
+            connection.close()
+
+        file_paths = []
+        file_cache = {}
+        changed = 0
+        for file_path, mtime_ns, size, digest, tokens, tokenizer in file_rows:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                changed += 1
+                continue
+            file_paths.append(file_path)
+            if stat.st_mtime_ns == mtime_ns and stat.st_size == size:
+                file_cache[file_path] = {"mtime_ns": mtime_ns, "size": size, "digest": digest, "tokens": tokens,
+                                         "tokenizer": tokenizer or DEFAULT_TOKENIZER}
+            else:
+                changed += 1
+
+        known = set(file_paths)
+        saved_folders = {folder_path for folder_path, _ in folder_rows}
+        folder_mtimes = {}
+        for folder_path, mtime_ns in folder_rows:
+            try:
+                current_mtime = os.stat(folder_path).st_mtime_ns
+            except OSError:
+                continue
+            folder_mtimes[folder_path] = current_mtime
+            if current_mtime == mtime_ns:
+                continue
+            try:
+                changed += self.add_new_entries(folder_path, saved_folders, seen_files, file_paths, known,
+                                                folder_mtimes, is_supported_file)
+            except OSError as e:
+                # Deleted or unreadable since the stat above; its saved files were already checked one by one
+                logging.warning(f"Could not list {folder_path} for new files: {e}")
+
+        logging.info(f"Project loaded from {self.index_path}: {len(file_paths)} files, {changed} changed since it was saved.")
+        return roots, folder_mtimes, seen_files, file_paths, file_cache
+
+    def add_new_entries(self, folder_path, saved_folders, seen_files, file_paths, known, folder_mtimes, is_supported_file):
+        # Files and sub-folders that appeared in folder_path since the save; returns how many files were added
+        added = 0
+        for entry in list(os.scandir(folder_path)):
+            # Files already seen when the project was saved stay out, so files
+            # removed from the selection on purpose do not come back
+            if entry.is_file() and entry.path not in seen_files and (is_supported_file is None or is_supported_file(entry.path)):
+                seen_files.add(entry.path)
+                file_paths.append(entry.path)
+                known.add(entry.path)
+                added += 1
+            elif entry.is_dir() and entry.path not in saved_folders and entry.path not in folder_mtimes:
+                # A new sub-folder was never walked, so it gets a full walk
+                for root, _, files in os.walk(entry.path):
+                    try:
+                        folder_mtimes[root] = os.stat(root).st_mtime_ns
+                    except OSError:
+                        continue
+                    for file_name in files:
+                        file_path = os.path.join(root, file_name)
+                        seen_files.add(file_path)
+                        if file_path not in known and (is_supported_file is None or is_supported_file(file_path)):
+                            file_paths.append(file_path)
+                            known.add(file_path)
+                            added += 1
+        return added
@@ -0,0 +1,84 @@
+# prompt_builder.py
+# Summary prompts laid out for provider prefix caches. The instructions come
+# first and never change; files whose content is unchanged since the previous
+# prompt keep their previous order, and only new or edited files follow, sorted
+# by path. Re-summarizing after a small edit then shares the longest possible
+# prefix with the last request. Anthropic gets explicit cache_control
+# breakpoints; OpenAI and local servers cache identical prefixes on their own.
+import hashlib
+import logging
+
+from bundle import BundleFormatError, split_plain_text
+
+SUMMARY_INSTRUCTIONS = "Summarize the following text:"
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+class SummaryPrompt:
+    def __init__(self, documents, cached_count=0, instructions=SUMMARY_INSTRUCTIONS):
+        self.instructions = instructions
+        self.documents = documents        # prompt text pieces, one per file
+        self.cached_count = cached_count  # leading documents unchanged since the previous prompt
+
+    @classmethod
+    def from_text(cls, text):
+        return cls([text])
+
+    def text(self):
+        return "".join(self.documents)
+
+    def chat_messages(self):
+        # OpenAI-compatible layout (OpenAI, Groq, Mistral AI, local servers)
+        return [
+            {"role": "system", "content": self.instructions},
+            {"role": "user", "content": self.text()}
+        ]
+
+    def anthropic_request(self):
+        # (system, messages) with a cache breakpoint after the unchanged files and one at the end
+        blocks = []
+        if 0 < self.cached_count < len(self.documents):
+            blocks.append({"type": "text", "text": "".join(self.documents[:self.cached_count]), "cache_control": CACHE_CONTROL})
+            blocks.append({"type": "text", "text": "".join(self.documents[self.cached_count:]), "cache_control": CACHE_CONTROL})
+        else:
+            blocks.append({"type": "text", "text": self.text(), "cache_control": CACHE_CONTROL})
+        system = [{"type": "text", "text": self.instructions}]
+        return system, [{"role": "user", "content": blocks}]
+
+    def single_text(self):
+        # Providers without a system prompt or caching controls (Gemini)
+        return f"{self.instructions}\n\n{self.text()}"
+
+
+class PromptLayout:
+    # Remembers the file order of the last prompt so the next one can reuse it
+    def __init__(self):
+        self.previous = []  # [(path, digest)] in the order last sent
+
+    def order(self, sections):
+        # sections: [(path, header, body)] -> (ordered sections, number of unchanged leading sections)
+        digests = {path: hashlib.blake2b(body.encode('utf-8'), digest_size=16).digest() for path, _, body in sections}
+        by_path = {path: (path, header, body) for path, header, body in sections}
+        unchanged = [by_path[path] for path, digest in self.previous if digests.get(path) == digest]
+        kept = {path for path, _, _ in unchanged}
+        changed = sorted((section for section in sections if section[0] not in kept), key=lambda section: section[0])
+        ordered = unchanged + changed
+        self.previous = [(path, digests[path]) for path, _, _ in ordered]
+        return ordered, len(unchanged)
+
+    def build(self, text, file_paths):
+        # Falls back to the text as one block when it no longer splits into the imported files
+        try:
+            sections = list(split_plain_text(text, file_paths))
+        except BundleFormatError as e:
+            logging.info(f"Summarizing the combined text as one block: {e}")
+            return SummaryPrompt.from_text(text)
+        if not sections or len({path for path, _, _ in sections}) != len(sections):
+            return SummaryPrompt.from_text(text)
+        # The UI strips the combined text, so the last body lost its separator; ending
+        # every body the same way keeps a file's digest stable wherever it lands
+        sections = [(path, header, body.rstrip("\n") + "\n\n") for path, header, body in sections]
+        ordered, cached_count = self.order(sections)
+        documents = [header + body for _, header, body in ordered]
+        logging.info(f"Summary prompt: {cached_count} of {len(documents)} files unchanged since the last prompt.")
+        return SummaryPrompt(documents, cached_count)
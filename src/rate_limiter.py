@@ -0,0 +1,215 @@
+# rate_limiter.py
+# Per-provider request scheduling. Each provider gets one scheduler shared by
+# every AIProvider instance; it holds a token bucket for requests per minute
+# and one for tokens per minute, and lets queued calls through in priority
+# order. 429 responses become RateLimitError, and the Retry-After delay they
+# carry pauses the whole provider queue, not just the failed call. Transient
+# failures (5xx, Anthropic's 529 "overloaded", dropped connections) become
+# TransientError and only the failed call backs off and retries; the provider
+# SDKs' own retries are turned off so the two do not multiply.
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from cancellation import POLL_SECONDS
+
+# Lower runs first: interactive summaries jump ahead of queued bulk jobs
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+MAX_RETRIES = 3
+# Back-off when a 429 or transient error carries no usable retry hint: 2, 4, 8 seconds
+BACKOFF_SECONDS = 2.0
+# Retried like the SDKs did: these statuses, every 5xx, and connection failures by class name
+TRANSIENT_STATUSES = {408, 409}
+TRANSIENT_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "ConnectionError", "ChunkedEncodingError"}
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+class RateLimitError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TransientError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_duration(value):
+    # "1m30.5s", "250ms", "2s" (OpenAI/Groq x-ratelimit-reset-* headers) -> seconds
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value.strip():
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers):
+    # Seconds to wait according to a 429 response's headers, or None
+    if not headers:
+        return None
+    headers = {name.lower(): value for name, value in dict(headers).items()}
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    resets = [parse_duration(headers[name]) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens") if headers.get(name)]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+def error_status(error):
+    # HTTP status of a requests or provider SDK exception, without importing them
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None) or getattr(error, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def as_rate_limit_error(error):
+    if error_status(error) != 429:
+        return None
+    return RateLimitError(str(error), parse_retry_after(getattr(getattr(error, "response", None), "headers", None)))
+
+
+def as_transient_error(error):
+    status = error_status(error)
+    if status is not None:
+        if status < 500 and status not in TRANSIENT_STATUSES:
+            return None
+    elif not isinstance(error, ConnectionError) and not any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+        return None
+    return TransientError(str(error), parse_retry_after(getattr(getattr(error, "response", None), "headers", None)))
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount, now):
+        # Seconds until amount is available. Amounts above the capacity wait for a
+        # full bucket and leave it in debt, so one oversized request cannot block forever.
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= amount
+
+
+class RateLimitScheduler:
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_retries=MAX_RETRIES):
+        self.condition = threading.Condition()
+        self.queue = []  # heap of (priority, sequence) tickets
+        self.sequence = itertools.count()
+        self.paused_until = 0.0
+        self.max_retries = max_retries
+        self.request_bucket = None
+        self.token_bucket = None
+        self.configure(requests_per_minute, tokens_per_minute)
+
+    def configure(self, requests_per_minute=None, tokens_per_minute=None):
+        # Buckets are only replaced when a limit actually changes, so their levels survive
+        with self.condition:
+            if (self.request_bucket.capacity if self.request_bucket else None) != (requests_per_minute or None):
+                self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+            if (self.token_bucket.capacity if self.token_bucket else None) != (tokens_per_minute or None):
+                self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+            self.condition.notify_all()
+
+    def wait_time(self, tokens, now):
+        waits = [self.paused_until - now]
+        if self.request_bucket:
+            waits.append(self.request_bucket.wait_time(1, now))
+        if self.token_bucket and tokens:
+            waits.append(self.token_bucket.wait_time(tokens, now))
+        return max(waits)
+
+    def acquire(self, tokens=0, priority=PRIORITY_INTERACTIVE, cancel_token=None):
+        # Blocks until this call is first in line and both buckets have room
+        with self.condition:
+            ticket = (priority, next(self.sequence))
+            heapq.heappush(self.queue, ticket)
+            try:
+                while True:
+                    if cancel_token is not None:
+                        cancel_token.check()
+                    timeout = None
+                    if self.queue[0] == ticket:
+                        timeout = self.wait_time(tokens, time.monotonic())
+                        if timeout <= 0:
+                            heapq.heappop(self.queue)
+                            if self.request_bucket:
+                                self.request_bucket.take(1)
+                            if self.token_bucket:
+                                self.token_bucket.take(tokens)
+                            self.condition.notify_all()
+                            return
+                    if cancel_token is not None:
+                        timeout = POLL_SECONDS if timeout is None else min(timeout, POLL_SECONDS)
+                    self.condition.wait(timeout)
+            except BaseException:
+                if ticket in self.queue:
+                    self.queue.remove(ticket)
+                    heapq.heapify(self.queue)
+                    self.condition.notify_all()
+                raise
+
+    def pause(self, seconds):
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.condition.notify_all()
+
+    def run(self, call, tokens=0, priority=PRIORITY_INTERACTIVE, cancel_token=None):
+        # Runs call() when the limits allow it, retrying after 429s and transient errors
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens, priority, cancel_token)
+            try:
+                return call()
+            except (RateLimitError, TransientError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = e.retry_after if e.retry_after is not None else BACKOFF_SECONDS * 2 ** attempt
+                if isinstance(e, RateLimitError):
+                    logging.warning(f"Rate limited, retrying in {delay:.1f} seconds: {e}")
+                    self.pause(delay)
+                    continue
+                # Only this call waits; the rest of the queue keeps going
+                logging.warning(f"Request failed, retrying in {delay:.1f} seconds: {e}")
+                if cancel_token is not None:
+                    cancel_token.wait(delay)  # A cancel ends the wait; acquire() then raises
+                else:
+                    time.sleep(delay)
+
+
+def get_scheduler(provider_name, requests_per_minute=None, tokens_per_minute=None):
+    with _schedulers_lock:
+        scheduler = _schedulers.get(provider_name)
+        if scheduler is None:
+            scheduler = _schedulers[provider_name] = RateLimitScheduler(requests_per_minute, tokens_per_minute)
+            return scheduler
+    scheduler.configure(requests_per_minute, tokens_per_minute)
+    return scheduler
@@ -0,0 +1,137 @@
+# relevance_index.py
+# In-memory BM25 index over the imported files, used to pick the files most
+# relevant to a query that still fit a token budget. Postings are kept per
+# term, so a query only touches the documents that contain its terms, and
+# update() re-reads only files whose mtime or size changed.
+import logging
+import math
+import os
+import re
+from collections import Counter
+
+from minifier import get_extension
+from token_counter import DEFAULT_TOKENIZER, count_tokens
+
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|\d+')
+_CAMEL_PARTS = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+# Path terms (file and folder names) count this many times over body terms
+PATH_TERM_WEIGHT = 5
+MIN_TERM_LENGTH = 2
+
+
+def tokenize(text):
+    terms = []
+    for word in _IDENTIFIER.findall(text):
+        lower = word.lower()
+        if len(lower) >= MIN_TERM_LENGTH:
+            terms.append(lower)
+        # fooBarBaz / foo_bar_baz also match "foo", "bar" and "baz"
+        parts = _CAMEL_PARTS.findall(word)
+        if len(parts) > 1:
+            terms.extend(part.lower() for part in parts if len(part) >= MIN_TERM_LENGTH)
+    return terms
+
+
+class RelevanceIndex:
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = {}  # path -> {"mtime_ns", "size", "length", "tokens", "terms"}
+        self.postings = {}   # term -> {path: term frequency}
+        self.total_length = 0
+        self.tokenizer = DEFAULT_TOKENIZER
+
+    def update(self, file_paths, token_cache=None, tokenizer=None):
+        # token_cache: FileCombinerBackend.file_cache, reused when mtime, size and tokenizer still match
+        tokenizer = tokenizer or DEFAULT_TOKENIZER
+        if tokenizer != self.tokenizer:
+            # Token counts differ per model, so every document is counted again
+            self.documents.clear()
+            self.postings.clear()
+            self.total_length = 0
+            self.tokenizer = tokenizer
+        wanted = set(file_paths)
+        for file_path in [path for path in self.documents if path not in wanted]:
+            self.remove(file_path)
+        updated = 0
+        for file_path in file_paths:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                self.remove(file_path)
+                continue
+            document = self.documents.get(file_path)
+            if document and document["mtime_ns"] == stat.st_mtime_ns and document["size"] == stat.st_size:
+                continue
+            cached = (token_cache or {}).get(file_path)
+            if cached and (cached.get("mtime_ns"), cached.get("size"), cached.get("tokenizer", DEFAULT_TOKENIZER)) != (stat.st_mtime_ns, stat.st_size, tokenizer):
+                cached = None
+            self.add(file_path, stat, cached.get("tokens") if cached else None)
+            updated += 1
+        if updated:
+            logging.info(f"Relevance index updated {updated} of {len(file_paths)} files.")
+
+    def add(self, file_path, stat, tokens=None):
+        self.remove(file_path)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            logging.warning(f"Skipping {file_path} in relevance index: {e}")
+            return
+        terms = Counter(tokenize(content))
+        for term in tokenize(file_path):
+            terms[term] += PATH_TERM_WEIGHT
+        length = sum(terms.values())
+        header = f"# {os.path.basename(file_path)}\n"
+        self.documents[file_path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "length": length,
+            "tokens": tokens if tokens is not None else count_tokens(header + content + "\n\n", get_extension(file_path), self.tokenizer),
+            "terms": terms,
+        }
+        self.total_length += length
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[file_path] = frequency
+
+    def remove(self, file_path):
+        document = self.documents.pop(file_path, None)
+        if document is None:
+            return
+        self.total_length -= document["length"]
+        for term in document["terms"]:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(file_path, None)
+                if not postings:
+                    del self.postings[term]
+
+    def search(self, query):
+        # Returns [(path, score)] best first
+        document_count = len(self.documents)
+        if not document_count:
+            return []
+        average_length = self.total_length / document_count
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for file_path, frequency in postings.items():
+                length_norm = 1 - self.b + self.b * self.documents[file_path]["length"] / average_length
+                scores[file_path] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return scores.most_common()
+
+    def select_within_budget(self, query, token_budget):
+        # Greedy by rank: takes every ranked file that still fits, skipping ones that would overflow
+        selected = []
+        used_tokens = 0
+        for file_path, _ in self.search(query):
+            tokens = self.documents[file_path]["tokens"]
+            if used_tokens + tokens > token_budget:
+                continue
+            selected.append(file_path)
+            used_tokens += tokens
+        return selected, used_tokens
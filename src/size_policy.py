@@ -0,0 +1,130 @@
+# size_policy.py
+# Size limits for combined files. The pipeline stats each file before reading
+# it; a file over its limit (global, or per extension) is skipped, cut down to
+# its first and last lines, or replaced by an AI summary that is cached on disk
+# until the file changes. Only the excerpt's bytes are ever read for "excerpt".
+# Summaries are made before a combine, never during one, from at most
+# SUMMARY_INPUT_BYTES of the file.
+import json
+import logging
+import os
+import sys
+
+from minifier import get_extension
+
+ACTION_SKIP = "skip"
+ACTION_EXCERPT = "excerpt"
+ACTION_SUMMARY = "summary"
+ACTIONS = (ACTION_SKIP, ACTION_EXCERPT, ACTION_SUMMARY)
+
+# "extensions" overrides any of max_bytes, action, head_lines and tail_lines per extension
+DEFAULT_SIZE_POLICY = {
+    "enabled": False,
+    "max_bytes": 256 * 1024,
+    "action": ACTION_EXCERPT,
+    "head_lines": 60,
+    "tail_lines": 20,
+    "extensions": {
+        ".json": {"max_bytes": 64 * 1024},
+        ".svg": {"max_bytes": 16 * 1024, "action": ACTION_SKIP},
+    },
+}
+# Rough size of a token, for the savings of files that were never counted in full
+BYTES_PER_TOKEN = 4
+# Most of a large file sent for its AI summary: its start and end, half each
+SUMMARY_INPUT_BYTES = 64 * 1024
+SUMMARY_CACHE_FILE = "large_file_summaries.json"
+
+
+class SizePolicy:
+    def __init__(self, options=None):
+        self.options = dict(DEFAULT_SIZE_POLICY)
+        self.options.update(options or {})
+
+    @property
+    def enabled(self):
+        return bool(self.options.get("enabled"))
+
+    def rule(self, file_path):
+        rule = {key: self.options[key] for key in ("max_bytes", "action", "head_lines", "tail_lines")}
+        rule.update(self.options.get("extensions", {}).get(get_extension(file_path), {}))
+        if rule["action"] not in ACTIONS:
+            rule["action"] = ACTION_EXCERPT
+        return rule
+
+    def uses_action(self, action):
+        if not self.enabled:
+            return False
+        overrides = self.options.get("extensions", {}).values()
+        return self.options["action"] == action or any(rule.get("action") == action for rule in overrides)
+
+    def limit(self, file_path, size):
+        # The rule a file of this size breaks, or None when it may be included in full
+        if not self.enabled:
+            return None
+        rule = self.rule(file_path)
+        return rule if rule["max_bytes"] and size > rule["max_bytes"] else None
+
+
+def read_excerpt(file_path, size, rule):
+    # First head_lines and last tail_lines lines, reading at most max_bytes of the file
+    half = max(1, rule["max_bytes"] // 2)
+    with open(file_path, 'rb') as f:
+        head_chunk = f.read(min(half, size))
+        head = b"".join(head_chunk.splitlines(keepends=True)[:rule["head_lines"]])
+        tail = b""
+        tail_start = max(len(head), size - half)
+        if rule["tail_lines"] and tail_start < size:
+            f.seek(tail_start)
+            tail_lines = f.read().splitlines(keepends=True)
+            if tail_start > len(head) and tail_lines:
+                tail_lines = tail_lines[1:] # Starts mid-line
+            tail = b"".join(tail_lines[-rule["tail_lines"]:])
+    omitted = size - len(head) - len(tail)
+    if not head.endswith(b"\n"):
+        head += b"\n"
+    # A cut may land inside a multi-byte character
+    return (head.decode('utf-8', errors='replace') + f"... [{omitted} bytes omitted] ...\n"
+            + tail.decode('utf-8', errors='replace'))
+
+
+def read_summary_input(file_path, size, max_bytes=SUMMARY_INPUT_BYTES):
+    # The text a large file's AI summary is made from: all of it up to max_bytes, else its start and end
+    if size <= max_bytes:
+        with open(file_path, 'rb') as f:
+            return f.read(max_bytes).decode('utf-8', errors='replace')
+    return read_excerpt(file_path, size, {"max_bytes": max_bytes, "head_lines": sys.maxsize, "tail_lines": sys.maxsize})
+
+
+def skip_note(size, rule):
+    return f"(Skipped: {size} bytes, over the {rule['max_bytes']} byte limit)"
+
+
+class SummaryCache:
+    # AI summaries of large files, keyed by path and valid while mtime and size match
+    def __init__(self, cache_file=SUMMARY_CACHE_FILE):
+        self.cache_file = cache_file
+        self.entries = None
+
+    def load(self):
+        if self.entries is None:
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self.entries = {}
+        return self.entries
+
+    def get(self, file_path, stat):
+        entry = self.load().get(os.path.abspath(file_path))
+        if entry and (entry["mtime_ns"], entry["size"]) == (stat.st_mtime_ns, stat.st_size):
+            return entry["summary"]
+        return None
+
+    def put(self, file_path, stat, summary):
+        self.load()[os.path.abspath(file_path)] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "summary": summary}
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=4)
+        except OSError as e:
+            logging.error(f"Failed to save large file summaries: {e}")
@@ -0,0 +1,96 @@
+# token_benchmark.py
+# Compares the calibrated token estimate (and the old whitespace split) with
+# tiktoken on real files, and optionally refits ESTIMATOR_WEIGHTS.
+#
+#   python token_benchmark.py ~/code/project1 ~/code/project2 [--fit] [--limit 2000]
+#
+# Unlike the app, which falls back to a pure-Python estimator without them,
+# this script needs numpy and tiktoken (both in requirements.txt).
+import argparse
+import time
+
+import numpy
+import tiktoken
+
+import token_counter
+from file_combiner import FileCombinerBackend
+from minifier import get_extension
+
+
+def collect_samples(folders, limit):
+    backend = FileCombinerBackend()
+    samples = {}
+    for folder in folders:
+        for file_path in backend.get_files_from_folder(folder):
+            if not backend.is_supported_file(file_path):
+                continue
+            family = token_counter.get_family(get_extension(file_path))
+            if len(samples.setdefault(family, [])) >= limit:
+                continue
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except (OSError, UnicodeDecodeError):
+                continue
+            if text.strip():
+                samples[family].append((get_extension(file_path), text))
+    return samples
+
+
+def fit_weights(features, targets):
+    # Non-negative least squares on relative error (each row scaled by 1/target, so
+    # small files count as much as big ones): drop negative terms and refit
+    features = features / targets[:, None]
+    targets = numpy.ones_like(targets)
+    active = list(range(features.shape[1]))
+    while True:
+        weights, *_ = numpy.linalg.lstsq(features[:, active], targets, rcond=None)
+        if (weights >= 0).all():
+            break
+        active = [column for column, weight in zip(active, weights) if weight >= 0]
+    full = numpy.zeros(features.shape[1])
+    full[active] = weights
+    return full
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fallback token estimator against tiktoken.")
+    parser.add_argument("folders", nargs="+")
+    parser.add_argument("--fit", action="store_true", help="refit the per-family weights and print them")
+    parser.add_argument("--limit", type=int, default=2000, help="maximum files per language family")
+    options = parser.parse_args()
+
+    encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+    samples = collect_samples(options.folders, options.limit)
+    fitted = {}
+    print(f"{'family':<8} {'files':>6} {'tiktoken':>10} {'estimate':>10} {'total err':>9} {'file err':>9} {'split err':>9} {'tiktoken s':>10} {'estimate s':>10}")
+    for family, items in sorted(samples.items()):
+        start = time.perf_counter()
+        actual = numpy.array([len(encoding.encode(text, disallowed_special=())) for _, text in items], dtype=float)
+        tiktoken_seconds = time.perf_counter() - start
+
+        if options.fit:
+            features = numpy.array([token_counter.text_features(text.encode('utf-8', errors='surrogatepass')) for _, text in items], dtype=float)
+            fitted[family] = fit_weights(features, actual)
+            token_counter.ESTIMATOR_WEIGHTS[family] = list(fitted[family])
+
+        start = time.perf_counter()
+        estimated = numpy.array([token_counter.estimate_tokens(text, ext) for ext, text in items], dtype=float)
+        estimate_seconds = time.perf_counter() - start
+        split = numpy.array([len(text.split()) for _, text in items], dtype=float)
+
+        total_error = abs(estimated.sum() - actual.sum()) / actual.sum()
+        file_error = numpy.median(abs(estimated - actual) / actual)
+        split_error = numpy.median(abs(split - actual) / actual)
+        print(f"{family:<8} {len(items):>6} {int(actual.sum()):>10} {int(estimated.sum()):>10} {total_error:>9.1%} {file_error:>9.1%} {split_error:>9.1%} {tiktoken_seconds:>10.3f} {estimate_seconds:>10.3f}")
+
+    if fitted:
+        fitted.setdefault("default", numpy.array(list(fitted.values())).mean(axis=0))
+        print("\nESTIMATOR_WEIGHTS = {")
+        for family, weights in fitted.items():
+            print(f'    "{family}": [{", ".join(f"{weight:.4f}" for weight in weights)}],')
+        print("}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# token_counter.py
+import logging
+import re
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+    logging.warning("The 'tiktoken' library is not installed. Token counts are estimated. Install it with: pip install tiktoken")
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_tokenizers = {}
+
+# Tokenizer ids, as used for "tokenizer" in models.json:
+#   tiktoken:<encoding>          exact count with a tiktoken encoding
+#   approx:<encoding>:<factor>   tiktoken count scaled by factor, for providers whose tokenizer is not public
+#   estimate                     calibrated estimate below, no tiktoken needed
+DEFAULT_TOKENIZER = "tiktoken:cl100k_base"
+
+# Calibrated fallback for when tiktoken is missing. Text is reduced to byte
+# classes and the estimate is a weighted sum of:
+#   word runs, word bytes, punctuation bytes, whitespace runs, newlines, non-ASCII bytes
+# Weights were fitted per language family against cl100k_base with
+# token_benchmark.py (re-run it with --fit to refit on your own code).
+# "script" was fitted on 1408 files (300 each of .sh, .rb, .pl and .tcl from
+# Ruby, Perl, Tcl, conda and cargo installs, plus 103 .ps1, 82 .bat and 24
+# .coffee): 5.2% median error per file, against 15% for the earlier weights.
+# Those samples have almost no non-ASCII bytes, so that weight is "default"'s.
+FEATURE_NAMES = ["word_runs", "word_bytes", "punct_bytes", "space_runs", "newlines", "non_ascii_bytes"]
+ESTIMATOR_WEIGHTS = {
+    "python": [0.0000, 0.2098, 0.6960, 0.0000, 1.0060, 0.6452],
+    "c": [0.0000, 0.2058, 0.4638, 0.3215, 1.2669, 0.4192],
+    "script": [0.6892, 0.1401, 0.4440, 0.0000, 1.4365, 0.5075],
+    "markup": [0.0000, 0.2728, 0.6199, 0.0000, 0.0937, 0.5191],
+    "data": [0.7764, 0.1579, 0.2619, 0.0000, 2.3528, 0.7151],
+    "prose": [0.8461, 0.0819, 0.3409, 0.0000, 0.9295, 0.7461],
+    "default": [0.2704, 0.2397, 0.3971, 0.0536, 0.9415, 0.5075],
+}
+LANGUAGE_FAMILIES = {
+    "python": {'.py'},
+    "c": {'.c', '.h', '.cpp', '.hpp', '.cs', '.java', '.kt', '.go', '.rs', '.swift', '.dart', '.scala', '.m',
+          '.js', '.jsx', '.ts', '.tsx', '.php', '.groovy', '.gradle', '.vue', '.svelte', '.css'},
+    "script": {'.sh', '.rb', '.pl', '.r', '.lua', '.ps1', '.powershell', '.bat', '.vbs', '.tcl', '.ex', '.exs',
+               '.sql', '.coffee'},
+    "markup": {'.html', '.htm', '.xml'},
+    "data": {'.json', '.yaml', '.toml', '.ini'},
+    "prose": {'.md', '.txt'},
+}
+_FAMILY_BY_EXTENSION = {ext: family for family, extensions in LANGUAGE_FAMILIES.items() for ext in extensions}
+
+# Byte class codes: 0 space/tab, 1 newline, 2 word ([A-Za-z0-9_]), 3 punctuation, 4 non-ASCII
+_CLASS_CODES = bytearray(b"3" * 128 + b"4" * 128)
+for _byte in b" \t\r\x0b\x0c":
+    _CLASS_CODES[_byte] = ord("0")
+_CLASS_CODES[ord("\n")] = ord("1")
+for _byte in b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_":
+    _CLASS_CODES[_byte] = ord("2")
+_CLASS_CODES = bytes(_CLASS_CODES)
+_WORD_RUNS = re.compile(rb"2+")
+_SPACE_RUNS = re.compile(rb"0+")
+_CLASS_TABLE = numpy.frombuffer(_CLASS_CODES, dtype=numpy.uint8) - ord("0") if numpy is not None else None
+
+
+def get_family(ext):
+    return _FAMILY_BY_EXTENSION.get((ext or "").lower(), "default")
+
+
+def text_features(data):
+    # data: UTF-8 bytes. Returns counts in FEATURE_NAMES order.
+    if numpy is not None and len(data) > 4096:
+        classes = _CLASS_TABLE[numpy.frombuffer(data, dtype=numpy.uint8)]
+        run_starts = numpy.empty(len(classes), dtype=bool)
+        run_starts[0] = True
+        numpy.not_equal(classes[1:], classes[:-1], out=run_starts[1:])
+        byte_counts = numpy.bincount(classes, minlength=5)
+        run_counts = numpy.bincount(classes[run_starts], minlength=5)
+        return [int(run_counts[2]), int(byte_counts[2]), int(byte_counts[3]),
+                int(run_counts[0]), int(byte_counts[1]), int(byte_counts[4])]
+    # Small inputs (or no NumPy): translate to class codes and count with bytes methods
+    classes = data.translate(_CLASS_CODES)
+    return [len(_WORD_RUNS.findall(classes)), classes.count(b"2"), classes.count(b"3"),
+            len(_SPACE_RUNS.findall(classes)), classes.count(b"1"), classes.count(b"4")]
+
+
+def estimate_tokens(text, ext=None):
+    if not text:
+        return 0
+    features = text_features(text.encode('utf-8', errors='surrogatepass'))
+    weights = ESTIMATOR_WEIGHTS[get_family(ext)]
+    return max(1, round(sum(weight * value for weight, value in zip(weights, features))))
+
+
+class EstimateTokenizer:
+    def count(self, text, ext=None):
+        return estimate_tokens(text, ext)
+
+
+class TiktokenTokenizer:
+    def __init__(self, encoding_name):
+        self.encoding_name = encoding_name
+        self.encoding = None
+        if tiktoken:
+            try:
+                self.encoding = tiktoken.get_encoding(encoding_name)
+            except Exception as e:
+                logging.warning(f"Could not load tiktoken encoding {encoding_name}, token counts are estimated: {e}")
+
+    def count(self, text, ext=None):
+        if self.encoding is None:
+            return estimate_tokens(text, ext) # Estimate if tiktoken is not available
+        try:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        except Exception as e:
+            logging.warning(f"Error calculating token count with tiktoken: {e}")
+            return estimate_tokens(text, ext) # Fallback to the calibrated estimate
+
+
+class ApproximateTokenizer:
+    def __init__(self, base, factor):
+        self.base = base
+        self.factor = factor
+
+    def count(self, text, ext=None):
+        if not text:
+            return 0
+        return max(1, round(self.base.count(text, ext) * self.factor))
+
+
+def create_tokenizer(tokenizer_id):
+    kind, _, spec = tokenizer_id.partition(":")
+    try:
+        if kind == "tiktoken" and spec:
+            return TiktokenTokenizer(spec)
+        if kind == "approx":
+            encoding_name, factor = spec.rsplit(":", 1)
+            return ApproximateTokenizer(get_tokenizer(f"tiktoken:{encoding_name}"), float(factor))
+        if kind == "estimate":
+            return EstimateTokenizer()
+    except ValueError:
+        pass
+    logging.warning(f"Unknown tokenizer '{tokenizer_id}', using {DEFAULT_TOKENIZER}.")
+    return get_tokenizer(DEFAULT_TOKENIZER)
+
+
+def get_tokenizer(tokenizer_id=None):
+    # Tokenizers (and their BPE tables) are loaded once per process and reused
+    tokenizer_id = tokenizer_id or DEFAULT_TOKENIZER
+    tokenizer = _tokenizers.get(tokenizer_id)
+    if tokenizer is None:
+        tokenizer = _tokenizers[tokenizer_id] = create_tokenizer(tokenizer_id)
+    return tokenizer
+
+
+def count_tokens(text, ext=None, tokenizer=None):
+    # tokenizer: a tokenizer id (see DEFAULT_TOKENIZER); defaults to cl100k_base
+    return get_tokenizer(tokenizer).count(text, ext)
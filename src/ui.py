@@ -3,22 +3,34 @@
 # ui.py
 # ui.py
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
 from tkinterdnd2 import DND_FILES
 import ttkbootstrap as ttk
 from file_combiner import FileCombinerBackend
 from ui_menu import FileCombinerMenu
+from output_writers import OUTPUT_FORMATS, is_plain_text_format, write_combined_text
+from token_counter import count_tokens
+from project_index import PROJECT_EXTENSION
+import atexit
 import logging
 import os  # Import os for path manipulation
+import threading
 import time  # Import the time module
 
-try:
-    import tiktoken
-except ImportError:
-    tiktoken = None
-    logging.warning("The 'tiktoken' library is not installed. Token counts may be inaccurate. Install it with: pip install tiktoken")
-
-from ai_integration import summarize_text
+from ai_integration import get_current_model_profile, get_current_provider, load_models, show_summary_popup
+from cancellation import CallCancelled, CallTimedOut, CancelToken
+from rate_limiter import PRIORITY_BULK
+from file_importer import ImportScan, describe_skipped
+from jobs import CombineJob, SummaryJob
+from memory_budget import format_bytes, peak_rss_bytes, spill_threshold
+
+SUMMARY_POLL_MS = 100
+# After a cancel or deadline, how long the UI waits for the call to hand back partial output
+CANCEL_GRACE_SECONDS = 2
+IMPORT_POLL_MS = 16
+RELEVANCE_POLL_MS = 50
+# Import batches applied per poll, so a large drop never stalls a frame
+IMPORT_BATCHES_PER_POLL = 4
 
 class FileCombinerApp:
     def __init__(self, root):
@@ -28,6 +40,19 @@ class FileCombinerApp:
 
         # Initialize the backend logic
         self.backend = FileCombinerBackend()
+        self.models_data = load_models()
+        self.model_profile = None
+        self.summary_call = None  # running AI summary: thread, cancel token, result, provider
+        self.large_summary_call = None  # large-file summaries made before a combine: thread, cancel token, progress
+        self.import_scan = None  # running background import (file_importer.ImportScan)
+        self.relevance_call = None  # relevance index update on a worker thread: thread, query, budget, result
+        self.pending_import_paths = []  # paths dropped while an import was running
+        self.skipped_files = []  # unsupported files seen by the running import
+        self.spilled_output = None  # memory_budget.SpilledText while the text area only shows a preview
+        self.import_errors = 0
+        # A spilled output's temp file goes when the window closes, or at exit if it never does
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        atexit.register(self.delete_spill_file)
 
         # Initialize the menu
         self.menu = FileCombinerMenu(self.root, self)
@@ -157,50 +182,197 @@ class FileCombinerApp:
 
     def on_drop(self, event):
         paths = self.root.tk.splitlist(event.data)  # Handles file paths with spaces correctly
-        for path in paths:
-            if self.backend.is_directory(path):
-                self.import_folder(path)
-            elif self.backend.is_file(path):
-                self.import_file(path)
-
-    def import_folder(self, folder_path):
-        files_added = False
-        for file_path in self.backend.get_files_from_folder(folder_path):
-            self.import_file(file_path)
-            files_added = True
-        if files_added:
-            self.combine_button.config(state=tk.NORMAL)
-            self.edit_button.config(state=tk.NORMAL)
-
-    def import_file(self, file_path):
-        if self.backend.is_supported_file(file_path):
-            file_name = os.path.basename(file_path)
-            self.backend.add_file_path(file_path)
+        self.import_paths(paths)
 
-            # Define tags and styles
+    def import_paths(self, paths):
+        # Folders are walked and files filtered on a worker thread; poll_import adds them in batches
+        if self.import_scan is not None:
+            self.pending_import_paths.extend(paths)
+            return
+        self.skipped_files = []
+        self.import_errors = 0
+        self.import_scan = ImportScan(self.backend, paths).start()
+        self.start_progress()
+        self.root.after(IMPORT_POLL_MS, self.poll_import)
+
+    def poll_import(self):
+        scan = self.import_scan
+        if scan is None:
+            return # Cleared while importing
+        styled_text = []
+        done = False
+        for kind, payload in scan.drain(IMPORT_BATCHES_PER_POLL):
+            if kind == "folder":
+                self.backend.add_scanned_folder(*payload)
+            elif kind == "files":
+                accepted, skipped = payload
+                self.backend.add_file_paths(accepted)
+                self.skipped_files += skipped
+                for file_path in accepted:
+                    styled_text += [f"{os.path.basename(file_path)} ", "filename", f"({file_path})\n", "filepath"]
+            elif kind == "error":
+                self.import_errors += 1
+                self.display_error(payload)
+            else:
+                done = True
+        if styled_text:
+            if self.spilled_output is not None:
+                self.show_file_list() # The read-only output preview gives way to the file list
+            # One insert call per poll instead of two per file
             self.text_area.tag_config("filename", foreground="green", font=("Arial", 10, "bold"))
             self.text_area.tag_config("filepath", foreground="grey", font=("Arial", 8, "italic"))
-
-            # Insert styled text
-            self.text_area.insert(tk.END, f"{file_name} ", "filename")
-            self.text_area.insert(tk.END, f"({file_path})\n", "filepath")
-
-            self.clear_error()  # Clear any previous error
-            self.combine_button.config(state=tk.NORMAL)  # Enable combine button
+            self.text_area.insert(tk.END, *styled_text)
+            self.combine_button.config(state=tk.NORMAL)
             self.edit_button.config(state=tk.NORMAL)
-        else:
-            self.display_error(f"Unsupported extension - {file_path}. If it's a code file, use 'Preferences -> Manage Extensions' to add it.")
+        if not done:
+            self.root.after(IMPORT_POLL_MS, self.poll_import)
+            return
+
+        self.import_scan = None
+        self.stop_progress()
+        if self.skipped_files:
+            self.display_error(describe_skipped(self.skipped_files))
+        elif not self.import_errors:
+            self.clear_error()
+        if self.pending_import_paths:
+            paths, self.pending_import_paths = self.pending_import_paths, []
+            self.import_paths(paths)
+
+    def cancel_import(self):
+        if self.import_scan is not None:
+            self.import_scan.cancel()
+            self.import_scan = None
+            self.stop_progress()
+        self.pending_import_paths = []
 
     def open_files(self):
         files = filedialog.askopenfilenames(filetypes=[("All files", "*.*")])
         if files:
-            for file in files:
-                self.import_file(file)
+            self.import_paths(files)
 
     def open_folder(self):
         folder = filedialog.askdirectory()
         if folder:
-            self.import_folder(folder)
+            self.import_paths([folder])
+
+    def open_project(self):
+        project_path = filedialog.askopenfilename(filetypes=[("Code Combiner projects", f"*{PROJECT_EXTENSION}"), ("All files", "*.*")])
+        if not project_path:
+            return
+        self.start_progress()
+        self.root.update()
+        try:
+            self.clear_text()
+            self.apply_model_profile()
+            self.backend.open_project(project_path)
+        except Exception as e:
+            self.display_error(f"Could not open project {project_path}: {e}")
+            return
+        finally:
+            self.root.after(300, self.stop_progress)
+
+        self.show_file_list()
+
+        cached_tokens = self.backend.cached_token_count()
+        if cached_tokens is not None:
+            self.token_count_label.config(text=self.format_token_count(cached_tokens, "cached"))
+        self.error_label.config(text=f"Opened project with {len(self.backend.file_paths)} files.", foreground="green")
+
+    def show_file_list(self):
+        # One insert call for the whole list instead of two per file
+        self.release_spilled_output()
+        self.text_area.delete(1.0, tk.END)
+        self.text_area.tag_config("filename", foreground="green", font=("Arial", 10, "bold"))
+        self.text_area.tag_config("filepath", foreground="grey", font=("Arial", 8, "italic"))
+        styled_text = []
+        for file_path in self.backend.file_paths:
+            styled_text += [f"{os.path.basename(file_path)} ", "filename", f"({file_path})\n", "filepath"]
+        if styled_text:
+            self.text_area.insert(tk.END, *styled_text)
+            self.combine_button.config(state=tk.NORMAL)
+            self.edit_button.config(state=tk.NORMAL)
+        else:
+            self.combine_button.config(state=tk.DISABLED)
+            self.edit_button.config(state=tk.DISABLED)
+
+    def select_relevant_files(self):
+        if self.relevance_call is not None:
+            return # Still indexing for the previous selection
+        if not self.backend.file_paths and not self.backend.candidate_file_paths:
+            messagebox.showwarning("No Files", "Please add files first.")
+            return
+        query = simpledialog.askstring("Select Relevant Files", "Describe what you are looking for:", parent=self.root)
+        if not query:
+            return
+        token_budget = simpledialog.askinteger("Token Budget", "Maximum tokens for the selected files:", initialvalue=8000, minvalue=1, parent=self.root)
+        if not token_budget:
+            return
+        self.apply_model_profile()
+        # The first update reads and tokenizes every candidate, so it runs off the Tk thread
+        candidates = self.backend.relevance_candidates()
+        call = {"query": query, "token_budget": token_budget, "result": {}}
+        def run():
+            try:
+                self.backend.update_relevance_index(candidates)
+            except Exception as e:
+                call["result"]["error"] = e
+        call["thread"] = threading.Thread(target=run, name="relevance-index", daemon=True)
+        self.relevance_call = call
+        self.start_progress()
+        self.error_label.config(text=f"Indexing {len(candidates)} files...", foreground="grey")
+        call["thread"].start()
+        self.root.after(RELEVANCE_POLL_MS, self.poll_relevance_index)
+
+    def poll_relevance_index(self):
+        call = self.relevance_call
+        if call["thread"].is_alive():
+            self.root.after(RELEVANCE_POLL_MS, self.poll_relevance_index)
+            return
+        self.relevance_call = None
+        self.stop_progress()
+        error = call["result"].get("error")
+        if error is not None:
+            logging.error(f"Error while indexing files: {error}")
+            self.display_error(f"Could not index the files: {error}")
+            return
+        if not self.backend.candidate_file_paths:
+            self.clear_error() # The list was cleared while indexing
+            return
+        query = call["query"]
+        used_tokens = self.backend.apply_relevance_selection(query, call["token_budget"])
+        self.show_file_list()
+        self.token_count_label.config(text=self.format_token_count(used_tokens, "selected"))
+        self.error_label.config(text=f"Selected {len(self.backend.file_paths)} of {len(self.backend.candidate_file_paths)} files for \"{query}\".", foreground="green")
+
+    def save_project(self):
+        if not self.backend.file_paths:
+            messagebox.showwarning("No Files", "Please add files first.")
+            return
+        project_path = filedialog.asksaveasfilename(defaultextension=PROJECT_EXTENSION,
+                                                    filetypes=[("Code Combiner projects", f"*{PROJECT_EXTENSION}")])
+        if project_path:
+            try:
+                self.backend.save_project(project_path)
+                self.error_label.config(text=f"Project saved to {project_path}", foreground="green")
+            except Exception as e:
+                self.display_error(f"Error saving project: {e}")
+
+    def open_git_changes(self):
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        since_commit = simpledialog.askstring("Changed Since", "Combine files changed since commit:", initialvalue="HEAD", parent=self.root)
+        if not since_commit:
+            return
+        try:
+            changed_files = self.backend.get_changed_files_from_folder(folder, since_commit.strip())
+        except Exception as e:
+            self.display_error(str(e))
+            return
+        if not changed_files:
+            self.error_label.config(text=f"No files changed since {since_commit}.", foreground="green")
+            return
+        self.import_paths(changed_files)
 
     def show_file_folder_menu(self):
         self.file_folder_menu.post(self.open_button.winfo_rootx(), self.open_button.winfo_rooty() + self.open_button.winfo_height())
@@ -235,9 +407,10 @@ class FileCombinerApp:
 
     def remove_file(self, file_path, popup):
         if file_path in self.backend.file_paths:
-            self.backend.file_paths.remove(file_path)
+            self.backend.remove_file_path(file_path)
 
             # Update the text area
+            self.release_spilled_output()
             self.text_area.delete(1.0, tk.END)
             for path in self.backend.file_paths:
                 file_name = os.path.basename(path)
@@ -253,49 +426,186 @@ class FileCombinerApp:
                 self.combine_button.config(state=tk.DISABLED)
 
     def calculate_token_count(self, text):
-        if tiktoken:
-            try:
-                encoding = tiktoken.encoding_for_model("gpt-3.5-turbo") # Or another suitable model
-                return len(encoding.encode(text))
-            except Exception as e:
-                logging.warning(f"Error calculating token count with tiktoken: {e}")
-                return len(text.split()) # Fallback to simple split
-        else:
-            return len(text.split()) # Simple split if tiktoken is not available
+        return count_tokens(text, tokenizer=self.backend.tokenizer)
+
+    def apply_model_profile(self):
+        # Counts use the tokenizer of the model selected in AI Configuration
+        self.model_profile = get_current_model_profile(self.models_data)
+        self.backend.tokenizer = self.model_profile["tokenizer"]
+
+    def format_token_count(self, token_count, label=None):
+        # label ("cached", "selected") marks counts that do not come from the last combine
+        notes = [label] if label else []
+        stats = {} if label else self.backend.last_combine_stats
+        if stats.get("tokens_before_minify"):
+            notes.append(f"minified from {stats['tokens_before_minify']} to {stats['tokens_after_minify']}")
+        if stats.get("duplicates"):
+            notes.append(f"dedup saved {stats['tokens_saved']} tokens, {stats['duplicates']} duplicate files")
+        if stats.get("size_limited"):
+            notes.append(f"size limits saved ~{stats['size_tokens_saved']} tokens, {stats['size_bytes_saved'] // 1024} KB in {stats['size_limited']} large files")
+        context_window = self.model_profile and self.model_profile["context_window"]
+        if context_window:
+            notes.append(f"{token_count * 100 // context_window}% of {self.model_profile['model']}")
+        self.token_count_label.config(foreground="red" if context_window and token_count > context_window else "grey")
+        if notes:
+            return f"Token Count: {token_count} ({'; '.join(notes)})"
+        return f"Token Count: {token_count}"
 
     def summarize_combined_text(self):
-        combined_content = self.text_area.get(1.0, tk.END).strip()
+        if self.summary_call is not None:
+            self.cancel_summary() # The button reads "Cancel" while a summary runs
+            return
+        # A spilled output goes to the job as its file, which is read a section at a time
+        combined_content = self.spilled_output or self.get_combined_text()
         if not combined_content:
             messagebox.showwarning("No Content", "There is no combined content to summarize.")
             return
+        # The request runs on a worker thread; the Tk thread only polls for its result
+        provider = get_current_provider()
+        if self.spilled_output is not None and provider.input_token_budget() is None:
+            if not self.confirm_large_copy("Summarize", "sending it in one request"):
+                return
+        # Checkpointed per chunk when the text needs more than one request (see jobs.py)
+        job = SummaryJob(provider, combined_content, self.backend.file_paths, self.backend.prompt_layout)
+        call = {"token": CancelToken(), "result": {}, "provider": provider, "stopped_at": None}
+        def run():
+            try:
+                call["result"]["summary"] = job.run(cancel_token=call["token"])
+            except Exception as e:
+                call["result"]["error"] = e
+        call["thread"] = threading.Thread(target=run, name="ai-summary", daemon=True)
+        self.summary_call = call
+        self.summarize_button.config(text="Cancel")
         self.start_progress()  # Start progress before summarization
-        self.root.update()  # Force UI update to show progress bar immediately
-        try:
-            summarize_text(combined_content, app=self)
-        finally:
-            self.root.after(300, self.stop_progress) # Stop progress bar after 300ms
+        call["thread"].start()
+        self.root.after(SUMMARY_POLL_MS, self.poll_summary)
+
+    def cancel_summary(self):
+        self.summary_call["token"].cancel()
+        self.summary_call["stopped_at"] = time.monotonic()
+        self.summarize_button.config(state=tk.DISABLED)
+        self.error_label.config(text="Cancelling summary...", foreground="orange")
+
+    def poll_summary(self):
+        call = self.summary_call
+        if call["thread"].is_alive():
+            if call["stopped_at"] is None and call["token"].timed_out:
+                call["stopped_at"] = time.monotonic()
+            if call["stopped_at"] is None or time.monotonic() - call["stopped_at"] < CANCEL_GRACE_SECONDS:
+                self.root.after(SUMMARY_POLL_MS, self.poll_summary)
+                return
+            # The call did not stop in time (e.g. a provider SDK blocked in a read): leave it behind
+            logging.warning("AI summary did not stop after cancel; abandoning the request.")
+            call["result"] = {"error": call["token"].error() or CallCancelled("Request cancelled.")}
+        self.summary_call = None
+        self.stop_progress()
+        self.summarize_button.config(text="AI Summarize (Beta)", state=tk.NORMAL)
+        self.error_label.config(text="")
+
+        error = call["result"].get("error")
+        if error is None:
+            show_summary_popup(self, call["result"]["summary"], call["provider"].settings)
+        elif isinstance(error, CallCancelled):
+            reason = "timed out" if isinstance(error, CallTimedOut) else "was cancelled"
+            if error.partial:
+                show_summary_popup(self, error.partial, call["provider"].settings, note=f"Partial summary: the request {reason}.")
+            else:
+                self.error_label.config(text=f"The summary request {reason}.", foreground="orange")
+        else:
+            logging.error(f"Error during summarization: {error}")
+            messagebox.showerror("Summarization Error", str(error))
 
     def combine_files(self):
+        if self.large_summary_call is not None:
+            self.cancel_large_summaries() # The button reads "Cancel" while large files are summarized
+            return
         if not self.backend.file_paths:
             messagebox.showwarning("No Files", "Please add files first.")
             return
+        # Files for the "AI Summary" large-file action are summarized first, on a worker thread;
+        # the combine itself only reads the summary cache
+        pending = self.backend.files_needing_summaries()
+        if pending:
+            self.summarize_large_files(pending)
+        else:
+            self.run_combine()
+
+    def summarize_large_files(self, pending):
+        provider = get_current_provider()
+        call = {"token": CancelToken(), "done": 0, "total": len(pending), "stopped_at": None}
+        def run():
+            for file_path, stat in pending:
+                if call["token"].cancelled:
+                    break
+                try:
+                    self.backend.summarize_large_file(
+                        file_path, stat, lambda text: provider.summarize(text, priority=PRIORITY_BULK, cancel_token=call["token"]))
+                except CallCancelled:
+                    break
+                except Exception as e:
+                    logging.warning(f"Could not summarize {file_path}, including an excerpt instead: {e}")
+                call["done"] += 1
+        call["thread"] = threading.Thread(target=run, name="large-file-summaries", daemon=True)
+        self.large_summary_call = call
+        self.combine_button.config(text="Cancel")
+        self.start_progress()
+        call["thread"].start()
+        self.root.after(SUMMARY_POLL_MS, self.poll_large_summaries)
 
+    def cancel_large_summaries(self):
+        self.large_summary_call["token"].cancel()
+        self.large_summary_call["stopped_at"] = time.monotonic()
+        self.combine_button.config(state=tk.DISABLED)
+        self.error_label.config(text="Cancelling summaries; unsummarized files get an excerpt...", foreground="orange")
+
+    def poll_large_summaries(self):
+        call = self.large_summary_call
+        if call["thread"].is_alive():
+            if call["stopped_at"] is None:
+                self.error_label.config(text=f"Summarizing large files ({call['done']} of {call['total']})...", foreground="grey")
+            if call["stopped_at"] is None or time.monotonic() - call["stopped_at"] < CANCEL_GRACE_SECONDS:
+                self.root.after(SUMMARY_POLL_MS, self.poll_large_summaries)
+                return
+            logging.warning("Large-file summaries did not stop after cancel; abandoning the request.")
+        self.large_summary_call = None
+        self.combine_button.config(text="Combine Files", state=tk.NORMAL)
+        self.error_label.config(text="")
+        # Files without a summary (cancelled or failed) are combined as excerpts
+        self.run_combine()
+
+    def run_combine(self):
         self.start_progress() # Start progress before a potentially long operation
         self.root.update() # Force UI update to show progress bar immediately
         start_time = time.time() # For measuring execution time
 
-        combined_content = self.backend.combine_files()
-        token_count = self.calculate_token_count(combined_content)
+        self.apply_model_profile()
+        self.release_spilled_output()
+        # Checkpointed as it goes, so an interrupted combine of the same files resumes.
+        # Past the memory budget's share the output stays on disk (a SpilledText).
+        job = CombineJob(self.backend)
+        combined_content = job.run(spill_threshold(self.backend.memory_budget_mb))
+        # Counted per file inside the combine pipeline, so no second pass over the whole text
+        token_count = self.backend.last_combine_stats["tokens"]
 
         end_time = time.time()
-        print(f"combine_files execution time: {end_time - start_time:.4f} seconds")
+        peak_rss = peak_rss_bytes()
+        print(f"combine_files execution time: {end_time - start_time:.4f} seconds"
+              + (f", peak RSS: {format_bytes(peak_rss)}" if peak_rss is not None else ""))
 
         # Display token count
-        self.token_count_label.config(text=f"Token Count: {token_count}")
+        self.token_count_label.config(text=self.format_token_count(token_count))
 
         # Display combined content in the text area
         self.text_area.delete(1.0, tk.END)
-        self.text_area.insert(tk.END, combined_content)
+        if isinstance(combined_content, str):
+            self.text_area.insert(tk.END, combined_content)
+        else:
+            self.spilled_output = combined_content
+            self.text_area.insert(tk.END, combined_content.preview())
+            self.text_area.insert(tk.END, f"\n\n... [Preview only: the full output is {format_bytes(combined_content.size)}, "
+                                          "over the memory budget. Copy, Save and Summarize use all of it.]")
+            # Edits to a preview would never reach the file that Copy, Save and Summarize read
+            self.text_area.config(state=tk.DISABLED)
         self.text_area.tag_remove("error", "1.0", tk.END)
 
         # Enable the copy and download buttons
@@ -306,20 +616,61 @@ class FileCombinerApp:
         self.edit_button.config(state=tk.DISABLED)
 
         # Show success message
-        self.error_label.config(text="Provided files now combined. You can copy to clipboard or save the file.", foreground="green")
+        message = "Provided files now combined. You can copy to clipboard or save the file."
+        if job.resumed_files:
+            message = f"Resumed an interrupted combine ({job.resumed_files} of {len(job.file_paths)} files were already done). " + message
+        self.error_label.config(text=message, foreground="green")
 
         # Disable the combine button
         self.combine_button.config(state=tk.DISABLED)
         self.root.after(300, self.stop_progress) # Keep progress bar for a short duration
 
+    def get_combined_text(self):
+        # The whole combined text, read back from disk when only a preview is shown
+        if self.spilled_output is not None:
+            return self.spilled_output.read().strip()
+        return self.text_area.get(1.0, tk.END).strip()
+
+    def release_spilled_output(self):
+        if self.spilled_output is not None:
+            self.delete_spill_file()
+            self.spilled_output = None
+            self.text_area.config(state=tk.NORMAL)
+
+    def delete_spill_file(self):
+        # Safe after the window is gone; SpilledText.close() ignores a file that was already removed
+        if self.spilled_output is not None:
+            self.spilled_output.close()
+
+    def on_close(self):
+        for call in (self.summary_call, self.large_summary_call):
+            if call is not None:
+                call["token"].cancel()
+        self.cancel_import()
+        self.release_spilled_output()
+        self.root.destroy()
+
+    def confirm_large_copy(self, action, how):
+        # Asks before an output that is over the memory budget is read into memory in full
+        threshold = spill_threshold(self.backend.memory_budget_mb)
+        if self.spilled_output is None or threshold is None or self.spilled_output.size <= threshold:
+            return True
+        return messagebox.askyesno(
+            action, f"The combined output is {format_bytes(self.spilled_output.size)}, over the memory budget's "
+                    f"{format_bytes(threshold)} for one output. {action} anyway? This loads all of it into memory, "
+                    f"{how}. Save writes it to a file without loading it.", icon="warning")
+
     def copy_to_clipboard(self):
-        combined_content = self.text_area.get(1.0, tk.END)
+        if not self.confirm_large_copy("Copy", "and the clipboard holds another copy"):
+            return
         self.root.clipboard_clear()
-        self.root.clipboard_append(combined_content.strip())
+        self.root.clipboard_append(self.get_combined_text())
         self.error_label.config(text="Combined text copied to clipboard!", foreground="green")
         logging.info("Combined content copied to clipboard.")
 
     def clear_text(self):
+        self.cancel_import()
+        self.release_spilled_output()
         self.text_area.delete(1.0, tk.END)
         self.backend.clear_file_paths()
         self.copy_button.config(state=tk.DISABLED)
@@ -338,16 +689,22 @@ class FileCombinerApp:
             messagebox.showwarning("No Content", "There is no combined content to save.")
             return
 
-        file_path = filedialog.asksaveasfilename(defaultextension=".txt",
-                                                 filetypes=[("Text files", "*.txt"), ("Markdown files", "*.md"), ("All files", "*.*")])
+        filetypes = [("Text files", "*.txt"), ("Markdown files", "*.md")]
+        filetypes += [(description, f"*{suffix}") for suffix, description in OUTPUT_FORMATS]
+        filetypes.append(("All files", "*.*"))
+        file_path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=filetypes)
         if file_path:
             try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(combined_content)
+                # Every format saves the text as shown; a spilled output is read-only, so its file is that text
+                if self.spilled_output is not None and is_plain_text_format(file_path):
+                    self.spilled_output.copy_to(file_path)
+                else:
+                    write_combined_text(file_path, self.get_combined_text(), self.backend.file_paths)
                 messagebox.showinfo("Saved", f"Combined content saved to {file_path}")
                 logging.info(f"Combined content saved to {file_path}")
             except Exception as e:
                 logging.error(f"Error saving file: {e}")
+                messagebox.showerror("Save Error", str(e))
 
 if __name__ == "__main__":
     root = ttk.Window(themename="litera")
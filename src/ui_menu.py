@@ -1,11 +1,12 @@
 # ui_menu.py
 import tkinter as tk
-from tkinter import filedialog, messagebox, Toplevel
+from tkinter import filedialog, messagebox, simpledialog, Toplevel
 import webbrowser
 import logging
 import ttkbootstrap as ttk
 import re
 from ai_ui import AIConfigurationDialog
+from size_policy import ACTION_EXCERPT, ACTION_SKIP, ACTION_SUMMARY
 
 class HyperlinkManager:
     def __init__(self, text):
@@ -44,6 +45,12 @@ class FileCombinerMenu:
         parent.config(menu=self.menu_bar)
 
         self.always_on_top_var = tk.BooleanVar()
+        self.dedupe_var = tk.BooleanVar(value=self.app.backend.dedupe_enabled)
+        self.git_source_var = tk.BooleanVar(value=self.app.backend.git_source_enabled)
+        self.minify_var = tk.BooleanVar(value=self.app.backend.minify_enabled)
+        self.minify_option_vars = {option: tk.BooleanVar(value=enabled) for option, enabled in self.app.backend.minify_options.items()}
+        self.size_policy_var = tk.BooleanVar(value=self.app.backend.size_policy.enabled)
+        self.size_action_var = tk.StringVar(value=self.app.backend.size_policy.options["action"])
 
         self.create_file_menu()
         self.create_preferences_menu()
@@ -54,17 +61,47 @@ class FileCombinerMenu:
         self.menu_bar.add_cascade(label="File", menu=self.file_menu)
         self.file_menu.add_command(label="Open Files", command=self.app.open_files)
         self.file_menu.add_command(label="Open Folder", command=self.app.open_folder)
+        self.file_menu.add_command(label="Open Git Changes...", command=self.app.open_git_changes)
+        self.file_menu.add_command(label="Select Relevant Files...", command=self.app.select_relevant_files)
         self.file_menu.add_command(label="Save Combined File", command=self.app.save_combined_file, state=tk.DISABLED)
         self.file_menu.add_separator()
+        self.file_menu.add_command(label="Open Project...", command=self.app.open_project)
+        self.file_menu.add_command(label="Save Project...", command=self.app.save_project)
+        self.file_menu.add_separator()
         self.file_menu.add_command(label="Exit", command=self.parent.quit)
 
     def create_preferences_menu(self):
         self.preferences_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="Preferences", menu=self.preferences_menu)
         self.preferences_menu.add_checkbutton(label="Always on Top", variable=self.always_on_top_var, command=self.toggle_always_on_top)
+        self.preferences_menu.add_checkbutton(label="Deduplicate Identical Files", variable=self.dedupe_var, command=self.toggle_dedupe)
+        self.preferences_menu.add_checkbutton(label="Use Git Index for Repositories", variable=self.git_source_var, command=self.toggle_git_source)
+        self.create_minify_menu()
+        self.create_size_policy_menu()
+        self.preferences_menu.add_command(label="Memory Budget...", command=self.set_memory_budget)
         self.preferences_menu.add_command(label="Manage Extensions", command=self.manage_extensions)
         self.preferences_menu.add_command(label="AI Configuration", command=self.open_ai_configuration)
 
+    def create_minify_menu(self):
+        self.minify_menu = tk.Menu(self.preferences_menu, tearoff=0)
+        self.preferences_menu.add_cascade(label="Minify Output", menu=self.minify_menu)
+        self.minify_menu.add_checkbutton(label="Enabled", variable=self.minify_var, command=self.update_minify_settings)
+        self.minify_menu.add_separator()
+        for option, var in self.minify_option_vars.items():
+            self.minify_menu.add_checkbutton(label=option.replace("_", " ").title(), variable=var, command=self.update_minify_settings)
+
+    def create_size_policy_menu(self):
+        # Per-extension limits live under "size_policy" in config.json
+        self.size_policy_menu = tk.Menu(self.preferences_menu, tearoff=0)
+        self.preferences_menu.add_cascade(label="Large Files", menu=self.size_policy_menu)
+        self.size_policy_menu.add_checkbutton(label="Limit File Size", variable=self.size_policy_var, command=self.update_size_policy)
+        self.size_policy_menu.add_separator()
+        for action, label in ((ACTION_SKIP, "Skip"), (ACTION_EXCERPT, "First and Last Lines"), (ACTION_SUMMARY, "AI Summary")):
+            self.size_policy_menu.add_radiobutton(label=label, value=action, variable=self.size_action_var, command=self.update_size_policy)
+        self.size_policy_menu.add_separator()
+        self.size_policy_menu.add_command(label="Size Limit...", command=self.set_size_limit)
+        self.size_policy_menu.add_command(label="Excerpt Lines...", command=self.set_excerpt_lines)
+
     def create_help_menu(self):
         self.help_menu = tk.Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="Help", menu=self.help_menu)
@@ -97,6 +134,61 @@ class FileCombinerMenu:
         self.parent.attributes('-topmost', self.always_on_top_var.get())
         logging.info(f"Always on top set to {self.always_on_top_var.get()}.")
 
+    def toggle_dedupe(self):
+        self.app.backend.dedupe_enabled = self.dedupe_var.get()
+        self.app.save_config()
+        logging.info(f"Deduplicate identical files set to {self.dedupe_var.get()}.")
+
+    def toggle_git_source(self):
+        self.app.backend.git_source_enabled = self.git_source_var.get()
+        self.app.save_config()
+        logging.info(f"Use git index for repositories set to {self.git_source_var.get()}.")
+
+    def update_minify_settings(self):
+        self.app.backend.minify_enabled = self.minify_var.get()
+        for option, var in self.minify_option_vars.items():
+            self.app.backend.minify_options[option] = var.get()
+        self.app.save_config()
+        logging.info(f"Minify output set to {self.minify_var.get()} with options {self.app.backend.minify_options}.")
+
+    def update_size_policy(self):
+        options = self.app.backend.size_policy.options
+        options["enabled"] = self.size_policy_var.get()
+        options["action"] = self.size_action_var.get()
+        self.app.save_config()
+        logging.info(f"Large file limit set to {options['enabled']} with action {options['action']}.")
+
+    def set_size_limit(self):
+        options = self.app.backend.size_policy.options
+        limit_kb = simpledialog.askinteger("Size Limit", "Largest file included in full (KB):",
+                                           initialvalue=options["max_bytes"] // 1024, minvalue=1, parent=self.parent)
+        if limit_kb:
+            options["max_bytes"] = limit_kb * 1024
+            self.app.save_config()
+            logging.info(f"Large file limit set to {limit_kb} KB.")
+
+    def set_excerpt_lines(self):
+        options = self.app.backend.size_policy.options
+        head_lines = simpledialog.askinteger("Excerpt Lines", "Lines kept from the start of a large file:",
+                                             initialvalue=options["head_lines"], minvalue=0, parent=self.parent)
+        if head_lines is None:
+            return
+        tail_lines = simpledialog.askinteger("Excerpt Lines", "Lines kept from the end of a large file:",
+                                             initialvalue=options["tail_lines"], minvalue=0, parent=self.parent)
+        if tail_lines is None:
+            return
+        options["head_lines"], options["tail_lines"] = head_lines, tail_lines
+        self.app.save_config()
+        logging.info(f"Large file excerpts set to {head_lines} + {tail_lines} lines.")
+
+    def set_memory_budget(self):
+        budget_mb = simpledialog.askinteger("Memory Budget", "Memory budget in MB (0 for none).\nCombined outputs over a quarter of it are kept on disk and previewed.",
+                                            initialvalue=self.app.backend.memory_budget_mb, minvalue=0, parent=self.parent)
+        if budget_mb is not None:
+            self.app.backend.memory_budget_mb = budget_mb
+            self.app.save_config()
+            logging.info(f"Memory budget set to {budget_mb} MB.")
+
     def manage_extensions(self):
         extensions_window = tk.Toplevel(self.parent)
         extensions_window.title("Manage Extensions")
@@ -0,0 +1,96 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from batch_runner import BatchConfigError, BatchRunner, ReadCache, load_job_file
+
+
+def write_job_file(tmp_path, definition):
+    job_file = tmp_path / "release.json"
+    job_file.write_text(json.dumps(definition))
+    return str(job_file)
+
+
+@pytest.fixture
+def runner(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # config.json stays out of the source tree
+    runner = BatchRunner()
+    yield runner
+    runner.close()
+
+
+def test_load_job_file_merges_defaults_and_resolves_paths(tmp_path):
+    job_file = write_job_file(tmp_path, {
+        "defaults": {"extensions": ["py", ".SQL"], "exclude": "**/tests/**"},
+        "jobs": [{"roots": "services/billing", "outputs": ["dist/billing.txt"]},
+                 {"name": "search", "roots": ["services/search"], "outputs": "dist/search.txt", "extensions": [".go"]}],
+    })
+    billing, search = load_job_file(job_file)
+    assert billing["name"] == "job1"
+    assert billing["roots"] == [os.path.join(str(tmp_path), "services", "billing")]
+    assert billing["outputs"] == [os.path.join(str(tmp_path), "dist", "billing.txt")]
+    assert billing["extensions"] == [".py", ".sql"]
+    assert billing["include"] == [] and billing["exclude"] == ["**/tests/**"]
+    assert search["extensions"] == [".go"]
+
+
+@pytest.mark.parametrize("jobs, message", [
+    ([{"roots": ["a"], "outputs": ["o.txt"], "colour": "red"}], "unknown settings: colour"),
+    ([{"roots": ["a"]}], "no outputs"),
+    ([{"name": "x", "roots": ["a"], "outputs": ["o.txt"]}, {"name": "x", "roots": ["b"], "outputs": ["p.txt"]}],
+     "Duplicate job names: x"),
+])
+def test_load_job_file_rejects_bad_jobs(tmp_path, jobs, message):
+    with pytest.raises(BatchConfigError, match=message):
+        load_job_file(write_job_file(tmp_path, {"jobs": jobs}))
+
+
+def test_nested_root_is_taken_from_the_outer_walk(runner, tmp_path, monkeypatch):
+    (tmp_path / "proj" / "sub").mkdir(parents=True)
+    (tmp_path / "proj" / "a.py").write_text("a = 1\n")
+    (tmp_path / "proj" / "sub" / "b.py").write_text("b = 2\n")
+    walked = []
+    backend = runner.create_backend({})
+    scan_folder = backend.scan_folder
+    monkeypatch.setattr(backend, "scan_folder", lambda folder_path: walked.append(folder_path) or scan_folder(folder_path))
+
+    outer, inner = str(tmp_path / "proj"), str(tmp_path / "proj" / "sub")
+    runner.walk(backend, outer)
+    assert runner.walk(backend, inner) == [os.path.join(inner, "b.py")]
+    assert walked == [outer]
+
+
+def test_single_file_root_matches_include_patterns(runner, tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "one.py").write_text("x = 1\n")
+    jobs = load_job_file(write_job_file(tmp_path, {"jobs": [
+        {"name": "one", "roots": ["a/one.py"], "include": ["**/*.py"], "outputs": ["dist/one.txt"]}]}))
+    [result] = runner.run(jobs)
+    assert result["error"] is None and result["files"] == 1
+    assert "x = 1" in (tmp_path / "dist" / "one.txt").read_text()
+
+
+def stat(mtime_ns, size):
+    return SimpleNamespace(st_mtime_ns=mtime_ns, st_size=size)
+
+
+def test_read_cache_drops_least_recently_used():
+    cache = ReadCache(max_bytes=10)
+    cache.put("a", stat(1, 4), b"aaaa")
+    cache.put("b", stat(1, 4), b"bbbb")
+    assert cache.get("a", stat(1, 4)) == b"aaaa"  # "b" is now the least recently used
+    cache.put("c", stat(1, 4), b"cccc")
+    assert cache.get("b", stat(1, 4)) is None
+    assert cache.get("a", stat(1, 4)) == b"aaaa" and cache.get("c", stat(1, 4)) == b"cccc"
+    assert cache.total_bytes == 8
+
+
+def test_read_cache_misses_changed_and_oversized_files():
+    cache = ReadCache(max_bytes=10)
+    cache.put("a", stat(1, 4), b"aaaa")
+    assert cache.get("a", stat(2, 4)) is None
+    cache.put("big", stat(1, 11), b"x" * 11)
+    assert cache.get("big", stat(1, 11)) is None
+    assert (cache.hits, cache.misses) == (0, 2)
@@ -0,0 +1,33 @@
+import pytest
+
+from bundle import MAGIC, TRAILER, TRAILER_MAGIC, BundleFormatError, BundleReader, BundleWriter
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "out.ccb")
+    with BundleWriter(path) as writer:
+        writer.write_section("a.py", "# a.py\n", "x = 1\n\n")
+        writer.write_section("b.py", "# b.py\n", "y = 2\n\n")
+    with BundleReader(path) as reader:
+        assert [entry["path"] for entry in reader.list_files()] == ["a.py", "b.py"]
+        assert reader.read_file("b.py") == "y = 2"
+
+
+@pytest.mark.parametrize("data", [
+    b"not a bundle",
+    MAGIC,
+    MAGIC + b"short",
+    MAGIC + b"x" * 40,
+    MAGIC + b"{}" + TRAILER.pack(len(MAGIC), 2, TRAILER_MAGIC),
+    MAGIC + b"{not json" + TRAILER.pack(len(MAGIC), 9, TRAILER_MAGIC),
+    MAGIC + TRAILER.pack(10 ** 9, 2, TRAILER_MAGIC),
+])
+def test_damaged_bundles_raise_format_errors_and_close_the_file(tmp_path, monkeypatch, data):
+    path = tmp_path / "bad.ccb"
+    path.write_bytes(data)
+    opened = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda *args, **kwargs: opened.append(real_open(*args, **kwargs)) or opened[-1])
+    with pytest.raises(BundleFormatError):
+        BundleReader(str(path))
+    assert opened and all(f.closed for f in opened)
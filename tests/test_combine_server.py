@@ -0,0 +1,167 @@
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+import combine_server
+from combine_server import CombineRequestHandler, create_server
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # config.json and jobs/ stay out of the source tree
+    monkeypatch.setattr(CombineRequestHandler, "timeout", 0.5)
+    server = create_server(port=0, max_workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None, headers=None, timeout=5):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=timeout)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def post_json(server, path, payload, headers=None):
+    return request(server, "POST", path, json.dumps(payload), {"Content-Type": "application/json", **(headers or {})})
+
+
+def test_idle_keep_alive_connections_do_not_starve_the_pool(server):
+    # max_workers=2: two idle connections hold both workers until their timeout
+    idle = [socket.create_connection(server.server_address) for _ in range(2)]
+    try:
+        time.sleep(0.1)
+        start = time.monotonic()
+        status, body = request(server, "GET", "/health")
+        assert status == 200 and json.loads(body) == {"status": "ok"}
+        assert time.monotonic() - start < 3
+    finally:
+        for connection in idle:
+            connection.close()
+
+
+def test_combine_json(server, tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    status, body = post_json(server, "/combine", {"paths": [str(tmp_path / "a.py")], "format": "json"})
+    assert status == 200
+    assert json.loads(body)["content"] == "# a.py\nx = 1\n\n\n"
+
+
+def test_rejects_foreign_host(server, tmp_path):
+    status, _ = post_json(server, "/files", {"paths": [str(tmp_path)]}, headers={"Host": "attacker.example:8765"})
+    assert status == 403
+    status, _ = request(server, "GET", "/health", headers={"Host": "attacker.example"})
+    assert status == 403
+
+
+def test_accepts_loopback_host_names(server):
+    for host in ("localhost:8765", "127.0.0.1", "[::1]:8765"):
+        status, _ = request(server, "GET", "/health", headers={"Host": host})
+        assert status == 200
+
+
+def test_requires_json_content_type(server, tmp_path):
+    payload = json.dumps({"paths": [str(tmp_path)]})
+    status, _ = request(server, "POST", "/files", payload, {"Content-Type": "text/plain"})
+    assert status == 415
+    status, _ = request(server, "POST", "/files", payload, {"Content-Type": "application/json; charset=utf-8"})
+    assert status == 200
+
+
+def test_host_name():
+    assert combine_server.host_name("LocalHost:8765") == "localhost"
+    assert combine_server.host_name("[::1]:8765") == "::1"
+    assert combine_server.host_name("::1") == "::1"
+
+
+def test_job_lock_serializes_one_job_only():
+    service = combine_server.CombineService()
+    running, overlaps = [], []
+
+    def run(job_id):
+        with service.job_lock(job_id):
+            if job_id in running:
+                overlaps.append(job_id)
+            running.append(job_id)
+            time.sleep(0.05)
+            running.remove(job_id)
+
+    threads = [threading.Thread(target=run, args=(job_id,)) for job_id in ("a", "a", "a", "b")]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps == []
+    assert time.monotonic() - start >= 0.15
+    assert service.job_locks == {}
+
+
+def test_git_index_walks_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tracked = [str(tmp_path / "a.py")]
+    monkeypatch.setattr(combine_server.FileCombinerBackend, "scan_folder", lambda self, folder_path: (list(tracked), {}))
+    service = combine_server.CombineService()
+    backend = service.create_backend({})
+    assert service.walk_folder(backend, str(tmp_path)) == [str(tmp_path / "a.py")]
+    tracked.append(str(tmp_path / "b.py"))
+    assert service.walk_folder(backend, str(tmp_path)) == [str(tmp_path / "a.py"), str(tmp_path / "b.py")]
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+def test_unix_socket_never_replaces_a_regular_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    notes = tmp_path / "notes.txt"
+    notes.write_text("keep me")
+    with pytest.raises(FileExistsError):
+        create_server(unix_socket=str(notes))
+    assert notes.read_text() == "keep me"
+
+    socket_path = str(tmp_path / "combine.sock")
+    for _ in range(2):  # The second start replaces the first one's stale socket
+        server = create_server(unix_socket=socket_path)
+        server.server_close()
+
+
+class BlockingProvider:
+    # summarize_many() waits like a provider batch job: until its token stops it
+    provider_name = "Stub"
+
+    def __init__(self):
+        self.stopped = threading.Event()
+        self.error = None
+
+    def summarize_many(self, texts, cancel_token=None):
+        while cancel_token.error() is None:
+            cancel_token.wait(0.05)
+        self.error = cancel_token.error()
+        self.stopped.set()
+        raise self.error
+
+
+def test_summarize_gives_up_after_its_timeout(server, monkeypatch):
+    provider = BlockingProvider()
+    monkeypatch.setattr(server.service, "get_provider", lambda name: provider)
+    status, body = post_json(server, "/summarize", {"texts": ["a"] * 10, "timeout": 0.3})
+    assert status == 504 and "timed out" in json.loads(body)["error"]
+
+
+def test_summarize_is_cancelled_when_the_client_disconnects(server, monkeypatch):
+    provider = BlockingProvider()
+    monkeypatch.setattr(server.service, "get_provider", lambda name: provider)
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    connection.request("POST", "/summarize", json.dumps({"texts": ["a"] * 10}), {"Content-Type": "application/json"})
+    time.sleep(0.2)
+    connection.close()
+    assert provider.stopped.wait(5)
+    assert not isinstance(provider.error, combine_server.CallTimedOut)
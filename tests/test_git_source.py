@@ -0,0 +1,64 @@
+# The fixtures are .git/index files written by git 2.39 for one repository:
+# README.md, docs/a.md, src/app.py, src/app_test.py and src/util/héllo.py.
+# index-v3 marks docs/a.md skip-worktree (an extended flag); index-v4 stores
+# the paths prefix-compressed.
+import os
+import shutil
+
+import pytest
+
+import git_source
+from file_combiner import FileCombinerBackend
+from git_source import GitIndexError, get_tracked_files, read_git_index
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "git_index")
+ALL_PATHS = ["README.md", "docs/a.md", "src/app.py", "src/app_test.py", "src/util/héllo.py"]
+
+
+def git_dir_with_index(tmp_path, fixture):
+    git_dir = tmp_path / ".git"
+    git_dir.mkdir()
+    shutil.copy(os.path.join(FIXTURES, fixture), git_dir / "index")
+    return str(git_dir)
+
+
+@pytest.mark.parametrize("fixture, expected", [
+    ("index-v2", ALL_PATHS),
+    ("index-v3", [path for path in ALL_PATHS if path != "docs/a.md"]),
+    ("index-v4", ALL_PATHS),
+])
+def test_read_git_index_versions(tmp_path, fixture, expected):
+    assert read_git_index(git_dir_with_index(tmp_path, fixture)) == expected
+
+
+def test_read_git_index_without_index(tmp_path):
+    assert read_git_index(str(tmp_path)) == []
+
+
+def test_read_git_index_rejects_other_files(tmp_path):
+    (tmp_path / "index").write_bytes(b"DIRC" + (5).to_bytes(4, "big") + (0).to_bytes(4, "big"))
+    with pytest.raises(GitIndexError):
+        read_git_index(str(tmp_path))
+
+
+def test_get_tracked_files_under_subfolder(tmp_path):
+    git_dir_with_index(tmp_path, "index-v4")
+    tracked = get_tracked_files(str(tmp_path / "src"))
+    assert tracked == [os.path.join(str(tmp_path), *path.split("/")) for path in ALL_PATHS if path.startswith("src/")]
+
+
+def test_folder_on_another_drive_falls_back_to_walking(tmp_path, monkeypatch):
+    git_dir_with_index(tmp_path, "index-v2")
+    (tmp_path / "untracked.py").write_text("x = 1\n")
+
+    def relpath_on_other_drive(path, start=None):
+        raise ValueError("path is on mount 'D:', start on mount 'C:'")
+
+    monkeypatch.setattr(git_source.os.path, "relpath", relpath_on_other_drive)
+    with pytest.raises(GitIndexError):
+        get_tracked_files(str(tmp_path))
+
+    backend = FileCombinerBackend()
+    backend.git_source_enabled = True
+    file_paths, _ = backend.scan_folder(str(tmp_path))
+    assert os.path.join(str(tmp_path), "untracked.py") in file_paths
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+
+import pytest
+
+from bundle import BundleFormatError, iter_plain_text_sections, split_plain_text
+from jobs import JobStore, SummaryJob
+from memory_budget import SpilledText
+
+
+def test_concurrent_saves_of_one_job_leave_a_whole_checkpoint(tmp_path):
+    store = JobStore(str(tmp_path))
+    errors = []
+
+    def save(writer):
+        try:
+            for step in range(50):
+                store.save("summary-abc", {"writer": writer, "summaries": {str(n): "x" * 2000 for n in range(step)}})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(writer,)) for writer in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(store.load("summary-abc")["summaries"]) == 49
+    assert os.listdir(tmp_path) == ["summary-abc.json"]  # No temp files left behind
+
+
+def test_failed_save_removes_its_temp_file(tmp_path):
+    store = JobStore(str(tmp_path))
+    store.save("job", {"done": 1})
+    try:
+        store.save("job", {"done": object()})
+    except TypeError:
+        pass
+    assert os.listdir(tmp_path) == ["job.json"]
+    with open(tmp_path / "job.json", encoding='utf-8') as f:
+        assert json.load(f) == {"done": 1}
+
+
+class StubProvider:
+    provider_name = "Stub"
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.prompts = []
+
+    def resolve_model(self, warn=True):
+        return "stub-model"
+
+    def model_profile(self):
+        return {"tokenizer": "tiktoken:cl100k_base"}
+
+    def input_token_budget(self):
+        return self.budget
+
+    def summarize(self, prompt, cancel_token=None):
+        text = prompt if isinstance(prompt, str) else prompt.text()
+        self.prompts.append(text)
+        return f"summary {len(self.prompts)}"
+
+
+def combined_text(file_paths):
+    return "".join(f"# {os.path.basename(path)}\n" + f"{os.path.basename(path)} line\n" * 40 + "\n\n" for path in file_paths)
+
+
+def test_plain_text_sections_stream_like_split(tmp_path):
+    file_paths = [str(tmp_path / name) for name in ("a.py", "b.py", "c.py")]
+    text = combined_text(file_paths)
+    assert list(iter_plain_text_sections(text.splitlines(keepends=True), file_paths)) == list(split_plain_text(text, file_paths))
+    with pytest.raises(BundleFormatError):
+        list(iter_plain_text_sections(text.splitlines(keepends=True), file_paths + [str(tmp_path / "d.py")]))
+
+
+def test_spilled_text_is_summarized_by_section_without_reading_it_whole(tmp_path, monkeypatch):
+    file_paths = [str(tmp_path / name) for name in ("a.py", "b.py", "c.py")]
+    text = combined_text(file_paths)
+    spill_path = tmp_path / "combined.txt"
+    spill_path.write_text(text, encoding='utf-8', newline='')
+    spilled = SpilledText(str(spill_path))
+    monkeypatch.setattr(SpilledText, "read", lambda self: pytest.fail("read the whole spilled text"))
+
+    provider = StubProvider(budget=300)
+    summary = SummaryJob(provider, spilled, file_paths, store=JobStore(str(tmp_path / "jobs"))).run()
+    # One chunk per file section, then one merge of the three summaries
+    assert len(provider.prompts) == 4 and summary == "summary 4"
+    assert provider.prompts[0].startswith("# a.py\n") and provider.prompts[2].startswith("# c.py\n")
+    assert "".join(provider.prompts[:3]) == text
+
+
+def test_small_spilled_text_is_one_request(tmp_path):
+    spill_path = tmp_path / "combined.txt"
+    spill_path.write_text("# a.py\nx = 1\n", encoding='utf-8')
+    provider = StubProvider(budget=1000)
+    SummaryJob(provider, SpilledText(str(spill_path)), store=JobStore(str(tmp_path / "jobs"))).run()
+    assert provider.prompts == ["# a.py\nx = 1"]
@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from cancellation import CallCancelled, CallTimedOut, CancelToken
+import local_llm
+from local_llm import LocalLLMEngine, LocalLLMError, get_engine
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # An OpenAI-compatible server: the reply's pieces are streamed as SSE events in
+    # chunked encoding, as Ollama and llama.cpp do. With server.hold set, the stream
+    # stops after the first piece until it is released.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.send_body({"data": [{"id": "stub-model"}]})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if not request["stream"]:
+                self.send_body({"choices": [{"message": {"content": "".join(server.pieces)}}]})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for index, piece in enumerate(server.pieces):
+                if index == 1 and server.hold is not None:
+                    server.hold.wait(5)
+                self.send_event({"choices": [{"delta": {"content": piece}}]})
+            if server.stream_error:
+                self.send_event({"error": server.stream_error})
+            self.send_chunk(b"data: [DONE]\n\n")
+            self.send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client closed the stream
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def send_body(self, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_event(self, payload):
+        self.send_chunk(b"data: " + json.dumps(payload).encode('utf-8') + b"\n\n")
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.pieces = ["Hello", ", ", "world"]
+    server.hold = None
+    server.stream_error = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    if server.hold is not None:
+        server.hold.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def engine(server):
+    engine = LocalLLMEngine(f"http://127.0.0.1:{server.server_address[1]}/v1", parallel_slots=1)
+    yield engine
+    engine.close()
+
+
+def messages():
+    return [{"role": "user", "content": "hi"}]
+
+
+def test_health(engine):
+    status = engine.health()
+    assert status["ok"] and status["models"] == ["stub-model"]
+
+
+def test_streams_pieces_in_order(engine):
+    pieces = []
+    assert engine.chat(messages(), "stub-model", on_token=pieces.append) == "Hello, world"
+    assert pieces == ["Hello", ", ", "world"]
+    assert engine.chat(messages(), "stub-model", stream=False) == "Hello, world"
+
+
+def test_stream_error_event(server, engine):
+    server.stream_error = "model crashed"
+    with pytest.raises(LocalLLMError):
+        engine.chat(messages(), "stub-model")
+
+
+def test_cancel_during_stream_returns_partial_and_frees_the_slot(server, engine):
+    server.hold = threading.Event()
+    token = CancelToken()
+    start = time.monotonic()
+    with pytest.raises(CallCancelled) as raised:
+        engine.chat(messages(), "stub-model", cancel_token=token,
+                    on_token=lambda piece: threading.Timer(0.1, token.cancel).start())
+    assert raised.value.partial == "Hello"
+    assert time.monotonic() - start < 3  # The cancel closed the blocked read
+    server.hold.set()
+    assert engine.chat(messages(), "stub-model") == "Hello, world"
+
+
+def test_waiting_for_a_busy_slot_times_out(server, engine):
+    server.hold = threading.Event()
+    first = {}
+    thread = threading.Thread(target=lambda: first.setdefault("text", engine.chat(messages(), "stub-model")))
+    thread.start()
+    while server.in_flight == 0:
+        time.sleep(0.01)
+    with pytest.raises(CallTimedOut):
+        engine.chat(messages(), "stub-model", cancel_token=CancelToken(0.5))
+    server.hold.set()
+    thread.join(5)
+    assert first["text"] == "Hello, world"
+    assert server.max_in_flight == 1
+
+
+def test_requests_never_exceed_the_slot_count(server):
+    engine = LocalLLMEngine(f"http://127.0.0.1:{server.server_address[1]}/v1", parallel_slots=2)
+    server.hold = threading.Event()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(engine.chat(messages(), "stub-model"))) for _ in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(0.3)
+        assert server.in_flight == 2
+        server.hold.set()
+        for thread in threads:
+            thread.join(5)
+    finally:
+        engine.close()
+    assert results == ["Hello, world"] * 4
+    assert server.max_in_flight == 2
+
+
+def test_replaced_engine_finishes_its_in_flight_requests(server, monkeypatch):
+    monkeypatch.setattr(local_llm, "_engines", {})
+    api_base = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    old = get_engine(api_base, parallel_slots=1)
+    closes = []
+    session_close = old.session.close
+    monkeypatch.setattr(old.session, "close", lambda: closes.append(old.in_flight) or session_close())
+    server.hold = threading.Event()
+    first = {}
+    thread = threading.Thread(target=lambda: first.setdefault("text", old.chat(messages(), "stub-model")))
+    thread.start()
+    while server.in_flight == 0:
+        time.sleep(0.01)
+
+    new = get_engine(api_base, parallel_slots=2)
+    try:
+        assert new is not old and old.retired
+        assert closes == []  # Still streaming the first reply
+        server.hold.set()
+        thread.join(5)
+        assert first["text"] == "Hello, world"
+        assert closes == [0]
+        assert new.chat(messages(), "stub-model") == "Hello, world"
+    finally:
+        new.close()
@@ -0,0 +1,71 @@
+import ast
+
+import pytest
+
+from minifier import DEFAULT_OPTIONS, minify
+
+WITH_DOCSTRINGS = {**DEFAULT_OPTIONS, "drop_docstrings": True}
+
+
+@pytest.mark.parametrize("ext, source, expected", [
+    (".py", 'url = "http://x#y"  # note\n', 'url = "http://x#y"'),
+    (".js", 'const u = "http://x"; // note\nconst c = \'/* no */\';\n', 'const u = "http://x";\nconst c = \'/* no */\';'),
+    (".sh", 'echo "a # b" # note\n', 'echo "a # b"'),
+    (".sql", "SELECT '--x' -- note\nFROM t;\n", "SELECT '--x'\nFROM t;"),
+])
+def test_comment_markers_inside_strings_are_kept(ext, source, expected):
+    assert minify(source, ext) == expected
+
+
+@pytest.mark.parametrize("source, expected", [
+    ("if (/^https?:\\/\\//.test(url)) { go(url); } // note\n", "if (/^https?:\\/\\//.test(url)) { go(url); }"),
+    ("const re = /[/*]+/g;\nuse(re); /* note */\n", "const re = /[/*]+/g;\nuse(re);"),
+    ("function f(s) {\n  return /\\/\\/$/.test(s);\n}\n", "function f(s) {\nreturn /\\/\\/$/.test(s);\n}"),
+    ("const half = total / 2; // note\nconst r = a / b / c;\n", "const half = total / 2;\nconst r = a / b / c;"),
+])
+def test_js_regex_literals_are_not_comments(source, expected):
+    assert minify(source, ".js") == expected
+
+
+def test_template_literal_whitespace_is_kept():
+    source = "const html = `\n    <ul>\n\n      <li>a</li>   \n    </ul>`;\n    render(html);\n"
+    assert minify(source, ".ts") == "const html = `\n    <ul>\n\n      <li>a</li>   \n    </ul>`;\nrender(html);"
+
+
+def test_python_triple_quoted_strings_keep_their_indentation():
+    source = 'def f():\n    sql = """\n        SELECT 1\n\n        FROM t\n    """\n    return sql\n'
+    result = minify(source, ".py")
+    assert result == 'def f():\n sql = """\n        SELECT 1\n\n        FROM t\n    """\n return sql'
+    namespace = {}
+    exec(result, namespace)
+    exec(source, namespace.setdefault("original", {}))
+    assert namespace["f"]() == namespace["original"]["f"]()
+
+
+def test_tab_indentation():
+    source = "class A:\n\tdef f(self):\n\t\tif self:\n\t\t\treturn 'a\\tb'\n"
+    result = minify(source, ".py")
+    assert result == "class A:\n def f(self):\n  if self:\n   return 'a\\tb'"
+    ast.parse(result)
+
+
+def test_tab_indented_docstring_only_body():
+    source = 'class A:\n\tdef f(self):\n\t\t"""Only a docstring."""\n'
+    result = minify(source, ".py", WITH_DOCSTRINGS)
+    ast.parse(result)
+    assert "docstring" not in result and "pass" in result
+
+
+def test_docstrings_are_dropped():
+    source = '"""Module."""\nimport os\n\n\nclass A:\n    """Doc."""\n\n    def f(self):\n        """Doc."""\n        return os.sep\n'
+    result = minify(source, ".py", WITH_DOCSTRINGS)
+    assert result == "import os\nclass A:\n def f(self):\n  return os.sep"
+
+
+def test_shebang_is_kept():
+    assert minify("#!/usr/bin/env python\n# comment\nprint(1)\n", ".py") == "#!/usr/bin/env python\nprint(1)"
+    assert minify("#!/bin/sh\necho hi # note\n", ".sh") == "#!/bin/sh\necho hi"
+
+
+def test_prose_keeps_paragraphs():
+    assert minify("# Title\n\n\n\nText.  \n", ".md") == "# Title\n\nText."
@@ -0,0 +1,51 @@
+import threading
+import time
+
+import model_catalog
+from model_catalog import fetch_models, load_model_cache, refresh_models
+
+MODELS_DATA = {
+    "Google": {"models_endpoint": "google"},
+    "Local": {"models_endpoint": "openai", "default_api_base": "http://127.0.0.1:1/v1"},
+}
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def test_google_key_is_sent_as_a_header(monkeypatch):
+    calls = []
+
+    def get(url, headers=None, params=None, timeout=None):
+        calls.append((url, headers, params))
+        return FakeResponse({"models": [{"name": "models/gemini-x", "supportedGenerationMethods": ["generateContent"]}]})
+
+    monkeypatch.setattr(model_catalog.requests, "get", get)
+    assert fetch_models("Google", {"api_key": "secret"}, MODELS_DATA) == ["gemini-x"]
+    url, headers, params = calls[0]
+    assert headers == {"x-goog-api-key": "secret"}
+    assert "secret" not in url and "secret" not in str(params)
+
+
+def test_concurrent_refreshes_keep_every_provider(monkeypatch, tmp_path):
+    def fetch(provider_name, settings, models_data):
+        time.sleep(0.05)  # Both fetches finish before either saves
+        return [f"{provider_name.lower()}-model"]
+
+    monkeypatch.setattr(model_catalog, "fetch_models", fetch)
+    cache_file = str(tmp_path / "model_list_cache.json")
+    threads = [threading.Thread(target=refresh_models, args=(name, {}, MODELS_DATA, cache_file)) for name in ("Google", "Local")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(load_model_cache(cache_file)) == ["Google", "Local|http://127.0.0.1:1/v1"]
+    assert [path.name for path in tmp_path.iterdir()] == ["model_list_cache.json"]
@@ -0,0 +1,52 @@
+import os
+import stat
+
+import pytest
+
+from bundle import BundleReader
+from output_writers import get_output_writer, read_archive_as_text, write_combined_text
+
+FORMATS = ["out.txt", "out.gz", "out.zip", "out.tar", "out.tar.gz", "out.ccb"]
+
+
+@pytest.mark.parametrize("name", FORMATS)
+def test_failed_write_leaves_no_file(tmp_path, name):
+    output_path = tmp_path / name
+    with pytest.raises(RuntimeError):
+        with get_output_writer(str(output_path)) as writer:
+            writer.write_section("a.py", "# a.py\n", "x = 1\n\n")
+            raise RuntimeError("read failed")
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("name", FORMATS)
+def test_failed_write_keeps_the_previous_file(tmp_path, name):
+    output_path = tmp_path / name
+    write_combined_text(str(output_path), "# a.py\nold\n\n", ["a.py"])
+    before = output_path.read_bytes()
+    with pytest.raises(RuntimeError):
+        with get_output_writer(str(output_path)) as writer:
+            writer.write_section("a.py", "# a.py\n", "new\n\n")
+            raise RuntimeError("read failed")
+    assert output_path.read_bytes() == before
+    assert os.listdir(tmp_path) == [name]
+
+
+def test_saved_files_are_complete_and_not_private(tmp_path):
+    text = "# a.py\nx = 1\n\n# b.py\ny = 2\n\n"
+    write_combined_text(str(tmp_path / "out.zip"), text, ["a.py", "b.py"])
+    assert read_archive_as_text(str(tmp_path / "out.zip")) == text
+    write_combined_text(str(tmp_path / "out.ccb"), text, ["a.py", "b.py"])
+    with BundleReader(str(tmp_path / "out.ccb")) as reader:
+        assert reader.read_file("b.py") == "y = 2"
+    write_combined_text(str(tmp_path / "out.txt"), text, ["a.py", "b.py"])
+    assert (tmp_path / "out.txt").read_text() == text
+    if os.name == "posix":
+        # The temp file is created 0600; the saved one gets the mode a plain open() would give it
+        assert stat.S_IMODE(os.stat(tmp_path / "out.txt").st_mode) == 0o666 & ~current_umask()
+
+
+def current_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+from project_index import ProjectIndex
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    (tmp_path / "b.py").write_text("y = 2\n")
+    return tmp_path, [str(tmp_path / "a.py"), str(tmp_path / "b.py")]
+
+
+def save(index, root, file_paths, file_cache=None):
+    index.save([str(root)], {}, set(file_paths), file_paths, {} if file_cache is None else file_cache)
+
+
+def test_save_and_load(tmp_path, project):
+    root, file_paths = project
+    index = ProjectIndex(str(tmp_path / "p.ccproj"))
+    save(index, root, file_paths)
+    roots, _, _, loaded_paths, _ = index.load()
+    assert roots == [str(root)] and loaded_paths == file_paths
+
+
+def test_failed_save_keeps_the_previous_project(tmp_path, project):
+    root, file_paths = project
+    index = ProjectIndex(str(tmp_path / "p.ccproj"))
+    save(index, root, file_paths)
+
+    class BrokenCache(dict):
+        def get(self, key, default=None):
+            raise RuntimeError("cache went away")
+
+    with pytest.raises(RuntimeError):
+        save(index, root, file_paths[:1], BrokenCache())
+    assert index.load()[3] == file_paths
+
+
+def test_save_refuses_to_overwrite_another_database(tmp_path, project):
+    root, file_paths = project
+    other = tmp_path / "app.db"
+    with sqlite3.connect(other) as connection:
+        connection.execute("CREATE TABLE files (name TEXT)")
+        connection.execute("INSERT INTO files VALUES ('keep me')")
+    connection.close()
+    with pytest.raises(ValueError, match="not a Code Combiner project"):
+        save(ProjectIndex(str(other)), root, file_paths)
+    with sqlite3.connect(other) as connection:
+        assert connection.execute("SELECT name FROM files").fetchall() == [("keep me",)]
+        assert {row[0] for row in connection.execute("SELECT name FROM sqlite_master")} == {"files"}
+    connection.close()
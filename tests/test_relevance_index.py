@@ -0,0 +1,32 @@
+from file_combiner import FileCombinerBackend
+
+
+def test_removed_file_does_not_come_back_on_the_next_selection(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    paths = []
+    for name, body in (("billing.py", "def charge_invoice(): pass\n"), ("invoice.py", "INVOICE = 'invoice'\n"),
+                       ("search.py", "def search_index(): pass\n")):
+        (tmp_path / name).write_text(body)
+        paths.append(str(tmp_path / name))
+    backend = FileCombinerBackend()
+    backend.add_file_paths(paths)
+
+    backend.select_relevant_files("invoice", 10000)
+    assert str(tmp_path / "invoice.py") in backend.file_paths
+    backend.remove_file_path(str(tmp_path / "invoice.py"))
+    backend.select_relevant_files("invoice", 10000)
+    assert backend.file_paths == [str(tmp_path / "billing.py")]
+
+
+def test_index_update_and_selection_are_separate_steps(tmp_path, monkeypatch):
+    # The UI indexes a snapshot on a worker thread, then applies the selection on the Tk thread
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.py").write_text("alpha = 1\n")
+    (tmp_path / "b.py").write_text("beta = 2\n")
+    backend = FileCombinerBackend()
+    backend.add_file_paths([str(tmp_path / "a.py"), str(tmp_path / "b.py")])
+    candidates = backend.relevance_candidates()
+    backend.update_relevance_index(candidates)
+    backend.remove_file_path(str(tmp_path / "b.py"))  # Removed while the index was being built
+    backend.apply_relevance_selection("alpha beta", 10000)
+    assert backend.file_paths == [str(tmp_path / "a.py")]
@@ -0,0 +1,36 @@
+from file_combiner import FileCombinerBackend
+from size_policy import SUMMARY_INPUT_BYTES, SizePolicy, SummaryCache
+
+
+def summary_backend(tmp_path, file_paths):
+    backend = FileCombinerBackend()
+    backend.size_policy = SizePolicy({"enabled": True, "max_bytes": 1024, "action": "summary", "extensions": {}})
+    backend.summary_cache = SummaryCache(str(tmp_path / "summaries.json"))
+    backend.file_paths = file_paths
+    return backend
+
+
+def test_summary_input_is_capped(tmp_path):
+    big = tmp_path / "big.log"
+    big.write_text("".join(f"line {n}\n" for n in range(100000)))
+    small = tmp_path / "small.py"
+    small.write_text("x = 1\n")
+    backend = summary_backend(tmp_path, [str(big), str(small)])
+
+    pending = backend.files_needing_summaries()
+    assert [file_path for file_path, _ in pending] == [str(big)]
+    sent = []
+    backend.summarize_large_file(*pending[0], lambda text: sent.append(text) or "a log of numbered lines")
+    assert len(sent[0].encode('utf-8')) <= SUMMARY_INPUT_BYTES + 100  # plus the omitted-bytes marker
+    assert sent[0].startswith("line 0\n") and sent[0].endswith("line 99999\n")
+    assert backend.files_needing_summaries() == []
+
+
+def test_combine_never_summarizes(tmp_path):
+    # Without a cached summary the combine falls back to an excerpt instead of calling a provider
+    big = tmp_path / "big.log"
+    big.write_text("".join(f"line {n}\n" for n in range(1000)))
+    backend = summary_backend(tmp_path, [str(big)])
+    combined = backend.combine_files()
+    assert "line 0" in combined and "line 999" in combined
+    assert "line 500\n" not in combined